@@ -0,0 +1,43 @@
+'''
+Compares the tokens per second of the analyzer with the previous
+tokenization (regex substitution, stop words looked up in a list and
+every word stemmed) on the CACM documents.
+
+Run from the root of the repository with:
+    python -m benchmarks.analyzer
+'''
+import re
+from index.core.analyzer import Analyzer
+from index.core.configuration import Configuration
+from index.core.document_parser import CACMDocumentParser
+from .common import CACM_PATH, COMMON_WORDS_PATH, timed
+
+
+def legacy_word_list(content, stop_words):
+    '''Tokenizes a text the way the index did before analyzers.'''
+    content = re.sub(r'[^\w\s]', ' ', content).lower()
+    word_list = re.findall(r"[\w]+", content)
+    word_list = [x for x in word_list if x not in stop_words]
+    return [Configuration.stemmer.stem_word(x.lower()) for x in word_list]
+
+
+def tokenize_all(contents, word_list):
+    '''Tokenizes every text and returns the number of tokens.'''
+    return sum(len(word_list(content)) for content in contents)
+
+
+if __name__ == '__main__':
+    CONTENTS = [document.get_content() for (_, _, document)
+                in CACMDocumentParser(CACM_PATH).get_documents()]
+    with open(COMMON_WORDS_PATH) as file_ptr:
+        STOP_WORDS = file_ptr.read().splitlines()
+    (TOKENS, LEGACY_TIME) = timed(
+        tokenize_all, CONTENTS, lambda content: legacy_word_list(content, STOP_WORDS))
+    ANALYZER = Analyzer(STOP_WORDS)
+    (_, ANALYZER_TIME) = timed(tokenize_all, CONTENTS, ANALYZER.analyze)
+    print("{0} documents, {1} tokens".format(len(CONTENTS), TOKENS))
+    print("  legacy: {0:.0f} tokens/s".format(TOKENS / LEGACY_TIME))
+    print("  analyzer: {0:.0f} tokens/s, speedup: {1:.2f}x".format(
+        TOKENS / ANALYZER_TIME, LEGACY_TIME / ANALYZER_TIME))
+    print("  stem cache hit rate: {0:.1%}".format(
+        ANALYZER.statistics()['StemFilter']['hit_rate']))
@@ -0,0 +1,31 @@
+'''
+Compares running the CACM queries one by one with running them in
+a single batch, which reads the postings of each distinct term once,
+for every vectorial model.
+
+Run from the root of the repository with:
+    python -m benchmarks.batch_queries
+'''
+from index.core import Index
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, \
+    VectorialQueryProbabilistic
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed
+
+
+def run_one_by_one(index, queries, model):
+    '''Executes the queries one after the other.'''
+    return [model(query).execute(index) for query in queries]
+
+
+if __name__ == '__main__':
+    # The result cache is disabled, every query is scored.
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, result_cache_size=0)
+    QUERIES = list(read_queries().values())
+    for model in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                  VectorialQueryProbabilistic]:
+        (EXPECTED, SINGLE_TIME) = timed(run_one_by_one, INDEX, QUERIES, model)
+        (RESULTS, BATCH_TIME) = timed(INDEX.execute_batch, QUERIES, model)
+        assert RESULTS == EXPECTED
+        print("{0}: {1} queries, one by one {2:.3f} s, batch {3:.3f} s, "
+              "speedup: {4:.2f}x".format(model.__name__, len(QUERIES), SINGLE_TIME,
+                                         BATCH_TIME, SINGLE_TIME / BATCH_TIME))
@@ -0,0 +1,32 @@
+'''
+Compares the vectorial models with BM25 on the CACM queries: time to run
+the queries, precision of the 10 first results and mean average
+precision against the relevance judgments.
+
+Run from the root of the repository with:
+    python -m benchmarks.bm25
+'''
+from index.core import Index
+from index.core.evaluation import evaluate_run
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, \
+    VectorialQueryProbabilistic, VectorialQueryBM25
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, read_relevant, timed
+
+
+def run_queries(index, queries, model):
+    '''Returns the results of each query.'''
+    return dict((query_id, model(text).execute(index)) for (query_id, text) in queries.items())
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, result_cache_size=0)
+    RELEVANT = read_relevant()
+    QUERIES = dict((query_id, text) for (query_id, text) in read_queries().items()
+                   if query_id in RELEVANT)
+    for model in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                  VectorialQueryProbabilistic, VectorialQueryBM25]:
+        (results, duration) = timed(run_queries, INDEX, QUERIES, model)
+        evaluation = evaluate_run(results, RELEVANT)
+        print("{0}: {1} queries in {2:.3f} s, P@10 {3:.3f}, MAP {4:.3f}".format(
+            model.__name__, len(QUERIES), duration, evaluation['precision'],
+            evaluation['mean_average_precision']))
@@ -0,0 +1,101 @@
+'''
+Helpers shared by the benchmark scripts.
+'''
+import random
+import sys
+import time
+try:
+    from pympler.asizeof import asizeof
+except ImportError:
+    asizeof = None
+
+CACM_PATH = 'data/cacm.all'
+COMMON_WORDS_PATH = 'data/common_words'
+QUERIES_PATH = 'data/query.text'
+QRELS_PATH = 'data/qrels.text'
+
+
+def read_queries(queries_path=QUERIES_PATH):
+    '''
+    Reads a CACM query file and returns a dictionary of query texts
+    indexed by query id.
+    '''
+    queries = {}
+    query_id = 0
+    query_buffer = ""
+    with open(queries_path) as file_ptr:
+        for line in file_ptr:
+            if line.startswith('.I'):
+                query_id = int(line.split(" ")[1])
+            elif line.startswith('.W'):
+                query_buffer = ""
+            elif line.startswith('.N'):
+                queries[query_id] = query_buffer
+            else:
+                query_buffer = query_buffer + line
+    return queries
+
+
+def read_relevant(qrels_path=QRELS_PATH):
+    '''
+    Reads a CACM relevance file and returns a dictionary of the
+    relevant doc ids of each query id.
+    '''
+    relevant = {}
+    with open(qrels_path) as file_ptr:
+        for line in file_ptr:
+            fields = line.split()
+            relevant.setdefault(int(fields[0]), []).append(int(fields[1]))
+    return relevant
+
+
+def timed(function, *args):
+    '''Calls a function and returns (result, duration in seconds).'''
+    start_time = time.perf_counter()
+    result = function(*args)
+    return (result, time.perf_counter() - start_time)
+
+
+def deep_size(obj):
+    '''
+    Returns the memory size of an object and everything it references,
+    using pympler when it is installed.
+    '''
+    if asizeof:
+        return asizeof(obj)
+    seen = set()
+    pending = [obj]
+    size = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+        elif hasattr(item, '__slots__'):
+            pending.extend(getattr(item, name) for name in item.__slots__
+                           if hasattr(item, name))
+        elif hasattr(item, '__dict__'):
+            pending.append(item.__dict__)
+    return size
+
+
+def zipf_postings(number_of_docs, vocabulary_size, seed=0, density=0.1):
+    '''
+    Generates synthetic postings: the term of rank r appears in about
+    number_of_docs * density / r documents, following Zipf's law.
+    Returns a dictionary term -> (sorted doc ids, frequencies).
+    '''
+    randomizer = random.Random(seed)
+    postings = {}
+    for rank in range(1, vocabulary_size + 1):
+        document_frequency = max(1, int(number_of_docs * density / rank))
+        doc_ids = sorted(randomizer.sample(range(number_of_docs), document_frequency))
+        frequencies = [1 + int(randomizer.expovariate(0.5)) for _ in doc_ids]
+        postings["term{0}".format(rank)] = (doc_ids, frequencies)
+    return postings
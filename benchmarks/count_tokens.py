@@ -0,0 +1,90 @@
+'''
+Compares dict and DictionaryAsString as the word counts
+of the CACM documents, and of documents 50 times longer made of
+consecutive CACM documents: time to count the tokens of every document,
+time to look every word up again, and memory used.
+Then measures the time of a look up in tables of growing sizes.
+
+Run from the root of the repository with:
+    python -m benchmarks.count_tokens
+'''
+import random
+from collections import Counter
+from index.core.analyzer import Analyzer
+from index.core.configuration import Configuration
+from index.core.dictionary_as_string import DictionaryAsString
+from index.core.document_parser import CACMDocumentParser
+from .common import CACM_PATH, COMMON_WORDS_PATH, deep_size, timed
+
+
+def legacy_count_tokens(tokens):
+    '''Counts tokens the way count_tokens did before, one update per token.'''
+    result = Configuration.IndexDict()
+    for token in tokens:
+        if token in result:
+            result[token] = result[token] + 1
+        else:
+            result[token] = 1
+    return result
+
+
+def count_all(documents, count_function):
+    '''Counts the tokens of every document.'''
+    return [count_function(tokens) for tokens in documents]
+
+
+def look_up_all(tables):
+    '''Looks every word of every table up.'''
+    total = 0
+    for table in tables:
+        for word in list(table):
+            total += table[word]
+    return total
+
+
+def run(documents, dictionary_class):
+    '''Prints the counting time, the look up time and the memory of a type.'''
+    Configuration.IndexDict = dictionary_class
+    print("{0}:".format(dictionary_class.__name__))
+    if dictionary_class is DictionaryAsString:
+        (_, duration) = timed(count_all, documents, legacy_count_tokens)
+        print("  counting one token at a time: {0:.4f} s".format(duration))
+    (tables, duration) = timed(count_all, documents,
+                               lambda tokens: dictionary_class(Counter(tokens)))
+    print("  counting in one pass: {0:.4f} s".format(duration))
+    (_, duration) = timed(look_up_all, tables)
+    print("  look ups: {0:.4f} s".format(duration))
+    print("  memory: {0} bytes".format(deep_size(tables)))
+
+
+def look_up_keys(table, keys):
+    '''Looks keys up in a table.'''
+    return sum(table[key] for key in keys)
+
+
+def look_up_by_size(sizes, dictionary_classes, look_ups=500):
+    '''Prints the time of a look up in tables of every size.'''
+    for size in sizes:
+        keys = ["term{0}".format(number) for number in range(0, size)]
+        probes = random.Random(size).sample(keys, min(size, look_ups))
+        for dictionary_class in dictionary_classes:
+            table = dictionary_class({key: 1 for key in keys})
+            (_, duration) = timed(look_up_keys, table, probes)
+            print("  {0} terms, {1}: {2:.2f} us per look up".format(
+                size, dictionary_class.__name__, duration / len(probes) * 1e6))
+
+
+if __name__ == '__main__':
+    with open(COMMON_WORDS_PATH) as file_ptr:
+        ANALYZER = Analyzer(file_ptr.read().splitlines())
+    CACM_DOCUMENTS = [ANALYZER.analyze(document.get_content()) for (_, _, document)
+                      in CACMDocumentParser(CACM_PATH).get_documents()]
+    LONG_DOCUMENTS = [sum(CACM_DOCUMENTS[start:start + 50], [])
+                      for start in range(0, len(CACM_DOCUMENTS), 50)]
+    for DOCUMENTS in [CACM_DOCUMENTS, LONG_DOCUMENTS]:
+        print("{0} documents, {1} tokens".format(
+            len(DOCUMENTS), sum(len(tokens) for tokens in DOCUMENTS)))
+        for DICTIONARY_CLASS in [dict, DictionaryAsString]:
+            run(DOCUMENTS, DICTIONARY_CLASS)
+    print("look ups by table size:")
+    look_up_by_size([25, 800, 10000], [dict, DictionaryAsString])
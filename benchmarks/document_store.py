@@ -0,0 +1,58 @@
+'''
+Compares the time taken to render the titles of result documents of
+CACM when documents are found by scanning the lines of their file, read
+at their byte offset, and read from the compressed document store.
+
+Run from the root of the repository with:
+    python -m benchmarks.document_store
+'''
+import os
+import random
+from index.core import Index
+from index.core.configuration import Configuration
+from index.core.constants import FILE, START, END
+from .common import CACM_PATH, COMMON_WORDS_PATH, timed
+
+# Number of result documents rendered.
+RESULTS = 500
+
+
+def legacy_content(index, doc_id):
+    '''Reads a document line by line, the way the index did before offsets.'''
+    content = ""
+    doc_info = index.index_by_doc_id(doc_id)
+    with open(doc_info[FILE], encoding="utf8") as file_ptr:
+        for i, line in enumerate(file_ptr):
+            if i >= doc_info[START] and i <= doc_info[END]:
+                content = content + "\n" + line
+    return content
+
+
+def render_legacy(index, doc_ids):
+    '''Returns the titles of documents parsed from their lines.'''
+    parser = Configuration.DocumentParser()
+    return [parser.parse_document(legacy_content(index, doc_id)).get_title()
+            for doc_id in doc_ids]
+
+
+def render(index, doc_ids):
+    '''Returns the titles of documents given by the index.'''
+    return [index.document_title(doc_id) for doc_id in doc_ids]
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH)
+    STORED_INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, store_documents=True)
+    DOC_IDS = random.Random(0).choices(sorted(INDEX.get_all_doc_ids()), k=RESULTS)
+    (_, LEGACY_TIME) = timed(render_legacy, INDEX, DOC_IDS)
+    (_, OFFSET_TIME) = timed(render, INDEX, DOC_IDS)
+    (_, STORED_TIME) = timed(render, STORED_INDEX, DOC_IDS)
+    print("{0} results out of {1} documents".format(
+        RESULTS, INDEX.get_number_of_docs()))
+    print("  line scan: {0:.3f} ms per document".format(1000 * LEGACY_TIME / RESULTS))
+    print("  byte offset: {0:.3f} ms per document, speedup: {1:.1f}x".format(
+        1000 * OFFSET_TIME / RESULTS, LEGACY_TIME / OFFSET_TIME))
+    print("  stored titles: {0:.3f} ms per document, speedup: {1:.1f}x".format(
+        1000 * STORED_TIME / RESULTS, LEGACY_TIME / STORED_TIME))
+    print("  compressed store: {0} bytes for a {1} bytes collection".format(
+        STORED_INDEX.document_store().stored_size(), os.path.getsize(CACM_PATH)))
@@ -0,0 +1,76 @@
+'''
+Compares the time taken to compute the interpolated recall-precision
+curve of the CACM queries for every vectorial model, the way
+RecallPrecisionGenerator did before the evaluation module, measuring
+recall and precision at each percentage of the results, and with the
+evaluation module, which reads each ranking once. Runs are evaluated one
+after the other and by a pool of processes.
+
+Run from the root of the repository with:
+    python -m benchmarks.evaluation
+'''
+from math import ceil
+from index.core import Index
+from index.core.evaluation import evaluate_run, evaluate_runs
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, \
+    VectorialQueryProbabilistic, VectorialQueryBM25
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, read_relevant, timed
+
+# Number of processes evaluating the runs in parallel.
+PROCESSES = 4
+
+
+def legacy_curve(run, relevant):
+    '''
+    Returns the curve of a run, computing recall and precision at 198
+    percentages of the results of each query.
+    '''
+    recalls = [x/10 for x in range(0, 11)]
+    prec_average = [[] for x in range(0, 11)]
+    for (query_id, results) in run.items():
+        pertinent = relevant.get(query_id, [])
+        recall_prec_list = []
+        for percentage in [p * 0.001 for p in range(1, 100)] + list(range(1, 100)):
+            top = int(ceil(len(results)*percentage/100))
+            found = len([k for k in pertinent if k in [x for (x, y) in results[0:top]]])
+            recall_prec_list.append((found / len(pertinent) if pertinent else 1.0, found / top))
+        for idx in range(0, 11):
+            precisions_for_recall = [prec for (recall, prec) in recall_prec_list
+                                     if recalls[idx] <= recall]
+            if precisions_for_recall:
+                prec_average[idx].append(max(precisions_for_recall))
+    return [sum(l)/len(l) for l in prec_average]
+
+
+def evaluate_legacy(runs, relevant):
+    '''Returns the legacy curve of each run.'''
+    return dict((name, legacy_curve(run, relevant)) for (name, run) in runs.items())
+
+
+def evaluate(runs, relevant):
+    '''Returns the evaluation of each run, one after the other.'''
+    return dict((name, evaluate_run(run, relevant)) for (name, run) in runs.items())
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH)
+    QUERIES = read_queries()
+    RELEVANT = read_relevant()
+    RUNS = {}
+    for model in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                  VectorialQueryProbabilistic, VectorialQueryBM25]:
+        RUNS[model.__name__] = dict(zip(QUERIES, INDEX.execute_batch(QUERIES.values(), model)))
+    (LEGACY, LEGACY_TIME) = timed(evaluate_legacy, RUNS, RELEVANT)
+    (EVALUATIONS, EVALUATION_TIME) = timed(evaluate, RUNS, RELEVANT)
+    (_, PARALLEL_TIME) = timed(evaluate_runs, RUNS, RELEVANT, 10, PROCESSES)
+    print("{0} runs of {1} queries".format(len(RUNS), len(QUERIES)))
+    for (name, evaluation) in EVALUATIONS.items():
+        print("  {0}: same curve {1}, MAP {2:.3f}, P@10 {3:.3f}, nDCG@10 {4:.3f}".format(
+            name, LEGACY[name] == evaluation['precisions'],
+            evaluation['mean_average_precision'], evaluation['precision'],
+            evaluation['ndcg']))
+    print("  percentages of the results: {0:.3f} s".format(LEGACY_TIME))
+    print("  relevance vectors: {0:.3f} s, speedup: {1:.1f}x".format(
+        EVALUATION_TIME, LEGACY_TIME / EVALUATION_TIME))
+    print("  relevance vectors, {0} processes: {1:.3f} s, speedup: {2:.1f}x".format(
+        PROCESSES, PARALLEL_TIME, LEGACY_TIME / PARALLEL_TIME))
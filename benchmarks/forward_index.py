@@ -0,0 +1,27 @@
+'''
+Compares the memory used by the forward index of CACM when the word
+counts of each document are stored as a dictionary of terms, and as
+term id and count arrays over the lexicon.
+
+Run from the root of the repository with:
+    python -m benchmarks.forward_index
+'''
+from index.core import Index
+from index.core.constants import WORDS
+from .common import CACM_PATH, COMMON_WORDS_PATH, deep_size
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH)
+    DOC_IDS = INDEX.get_all_doc_ids()
+    DICTIONARIES = {doc_id: dict(INDEX.index_by_doc_id(doc_id)[WORDS])
+                    for doc_id in DOC_IDS}
+    ARRAYS = ({doc_id: INDEX._index[doc_id][WORDS] for doc_id in DOC_IDS},
+              INDEX.lexicon())
+    DICTIONARIES_SIZE = deep_size(DICTIONARIES)
+    ARRAYS_SIZE = deep_size(ARRAYS)
+    print("{0} documents, {1} terms".format(len(DOC_IDS), len(INDEX.lexicon())))
+    print("  dictionaries of terms: {0} bytes".format(DICTIONARIES_SIZE))
+    print("  term id arrays and lexicon: {0} bytes ({1:.1%})".format(
+        ARRAYS_SIZE, ARRAYS_SIZE / DICTIONARIES_SIZE))
+    print("  whole index: {0} bytes".format(deep_size(INDEX)))
@@ -0,0 +1,73 @@
+'''
+Compares term at a time scoring with impact-ordered postings read score
+at a time, exhaustively, in exact mode and with budgets of postings, on
+the CACM queries: time, postings read, overlap of the top 10 with the
+term at a time top 10 and precision of the 10 first results.
+
+Run from the root of the repository with:
+    python -m benchmarks.impact_index
+'''
+import sys
+from index.core import Index
+from index.core.impact_index import ImpactIndex
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryBM25
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, read_relevant, timed
+
+# Budgets of postings read per query.
+BUDGETS = [250, 500, 1000, 2000]
+
+
+def run_term_at_a_time(index, queries, model):
+    '''Returns the top 10 doc ids of each query scored term at a time.'''
+    return [[doc_id for (doc_id, _) in model(query).execute(index, 10)]
+            for query in queries]
+
+
+def run_impacts(impacts, queries, budget=None, k=10):
+    '''Returns the top k doc ids of each query and the postings read.'''
+    rankings = []
+    read_postings = 0
+    for query in queries:
+        rankings.append([doc_id for (doc_id, _) in impacts.execute(query, k, budget)])
+        read_postings += impacts.read_postings
+    return (rankings, read_postings)
+
+
+def report(name, duration, read_postings, rankings, expected, relevant):
+    '''Prints the time, postings read, overlap and precision of a run.'''
+    overlap = sum(len(set(ranking) & set(expected_ranking))
+                  for (ranking, expected_ranking) in zip(rankings, expected))
+    precision = sum(len(set(ranking) & set(query_relevant))
+                    for (ranking, query_relevant) in zip(rankings, relevant))
+    print("  {0}: {1:.3f} s, {2} postings read, top 10 overlap {3:.3f}, "
+          "P@10 {4:.3f}".format(name, duration, read_postings,
+                                overlap / (10 * len(rankings)),
+                                precision / (10 * len(rankings))))
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, result_cache_size=0)
+    RELEVANT = read_relevant()
+    QUERIES = [text for (query_id, text) in sorted(read_queries().items())
+               if query_id in RELEVANT]
+    QUERY_RELEVANT = [RELEVANT[query_id] for query_id in sorted(RELEVANT)
+                      if query_id in read_queries()]
+    for model in [VectorialQueryTfIdf, VectorialQueryBM25]:
+        impacts = ImpactIndex(INDEX, model)
+        (_, build_time) = timed(impacts.terms)
+        print("{0}: impacts built in {1:.2f} s".format(model.__name__, build_time))
+        (expected, duration) = timed(run_term_at_a_time, INDEX, QUERIES, model)
+        # Without early termination, every posting of the query terms is read.
+        ((rankings, read_postings), impacts_duration) = timed(
+            run_impacts, impacts, QUERIES, sys.maxsize)
+        report("term at a time", duration, read_postings, expected, expected,
+               QUERY_RELEVANT)
+        report("impacts, every posting", impacts_duration, read_postings,
+               rankings, expected, QUERY_RELEVANT)
+        ((rankings, read_postings), duration) = timed(run_impacts, impacts, QUERIES)
+        report("impacts, exact", duration, read_postings, rankings, expected, QUERY_RELEVANT)
+        for budget in BUDGETS:
+            ((rankings, read_postings), duration) = timed(
+                run_impacts, impacts, QUERIES, budget)
+            report("impacts, budget {0}".format(budget), duration, read_postings,
+                   rankings, expected, QUERY_RELEVANT)
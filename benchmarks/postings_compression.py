@@ -0,0 +1,60 @@
+'''
+Compares the memory use and decoding speed of postings stored as lists
+and as variable-byte CompressedPostings, on CACM and on a synthetic
+corpus the size of INEX 2007 (659,388 documents).
+
+Run from the root of the repository with:
+    python -m benchmarks.postings_compression [number_of_synthetic_docs]
+'''
+import sys
+from index.core import Index
+from index.core.postings import CompressedPostings
+from .common import CACM_PATH, COMMON_WORDS_PATH, deep_size, timed, zipf_postings
+
+INEX_DOCUMENTS = 659388
+SYNTHETIC_VOCABULARY = 100000
+
+
+def decode_all_lists(postings):
+    '''Reads every (doc id, frequency) pair of list postings.'''
+    count = 0
+    for (doc_ids, frequencies) in postings.values():
+        for _ in zip(doc_ids, frequencies):
+            count += 1
+    return count
+
+
+def decode_all_compressed(postings):
+    '''Reads every (doc id, frequency) pair of compressed postings.'''
+    count = 0
+    for compressed in postings.values():
+        for _ in compressed.with_frequencies():
+            count += 1
+    return count
+
+
+def run(name, postings):
+    '''Compresses a set of postings and prints memory and decoding speed.'''
+    (compressed, duration) = timed(lambda: {
+        term: CompressedPostings(doc_ids, frequencies)
+        for (term, (doc_ids, frequencies)) in postings.items()})
+    count = sum(len(doc_ids) for (doc_ids, _) in postings.values())
+    list_size = deep_size(postings)
+    compressed_size = deep_size(compressed)
+    (_, list_time) = timed(decode_all_lists, postings)
+    (_, compressed_time) = timed(decode_all_compressed, compressed)
+    print("{0}: {1} terms, {2} postings, compressed in {3:.2f} s".format(
+        name, len(postings), count, duration))
+    print("  memory: lists {0} bytes ({1:.1f} B/posting), "
+          "compressed {2} bytes ({3:.1f} B/posting)".format(
+              list_size, list_size / count, compressed_size, compressed_size / count))
+    print("  decoding: lists {0:.0f} postings/s, compressed {1:.0f} postings/s".format(
+        count / list_time, count / compressed_time))
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH)
+    run("CACM", {term: (INDEX._inverted_index[term], INDEX._frequencies[term])
+                 for term in INDEX._inverted_index})
+    NUMBER_OF_DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else INEX_DOCUMENTS
+    run("synthetic", zipf_postings(NUMBER_OF_DOCS, SYNTHETIC_VOCABULARY))
@@ -0,0 +1,42 @@
+'''
+Compares exhaustive and WAND-pruned top k queries on the CACM query set.
+
+Run from the root of the repository with:
+    python -m benchmarks.pruning
+'''
+from index.core import Index
+from index.core.scoring import MaxScoreScorer
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryProbabilistic
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed
+
+TOP_K = 10
+
+
+def run(index, queries, query_type, k=TOP_K):
+    '''Runs every query both ways and prints the pruning statistics.'''
+    exhaustive_time = 0.0
+    pruned_time = 0.0
+    postings = 0
+    skipped = 0
+    for query_text in queries.values():
+        query = query_type(query_text)
+        (_, duration) = timed(query.execute, index, k)
+        exhaustive_time += duration
+        scorer = MaxScoreScorer(index)
+        (_, duration) = timed(query.execute_pruned, index, k, scorer)
+        pruned_time += duration
+        postings += scorer.postings_count
+        skipped += scorer.skipped_postings()
+    print("{0}: {1} queries, top {2}".format(query_type.__name__, len(queries), k))
+    print("  postings skipped: {0} / {1} ({2:.1%})".format(
+        skipped, postings, skipped / postings if postings else 0))
+    print("  exhaustive: {0:.4f} s, pruned: {1:.4f} s, speedup: {2:.2f}x".format(
+        exhaustive_time, pruned_time,
+        exhaustive_time / pruned_time if pruned_time else 0))
+
+
+if __name__ == '__main__':
+    INDEX = Index(CACM_PATH, COMMON_WORDS_PATH)
+    QUERIES = read_queries()
+    run(INDEX, QUERIES, VectorialQueryTfIdf)
+    run(INDEX, QUERIES, VectorialQueryProbabilistic)
@@ -0,0 +1,41 @@
+'''
+Measures the throughput of tf-idf top 10 queries on CACM with and
+without the result cache, on a stream of CACM queries where a few
+queries come back often, following Zipf's law.
+
+Run from the root of the repository with:
+    python -m benchmarks.result_cache
+'''
+import random
+from index.core import Index
+from index.core.vectorial_query import VectorialQueryTfIdf
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed
+
+# Number of queries of the stream.
+STREAM_SIZE = 2000
+
+
+def query_stream(queries, size, seed=0):
+    '''Returns size queries drawn with a probability 1 / rank.'''
+    randomizer = random.Random(seed)
+    texts = list(queries.values())
+    weights = [1 / rank for rank in range(1, len(texts) + 1)]
+    return randomizer.choices(texts, weights, k=size)
+
+
+def run(index, stream):
+    '''Runs every query of the stream.'''
+    for text in stream:
+        VectorialQueryTfIdf(text).execute(index, 10)
+
+
+if __name__ == '__main__':
+    STREAM = query_stream(read_queries(), STREAM_SIZE)
+    for cache_size in [0, 16 * 1024 * 1024]:
+        INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, result_cache_size=cache_size)
+        (_, DURATION) = timed(run, INDEX, STREAM)
+        STATISTICS = INDEX.result_cache().statistics()
+        print("cache of {0} bytes: {1:.0f} queries/s, hit rate {2:.1%}, "
+              "{3} results in {4} bytes".format(
+                  cache_size, STREAM_SIZE / DURATION, STATISTICS['hit_rate'],
+                  STATISTICS['entries'], STATISTICS['size']))
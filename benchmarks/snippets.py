@@ -0,0 +1,33 @@
+'''
+Measures the time taken to build the snippets of a page of 10 results
+for the CACM queries, on an index without positions (terms found by the
+analyzer) and on a positional index (stored positions).
+
+Run from the root of the repository with:
+    python -m benchmarks.snippets
+'''
+from index.core import Index
+from index.core.vectorial_query import VectorialQueryTfIdf
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed
+
+# Number of results of a page.
+PAGE_SIZE = 10
+
+
+def snippet_pages(index, pages):
+    '''Builds the snippets of every page of (query, doc ids).'''
+    return [[index.snippet(doc_id, query) for doc_id in doc_ids]
+            for (query, doc_ids) in pages]
+
+
+if __name__ == '__main__':
+    QUERIES = read_queries()
+    for positional in [False, True]:
+        INDEX = Index(CACM_PATH, COMMON_WORDS_PATH, positional=positional)
+        PAGES = [(query, [doc_id for (doc_id, _)
+                          in VectorialQueryTfIdf(query).execute(INDEX, PAGE_SIZE)])
+                 for query in QUERIES.values()]
+        (_, DURATION) = timed(snippet_pages, INDEX, PAGES)
+        print("{0} index: {1:.2f} ms per page of {2} snippets ({3} queries)".format(
+            "positional" if positional else "non positional",
+            1000 * DURATION / len(PAGES), PAGE_SIZE, len(PAGES)))
@@ -0,0 +1,118 @@
+'''
+Compares the term at a time scorers of the vectorial models with the
+sparse matrix backend, on the CACM queries and on a synthetic corpus
+of one million documents following Zipf's law. Needs numpy and scipy.
+
+Run from the root of the repository with:
+    python -m benchmarks.sparse_backend
+'''
+import random
+from math import log10
+from index.core import Index
+from index.core.scoring import TermAtATimeScorer
+from index.core.sparse_backend import SparseBackend, DocumentTermMatrix, is_available
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, \
+    VectorialQueryProbabilistic
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed, zipf_postings
+
+# Size of the synthetic corpus.
+SYNTHETIC_DOCS = 1000000
+SYNTHETIC_TERMS = 20000
+SYNTHETIC_QUERIES = 20
+
+
+class PostingsIndex(object):
+
+    '''Minimal index over in-memory postings, read by TermAtATimeScorer.'''
+
+    def __init__(self, postings):
+        self._postings = postings
+
+    def postings_with_frequencies(self, term):
+        '''Returns the (doc_id, frequency) pairs of a term.'''
+        return zip(*self._postings[term]) if term in self._postings else []
+
+
+def run_queries(index, queries, model, k):
+    '''Executes the queries with the term at a time scorers.'''
+    return [model(query).execute(index, k) for query in queries]
+
+
+def run_backend(backend, queries, k):
+    '''Executes the queries one by one with the sparse backend.'''
+    return [backend.execute(query, k) for query in queries]
+
+
+def synthetic_tfidf(postings, number_of_docs, term):
+    '''Returns the tf-idf weights of a term of the synthetic corpus.'''
+    (doc_ids, frequencies) = postings[term]
+    idf = log10(number_of_docs / len(doc_ids))
+    return [log10(frequency + 1) * idf for frequency in frequencies]
+
+
+def run_synthetic_python(postings, queries, k):
+    '''Scores the synthetic queries term at a time with tf-idf weights.'''
+    index = PostingsIndex(postings)
+    results = []
+    for query in queries:
+        scorer = TermAtATimeScorer(index)
+        for term in query:
+            idf = log10(SYNTHETIC_DOCS / len(postings[term][0]))
+            scorer.accumulate(term, lambda doc_id, frequency, idf=idf:
+                              log10(frequency + 1) * idf)
+        results.append(scorer.top_k(k))
+    return results
+
+
+def benchmark_cacm():
+    '''Times the CACM queries for every model.'''
+    index = Index(CACM_PATH, COMMON_WORDS_PATH, result_cache_size=0)
+    queries = list(read_queries().values())
+    for model in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                  VectorialQueryProbabilistic]:
+        backend = SparseBackend(index, model)
+        (_, build_time) = timed(backend.matrix)
+        (_, python_time) = timed(run_queries, index, queries, model, 10)
+        (_, sparse_time) = timed(run_backend, backend, queries, 10)
+        (_, batch_time) = timed(backend.execute_batch, queries, 10)
+        print("CACM {0}: matrix built in {1:.2f} s, {2} queries: term at a time "
+              "{3:.3f} s, sparse {4:.3f} s ({5:.1f}x), sparse batch {6:.3f} s ({7:.1f}x)".format(
+                  model.__name__, build_time, len(queries), python_time, sparse_time,
+                  python_time / sparse_time, batch_time, python_time / batch_time))
+
+
+def benchmark_synthetic():
+    '''Times tf-idf queries on the synthetic corpus.'''
+    postings = zipf_postings(SYNTHETIC_DOCS, SYNTHETIC_TERMS)
+    terms = sorted(postings)
+    columns = dict((term, column) for (column, term) in enumerate(terms))
+    rows = []
+    term_columns = []
+    weights = []
+    for term in terms:
+        rows.extend(postings[term][0])
+        term_columns.extend([columns[term]] * len(postings[term][0]))
+        weights.extend(synthetic_tfidf(postings, SYNTHETIC_DOCS, term))
+    (matrix, build_time) = timed(DocumentTermMatrix, range(0, SYNTHETIC_DOCS), terms,
+                                 rows, term_columns, weights)
+    print("synthetic: {0} documents, {1} postings, matrix built in {2:.2f} s".format(
+        SYNTHETIC_DOCS, len(rows), build_time))
+    randomizer = random.Random(1)
+    # Rare terms have short postings, frequent ones have long postings.
+    for (name, ranks) in [("rare", 1000), ("frequent", 50)]:
+        queries = [["term{0}".format(randomizer.randint(1, ranks)) for _ in range(0, 5)]
+                   for _ in range(0, SYNTHETIC_QUERIES)]
+        weights = [dict((term, 1.0) for term in query) for query in queries]
+        (_, python_time) = timed(run_synthetic_python, postings, queries, 10)
+        (_, sparse_time) = timed(lambda: [matrix.top_k(query, 10) for query in weights])
+        (_, batch_time) = timed(matrix.top_k_batch, weights, 10)
+        print("  {0} {1} term queries: term at a time {2:.3f} s, sparse {3:.3f} s "
+              "({4:.1f}x), sparse batch {5:.3f} s ({6:.1f}x)".format(
+                  len(queries), name, python_time, sparse_time, python_time / sparse_time,
+                  batch_time, python_time / batch_time))
+
+if __name__ == '__main__':
+    if not is_available():
+        raise SystemExit("The sparse backend needs numpy and scipy.")
+    benchmark_cacm()
+    benchmark_synthetic()
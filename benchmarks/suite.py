@@ -0,0 +1,286 @@
+'''
+Measures the performance of the index and writes it as JSON: indexing
+throughput in documents and tokens per second on CACM and on a generated
+synthetic corpus, time to save and load the index as a pickled file and
+in the disk format, and the p50, p95 and p99 latencies of boolean queries
+and of the queries of every vectorial model over the CACM query set.
+The synthetic corpus is generated with a fixed seed and the result cache
+is disabled, so that two runs measure the same work.
+The compare mode reads two result files and flags the metrics that got
+worse by more than a threshold, exiting with status 1 if any did.
+
+Run from the root of the repository with:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite compare baseline.json results.json
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from index.core import Index
+from index.core.boolean_query import BooleanQuery
+from index.core.configuration import Configuration
+from index.core.index_serializer import IndexSerializer
+from index.core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, \
+    VectorialQueryProbabilistic, VectorialQueryBM25
+from .common import CACM_PATH, COMMON_WORDS_PATH, read_queries, timed
+
+# Version of the format of the result files.
+RESULTS_VERSION = 1
+# Number of documents of the synthetic corpus.
+SYNTHETIC_DOCUMENTS = 5000
+# Number of distinct words of the synthetic corpus.
+SYNTHETIC_VOCABULARY = 20000
+# Number of times indexing and serialization are measured, the median is kept.
+REPEAT = 3
+# Relative change of a metric beyond which it is a regression.
+THRESHOLD = 0.1
+# Latency percentiles of the queries.
+PERCENTILES = [50, 95, 99]
+# Number of words of the CACM queries kept in the boolean queries.
+BOOLEAN_WORDS = 3
+
+
+def metric(value, unit, higher_is_better):
+    '''Returns the JSON entry of a measure.'''
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def percentile(values, rank):
+    '''Returns the rank-th percentile of values, interpolated between the closest ones.'''
+    values = sorted(values)
+    position = (len(values) - 1) * rank / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def write_synthetic_corpus(path, number_of_docs, vocabulary_size, seed=0):
+    '''
+    Writes a corpus of documents in the CACM format, whose words are drawn
+    from a vocabulary of random words following Zipf's law.
+    '''
+    randomizer = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = list(set("".join(randomizer.choice(letters)
+                                  for _ in range(randomizer.randint(4, 10)))
+                          for _ in range(vocabulary_size)))
+    vocabulary.sort()
+    randomizer.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    with open(path, "w", encoding="utf8") as file_ptr:
+        for doc_id in range(1, number_of_docs + 1):
+            title = randomizer.choices(vocabulary, weights, k=randomizer.randint(3, 10))
+            words = randomizer.choices(vocabulary, weights, k=randomizer.randint(20, 200))
+            file_ptr.write(".I {0}\n.T\n{1}\n.W\n{2}\n".format(
+                doc_id, " ".join(title), " ".join(words)))
+
+
+def build_index(data_file, **options):
+    '''Builds an index, leaving out what indexing prints.'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Index(data_file, COMMON_WORDS_PATH, result_cache_size=0, **options)
+
+
+def measure_indexing(name, data_file, repeat):
+    '''Returns the indexing metrics of a corpus and its last index.'''
+    durations = []
+    for _ in range(repeat):
+        (index, duration) = timed(build_index, data_file)
+        durations.append(duration)
+    duration = statistics.median(durations)
+    tokens = sum(index.document_lengths().values())
+    prefix = 'indexing.{0}.'.format(name)
+    return ({
+        prefix + 'seconds': metric(duration, 's', False),
+        prefix + 'docs_per_second': metric(index.get_number_of_docs() / duration,
+                                           'docs/s', True),
+        prefix + 'tokens_per_second': metric(tokens / duration, 'tokens/s', True)
+    }, index)
+
+
+def measure_serialization(index, repeat):
+    '''Returns the times to save and load an index in both formats.'''
+    metrics = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for (name, path, save) in [
+                ('pickle', os.path.join(directory, 'index.pickle'),
+                 IndexSerializer.save_to_file),
+                ('disk', os.path.join(directory, 'index_disk'),
+                 IndexSerializer.save_to_directory)]:
+            save_durations = []
+            load_durations = []
+            for _ in range(repeat):
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                save_durations.append(timed(save, index, path)[1])
+                load_durations.append(timed(IndexSerializer.load_from_file, path)[1])
+            prefix = 'serialization.{0}.'.format(name)
+            metrics[prefix + 'save_seconds'] = metric(
+                statistics.median(save_durations), 's', False)
+            metrics[prefix + 'load_seconds'] = metric(
+                statistics.median(load_durations), 's', False)
+    finally:
+        shutil.rmtree(directory)
+    return metrics
+
+
+def boolean_queries(queries, stop_words):
+    '''
+    Returns boolean queries made of the first words of the CACM queries:
+    the conjunction and the disjunction of each query's first words.
+    '''
+    expressions = []
+    for text in queries:
+        words = [word for word in "".join(
+            character if character.isalpha() else " " for character in text.lower()).split()
+                 if len(word) > 2 and word not in stop_words][0:BOOLEAN_WORDS]
+        if words:
+            expressions.append(" * ".join(words))
+            expressions.append(" + ".join(words))
+    return expressions
+
+
+def latency_metrics(name, latencies):
+    '''Returns the percentiles of the latencies of a kind of query, in ms.'''
+    return dict(('latency.{0}.p{1}'.format(name, rank),
+                 metric(1000 * percentile(latencies, rank), 'ms', False))
+                for rank in PERCENTILES)
+
+
+def measure_latencies(index, queries, repeat):
+    '''Returns the latencies of the boolean and vectorial queries.'''
+    metrics = {}
+    with open(COMMON_WORDS_PATH) as file_ptr:
+        stop_words = set(file_ptr.read().split())
+    expressions = boolean_queries(queries, stop_words)
+    latencies = []
+    for _ in range(repeat):
+        for expression in expressions:
+            query = BooleanQuery(expression)
+            latencies.append(timed(query.execute, index)[1])
+    metrics.update(latency_metrics('boolean', latencies))
+    for model in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                  VectorialQueryProbabilistic, VectorialQueryBM25]:
+        latencies = []
+        for _ in range(repeat):
+            for text in queries:
+                latencies.append(timed(model(text).execute, index)[1])
+        metrics.update(latency_metrics(model.__name__, latencies))
+    return metrics
+
+
+def run_suite(synthetic_documents=SYNTHETIC_DOCUMENTS, repeat=REPEAT):
+    '''Runs every measure and returns the results.'''
+    metrics = {}
+    (cacm_metrics, index) = measure_indexing('cacm', CACM_PATH, repeat)
+    metrics.update(cacm_metrics)
+    directory = tempfile.mkdtemp()
+    try:
+        synthetic_path = os.path.join(directory, 'synthetic.all')
+        write_synthetic_corpus(synthetic_path, synthetic_documents, SYNTHETIC_VOCABULARY)
+        metrics.update(measure_indexing('synthetic', synthetic_path, repeat)[0])
+    finally:
+        shutil.rmtree(directory)
+    metrics.update(measure_serialization(index, repeat))
+    queries = list(read_queries().values())
+    # Every query is run once first so that the statistics are computed.
+    for text in queries:
+        VectorialQueryBM25(text).execute(index)
+    metrics.update(measure_latencies(index, queries, repeat))
+    return {
+        'version': RESULTS_VERSION,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processors': os.cpu_count(),
+            'indexing_processes': Configuration.number_of_threads,
+            'synthetic_documents': synthetic_documents,
+            'repeat': repeat
+        },
+        'metrics': metrics
+    }
+
+
+def compare_results(baseline, current, threshold=THRESHOLD):
+    '''
+    Compares the metrics of two results. Returns the (name, baseline value,
+    current value, relative change, regression) of the metrics found in
+    both, a regression being a change for the worse larger than threshold.
+    '''
+    comparisons = []
+    for name in sorted(set(baseline['metrics']) & set(current['metrics'])):
+        before = baseline['metrics'][name]
+        after = current['metrics'][name]
+        change = (after['value'] - before['value']) / before['value'] \
+            if before['value'] else 0.0
+        worse = -change if after['higher_is_better'] else change
+        comparisons.append((name, before['value'], after['value'], change,
+                            worse > threshold))
+    return comparisons
+
+
+def print_results(results):
+    '''Prints the metrics of results.'''
+    for (name, entry) in sorted(results['metrics'].items()):
+        print("{0}: {1:.4f} {2}".format(name, entry['value'], entry['unit']))
+
+
+def print_comparison(baseline, current, threshold):
+    '''Prints the comparison of two results and returns the number of regressions.'''
+    comparisons = compare_results(baseline, current, threshold)
+    for (name, before, after, change, regression) in comparisons:
+        print("{0}: {1:.4f} -> {2:.4f} ({3:+.1%}){4}".format(
+            name, before, after, change, "  REGRESSION" if regression else ""))
+    for name in sorted(set(baseline['metrics']) ^ set(current['metrics'])):
+        print("{0}: only in {1}".format(
+            name, "baseline" if name in baseline['metrics'] else "current"))
+    regressions = sum(1 for comparison in comparisons if comparison[4])
+    print("{0} regressions out of {1} metrics, threshold {2:.0%}".format(
+        regressions, len(comparisons), threshold))
+    return regressions
+
+
+def read_results(path):
+    '''Reads a result file.'''
+    with open(path, encoding="utf8") as file_ptr:
+        return json.load(file_ptr)
+
+
+def main(arguments):
+    '''Runs the suite or compares two result files, returns the exit status.'''
+    if arguments and arguments[0] == 'compare':
+        parser = argparse.ArgumentParser(prog='python -m benchmarks.suite compare')
+        parser.add_argument('baseline')
+        parser.add_argument('current')
+        parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help='relative change flagged as a regression')
+        options = parser.parse_args(arguments[1:])
+        regressions = print_comparison(read_results(options.baseline),
+                                       read_results(options.current), options.threshold)
+        return 1 if regressions else 0
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--output', help='JSON file written with the results')
+    parser.add_argument('--synthetic-documents', type=int, default=SYNTHETIC_DOCUMENTS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    options = parser.parse_args(arguments)
+    results = run_suite(options.synthetic_documents, options.repeat)
+    print_results(results)
+    if options.output:
+        with open(options.output, "w", encoding="utf8") as file_ptr:
+            json.dump(results, file_ptr, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
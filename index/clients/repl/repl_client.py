@@ -7,7 +7,8 @@ import traceback
 from ...core.index import Index
 from ...core.index_serializer import IndexSerializer
 from ...core.boolean_query import BooleanQuery
-from ...core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic
+from ...core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25
 from .command_line import CommandLine
 
 
@@ -23,13 +24,17 @@ class ReplClient(object):
         self.index = None
         self._actions = {
             'createIndex': CreateIndexAction,
+            'addFile': AddFileAction,
             'boolean': BooleanQueryAction,
+            'explainBoolean': ExplainBooleanQueryAction,
             'exit': EmptyAction,
             'saveIndex':  SaveIndexAction,
             'loadIndex': LoadIndexAction,
             'tfidfVectorial': VectorialQueryTfidfAction,
             'normCountVectorial': VectorialQueryNormCountAction,
-            'probabilisticVectorial': VectorialQueryProbabilisticAction
+            'probabilisticVectorial': VectorialQueryProbabilisticAction,
+            'bm25': VectorialQueryBM25Action,
+            'cacheStats': CacheStatisticsAction
         }
         self._command_line = CommandLine(
             autocomplete_actions=self._actions.keys())
@@ -92,21 +97,50 @@ class CreateIndexAction(Action):
 
     def __init__(self, client, arguments):
         self._client = client
-        if len(arguments) < 1 or len(arguments) > 2:
+        if len(arguments) < 1 or len(arguments) > 4:
+            raise ValueError(self.help())
+        options = arguments[2:]
+        if any(option not in ("positional", "store") for option in options):
             raise ValueError(self.help())
         self._data_files = arguments[0].split(";")
-        self._stop_words_file = arguments[1] if len(arguments) == 2 else ""
+        self._stop_words_file = arguments[1] if len(arguments) >= 2 else ""
+        self._positional = "positional" in options
+        self._store_documents = "store" in options
 
     def execute(self):
         print("Indexing files...")
         t_start = time.time()
-        self._client.index = Index(self._data_files, self._stop_words_file)
+        self._client.index = Index(self._data_files, self._stop_words_file,
+                                   positional=self._positional,
+                                   store_documents=self._store_documents)
         print("Index has been created in " +
               str(time.time() - t_start) + " seconds.")
 
     def help(self):
         return '''Wrong use.
-        Example: createIndex data_file1;data_file2 stop_word_file'''
+        Example: createIndex data_file1;data_file2 stop_word_file [positional] [store]'''
+
+
+class AddFileAction(Action):
+
+    def __init__(self, client, arguments):
+        if len(arguments) != 1:
+            raise ValueError(self.help())
+        if not client.index:
+            raise ValueError("Create or load an index first.")
+        self._index = client.index
+        self._path = arguments[0]
+
+    def execute(self):
+        print("Indexing file...")
+        t_start = time.time()
+        self._index.add_file(self._path)
+        print("File has been indexed in " +
+              str(time.time() - t_start) + " seconds.")
+
+    def help(self):
+        return '''Wrong use.
+        Example: addFile data_file'''
 
 
 class BooleanQueryAction(Action):
@@ -116,7 +150,7 @@ class BooleanQueryAction(Action):
             raise ValueError(self.help())
         if not client.index:
             raise ValueError("Create or load an index first.")
-        query_text = "".join(arguments)
+        query_text = " ".join(arguments)
         self._query = BooleanQuery(query_text)
         self._query.set_index(client.index)
         self.index = client.index
@@ -130,8 +164,7 @@ class BooleanQueryAction(Action):
         iterator = iter(docs)
         for i in range(0, min(len(docs), 10)):
             doc_id = next(iterator)
-            document = self.index.document_by_id(doc_id)
-            print("<" + str(doc_id) + "> - " + document.get_title())
+            print("<" + str(doc_id) + "> - " + self.index.document_title(doc_id))
         if len(docs) > 10:
             print("More than 10 results, the list has been truncated. \
                 Here is the full list of document ids:")
@@ -139,7 +172,17 @@ class BooleanQueryAction(Action):
 
     def help(self):
         return '''Wrong use.
-        Example: boolean (word1 * !word2) + word3'''
+        Example: boolean (word1 * !word2) + "word3 word4" + (word5 ~5 word6)'''
+
+
+class ExplainBooleanQueryAction(BooleanQueryAction):
+
+    def execute(self):
+        print(self._query.explain())
+
+    def help(self):
+        return '''Wrong use.
+        Example: explainBoolean (word1 * !word2) + word3'''
 
 
 class VectorialQueryAction(Action):
@@ -153,20 +196,18 @@ class VectorialQueryAction(Action):
             raise ValueError("Create or load an index first.")
         self.index = client.index
         self._query = None
+        self._query_text = " ".join(arguments)
 
     def execute(self):
         t_start = time.time()
-        docs = self._query.execute(self.index)
+        docs = self._query.execute(self.index, 10)
         duration = time.time() - t_start
         print("Query executed in " + str(duration) +
-              " seconds and returned " + str(len(docs)) + " results.")
-        for (k, value) in docs[0:10]:
-            document = self.index.document_by_id(k)
-            print("<" + str(k) + "> - " + document.get_title())
-        if len(docs) > 10:
-            print("More than 10 results, the list has been truncated. \
-                Here is the list of the 10 first results with weights:")
-        print(docs[0:10])
+              " seconds and returned the " + str(len(docs)) + " best results.")
+        for (k, value) in docs:
+            print("<" + str(k) + "> - " + self.index.document_title(k))
+            print("    " + self.index.snippet(k, self._query_text))
+        print(docs)
 
     def help(self):
         pass
@@ -207,6 +248,18 @@ class VectorialQueryProbabilisticAction(VectorialQueryAction):
         Example: probabilisticVectorial this is a vectorial query'''
 
 
+class VectorialQueryBM25Action(VectorialQueryAction):
+
+    def __init__(self, client, arguments):
+        super(VectorialQueryBM25Action, self).__init__(client, arguments)
+        query_text = " ".join(arguments)
+        self._query = VectorialQueryBM25(query_text)
+
+    def help(self):
+        return '''Wrong use.
+        Example: bm25 this is a vectorial query'''
+
+
 class SaveIndexAction(Action):
 
     def __init__(self, client, arguments):
@@ -216,17 +269,22 @@ class SaveIndexAction(Action):
             raise ValueError("Create or load an index first.")
         self._index = client.index
         self._path = arguments[0]
+        self._memory_mapped = len(arguments) > 1 and arguments[1] == "mmap"
 
     def execute(self):
         print("Saving index...")
         start_time = time.time()
-        IndexSerializer.save_to_file(self._index, self._path)
+        if self._memory_mapped:
+            IndexSerializer.save_to_directory(self._index, self._path)
+        else:
+            IndexSerializer.save_to_file(self._index, self._path)
         dur = time.time() - start_time
         print("Index saved in " + str(dur) + " seconds.")
 
     def help(self):
         return '''Wrong use.
-        Example: saveIndex path/to/output/file'''
+        Example: saveIndex path/to/output/file
+        Example: saveIndex path/to/output/directory mmap'''
 
 
 class LoadIndexAction(Action):
@@ -246,4 +304,27 @@ class LoadIndexAction(Action):
 
     def help(self):
         return '''Wrong use.
-        Example: saveIndex path/to/output/file'''
+        Example: loadIndex path/to/saved/file_or_directory'''
+
+
+class CacheStatisticsAction(Action):
+
+    def __init__(self, client, arguments):
+        if arguments:
+            raise ValueError(self.help())
+        if not client.index:
+            raise ValueError("Create or load an index first.")
+        self._index = client.index
+
+    def execute(self):
+        statistics = self._index.result_cache().statistics()
+        print("Result cache: {0} hits, {1} misses ({2:.1%} hit rate), "
+              "{3} evictions, {4} invalidations.".format(
+                  statistics['hits'], statistics['misses'], statistics['hit_rate'],
+                  statistics['evictions'], statistics['invalidations']))
+        print("{0} results cached in {1} of {2} bytes.".format(
+            statistics['entries'], statistics['size'], statistics['max_size']))
+
+    def help(self):
+        return '''Wrong use.
+        Example: cacheStats'''
@@ -1,11 +1,12 @@
 '''
 Generate statistics for all models on the index.
 '''
-from math import ceil
 from pylab import *
 import time
 from ...core.index import Index
-from ...core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic
+from ...core.evaluation import evaluate_run, evaluate_runs
+from ...core.vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25
 
 
 def generate_recall_precision_graph(x_data, y_data, chart_title, output_folder):
@@ -35,6 +36,7 @@ class StatsGenerator(object):
         self._queries_path = ""
         self._query_results_path = ""
         self._iterations = 100
+        self._processes = 1
 
     def set_query_path(self, queries_path, query_results_path):
         '''
@@ -63,6 +65,13 @@ class StatsGenerator(object):
         '''
         self._iterations = iterations
 
+    def set_processes(self, processes):
+        '''
+        Sets the number of processes evaluating the runs of the models.
+        The runs are evaluated in the current process by default.
+        '''
+        self._processes = processes
+
     def compute_statistics(self):
         '''
         Compute statistics on the index and saves results.
@@ -80,23 +89,25 @@ class StatsGenerator(object):
         ))
 
         print('Running queries...')
-        start_time = time.time()
-        generator = RecallPrecisionGenerator(index, VectorialQueryTfIdf, queries, expected)
-        (recall, prec) = generator.generate(self._iterations)
-        generate_recall_precision_graph(recall, prec, 'tfidf', self._output_folder)
-        print('TFIDF queries ran in {0:.4f} seconds.'.format(time.time() - start_time))
-
-        start_time = time.time()
-        generator = RecallPrecisionGenerator(index, VectorialQueryNormCount, queries, expected)
-        (recall, prec) = generator.generate(self._iterations)
-        generate_recall_precision_graph(recall, prec, 'normalized_frequency', self._output_folder)
-        print('Normalized freq. queries ran in {0:.4f} seconds.'.format(time.time() - start_time))
-
-        start_time = time.time()
-        generator = RecallPrecisionGenerator(index, VectorialQueryProbabilistic, queries, expected)
-        (recall, prec) = generator.generate(self._iterations)
-        generate_recall_precision_graph(recall, prec, 'probabilistic', self._output_folder)
-        print('Probabilistic queries ran in {0:.4f} seconds.'.format(time.time() - start_time))
+        runs = {}
+        for (name, label, query_type) in [
+                ('tfidf', 'TFIDF', VectorialQueryTfIdf),
+                ('normalized_frequency', 'Normalized freq.', VectorialQueryNormCount),
+                ('probabilistic', 'Probabilistic', VectorialQueryProbabilistic),
+                ('bm25', 'BM25', VectorialQueryBM25)]:
+            start_time = time.time()
+            generator = RecallPrecisionGenerator(index, query_type, queries, expected)
+            runs[name] = generator.results()
+            print('{0} queries ran in {1:.4f} seconds.'.format(label, time.time() - start_time))
+
+        print('Evaluating results...')
+        evaluations = evaluate_runs(runs, expected, processes=self._processes)
+        for (name, evaluation) in evaluations.items():
+            generate_recall_precision_graph(evaluation['recalls'], evaluation['precisions'],
+                                            name, self._output_folder)
+            print('{0}: MAP {1:.4f}, P@10 {2:.4f}, nDCG@10 {3:.4f}'.format(
+                name, evaluation['mean_average_precision'], evaluation['precision'],
+                evaluation['ndcg']))
 
     def _read_queries(self):
         '''
@@ -150,49 +161,21 @@ class RecallPrecisionGenerator(object):
         Generates (recall_list, prec_list) that give the results of
         several computations averaged over all the test requests.
         '''
-        recalls = [x/10 for x in range(0, 11)]
-        prec_average = [[] for x in range(0, 11)]
-        for query_id in self._queries:
-            recall_prec_list = []
-            for percentage in range(1, 100):
-                recall_prec_list.append(self._compute_recall_and_precision(query_id, percentage*0.001))
-            for percentage in range(1, 100):
-                recall_prec_list.append(self._compute_recall_and_precision(query_id, percentage))
-            for idx in range(0, 11):
-                precisions_for_recall = [prec for (recall, prec) in recall_prec_list if recalls[idx] <= recall ]
-                if precisions_for_recall:
-                    prec_average[idx].append(max(precisions_for_recall))
-        prec_average = [sum(l)/len(l) for l in prec_average]
-        return (recalls, prec_average)
-
-
-
-        
-    def _compute_recall_and_precision(self, query_id, percentage):
-        '''
-        Computes recall and precision for a single query.
-        Percentage argument tells how many results should be considered.
-        '''
-        pertinent = self._expected[query_id] if query_id in self._expected else []
-        pertinent_len = len(pertinent)
-
-        query_results = self._get_query_results(query_id)
-        results_len = len(query_results)
-        top = int(ceil(results_len*percentage/100))
-        query_results = query_results[0:top]
-        results_len = top
-        pertinent_found = len([k for k in pertinent if k in [x for (x, y) in query_results]])
+        evaluation = evaluate_run(self.results(), self._expected)
+        return (evaluation['recalls'], evaluation['precisions'])
 
-        recall = pertinent_found / pertinent_len if pertinent_len > 0 else 1.0
-        precision = pertinent_found / results_len
-        return (recall, precision)
+    def results(self):
+        '''Returns the results of the test requests by query id.'''
+        self._execute_queries()
+        return dict((query_id, self._results[query_id]) for query_id in self._queries)
 
-    def _get_query_results(self, query_id):
+    def _execute_queries(self):
         '''
-        Gets the result of a query.
-        Does not re-run the query if the result was stored.
+        Runs the queries that were not run yet in a single batch,
+        reading the postings of each query term once.
         '''
-        if query_id not in self._results:
-            query_tfidf = self._query_type(self._queries[query_id])
-            self._results[query_id] = query_tfidf.execute(self._index)
-        return self._results[query_id]
+        query_ids = [query_id for query_id in self._queries
+                     if query_id not in self._results]
+        results = self._index.execute_batch(
+            [self._queries[query_id] for query_id in query_ids], self._query_type)
+        self._results.update(zip(query_ids, results))
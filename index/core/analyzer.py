@@ -0,0 +1,145 @@
+'''
+Provides the analyzer that turns texts into the terms of an index,
+as a pipeline of a tokenizer and filtering stages.
+'''
+import re
+from functools import lru_cache
+from .configuration import Configuration
+
+# Number of distinct words whose stem is remembered by a StemFilter.
+STEM_CACHE_SIZE = 1 << 16
+
+
+class RegexTokenizer(object):
+
+    '''
+    Splits a text into words around spaces and non-alphanumeric
+    characters, with a single precompiled regular expression.
+    '''
+
+    def __init__(self, pattern=r"\w+"):
+        self._regex = re.compile(pattern)
+
+    def __call__(self, content):
+        return self._regex.findall(content)
+
+    def spans(self, content):
+        '''Returns the (start, end) offsets of the words of a text.'''
+        return [match.span() for match in self._regex.finditer(content)]
+
+
+class LowercaseFilter(object):
+
+    '''Lowercases the words.'''
+
+    def __call__(self, words):
+        return [word and word.lower() for word in words]
+
+
+class StopFilter(object):
+
+    '''Removes the stop words, looked up in a frozenset.'''
+
+    def __init__(self, stop_words=None):
+        self._stop_words = frozenset(stop_words if stop_words else [])
+
+    def __call__(self, words):
+        stop_words = self._stop_words
+        return [None if word in stop_words else word for word in words]
+
+
+class StemFilter(object):
+
+    '''
+    Replaces the words by their stem.
+    Stems are memoized in a least recently used cache of cache_size
+    words, so that frequent words are only stemmed once.
+    '''
+
+    def __init__(self, stemmer=None, cache_size=STEM_CACHE_SIZE):
+        self._stemmer = stemmer if stemmer else Configuration.stemmer
+        self._cache_size = cache_size
+        self._stem = lru_cache(maxsize=cache_size)(self._stemmer.stem_word)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # The cache is rebuilt when the filter is unpickled.
+        del state['_stem']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stem = lru_cache(maxsize=self._cache_size)(self._stemmer.stem_word)
+
+    def __call__(self, words):
+        stem = self._stem
+        return [word and stem(word) for word in words]
+
+    def statistics(self):
+        '''Returns the hits, misses and hit rate of the stem cache.'''
+        info = self._stem.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / lookups if lookups else 0.0
+        }
+
+
+class Analyzer(object):
+
+    '''
+    Turns a text into its terms.
+    The text is split into words by a tokenizer, then every stage maps
+    the list of words to a list of the same length, where removed words
+    are replaced by None so that the remaining words keep their position.
+    The default stages lowercase the words, remove stop words and stem
+    the words with the stemmer, Configuration.stemmer by default.
+    '''
+
+    def __init__(self, stop_words=None, stemmer=None, tokenizer=None,
+                 stages=None):
+        self._tokenizer = tokenizer if tokenizer else RegexTokenizer()
+        if stages is None:
+            stages = [LowercaseFilter(), StopFilter(stop_words),
+                      StemFilter(stemmer)]
+        self._stages = stages
+
+    def analyze(self, content):
+        '''Returns the list of the terms of a text.'''
+        return [term for term in self._run(self._tokenizer(content))
+                if term is not None]
+
+    def analyze_positions(self, content):
+        '''
+        Returns the list of (position, term) of a text.
+        Removed words still count in positions, so that removing
+        stop words does not bring other words closer.
+        '''
+        return [(position, term)
+                for (position, term) in enumerate(self._run(self._tokenizer(content)))
+                if term is not None]
+
+    def spans(self, content):
+        '''
+        Returns the (start, end) offsets in a text of the words counted
+        by analyze_positions, so that a position gives back its word.
+        '''
+        return self._tokenizer.spans(content)
+
+    def term(self, word):
+        '''
+        Returns the term of a single word without tokenizing it,
+        or None when the word is removed.
+        '''
+        return self._run([word])[0]
+
+    def statistics(self):
+        '''Returns the statistics of the stages that keep some, by stage name.'''
+        return {type(stage).__name__: stage.statistics()
+                for stage in self._stages if hasattr(stage, 'statistics')}
+
+    def _run(self, words):
+        for stage in self._stages:
+            words = stage(words)
+        return words
@@ -3,11 +3,16 @@ Provides classes to create and execute a boolean query on an index.
 '''
 import re
 from pyparsing import nestedExpr
+from .postings import intersect, union, difference
 
 
 class AbstractOperator(object):
 
-    ''' Boolean operator base class.'''
+    '''
+    Boolean operator base class.
+    Operators work on postings sorted by doc id
+    and return a sorted list of doc ids.
+    '''
 
     def __init__(self):
         pass
@@ -23,26 +28,52 @@ class OperatorOr(AbstractOperator):
     '''
     Or operator.
     '''
+    name = 'OR'
+
     @staticmethod
     def apply_operator(operands):
-        return {posting for op in operands for posting in op.get_postings()}
+        return union([op.get_sorted_postings() for op in operands])
 
 
 class OperatorAnd(AbstractOperator):
 
     '''
     And operator.
+    Operands are intersected in order, so the cheapest ones should come
+    first, and the evaluation stops as soon as the result is empty.
+    Intersections iterate the shortest postings while the other ones are
+    skipped forward with galloping search or skip pointers.
     '''
+    name = 'AND'
+
     @staticmethod
     def apply_operator(operands):
-        all_postings = set()
-        for (idx, operand) in enumerate(operands):
-            postings = operand.get_postings()
-            if idx > 0:
-                all_postings = all_postings.intersection(set(postings))
-            else:
-                all_postings = set(postings)
-        return all_postings
+        result = None
+        for operand in operands:
+            if result is not None and not result:
+                return []
+            postings = operand.get_sorted_postings()
+            result = postings if result is None else intersect([result, postings])
+        return result if result is not None else []
+
+
+class OperatorAndNot(AbstractOperator):
+
+    '''
+    Difference operator, produced by the query planner.
+    Returns the postings of the first operand that are in none
+    of the other operands.
+    '''
+    name = 'AND NOT'
+
+    @staticmethod
+    def apply_operator(operands):
+        result = operands[0].get_sorted_postings()
+        for operand in operands[1:]:
+            if not result:
+                return []
+            result = difference(result, operand.get_sorted_postings())
+        return result
 
 
 class OperatorNot(AbstractOperator):
@@ -50,13 +81,84 @@ class OperatorNot(AbstractOperator):
     '''
     Not operator.
     '''
+    name = 'NOT'
+
     @staticmethod
     def apply_operator(operands):
         if len(operands) != 1:
             raise ValueError("The NOT operator should be \
                 used with exactly one operand")
-        all_docs = set(operands[0].index.get_all_doc_ids())
-        return all_docs.difference(operands[0].get_postings())
+        all_docs = sorted(operands[0].index.get_all_doc_ids())
+        return difference(all_docs, operands[0].get_sorted_postings())
+
+
+class OperatorNear(AbstractOperator):
+
+    '''
+    Near operator.
+    Matches the documents where both words appear within
+    a maximum distance of each other.
+    '''
+
+    def __init__(self, distance):
+        super().__init__()
+        self.distance = distance
+
+    def __str__(self):
+        return '~' + str(self.distance)
+
+    @property
+    def name(self):
+        '''Name of the operator in query plans.'''
+        return 'NEAR ' + str(self.distance)
+
+    def apply_operator(self, operands):
+        if len(operands) != 2 or not all(
+                isinstance(operand, WordLeaf) for operand in operands):
+            raise ValueError("The NEAR operator should be \
+                used between two words")
+        index = operands[0].index
+        terms = [operand.get_term() for operand in operands]
+        if None in terms:
+            return []
+        candidates = OperatorAnd.apply_operator(operands)
+        return [doc_id for doc_id in candidates
+                if _are_near(index.positions(terms[0], doc_id),
+                             index.positions(terms[1], doc_id),
+                             self.distance)]
+
+
+def _are_near(left, right, distance):
+    '''
+    Returns True if two sorted position lists have positions
+    at most distance apart, merging both lists.
+    '''
+    i = 0
+    j = 0
+    while i < len(left) and j < len(right):
+        if abs(left[i] - right[j]) <= distance:
+            return True
+        if left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+def _shifted_intersection(left, right, shift):
+    '''
+    Returns the positions of the sorted list left for which
+    position + shift is in the sorted list right, merging both lists.
+    '''
+    result = []
+    j = 0
+    for position in left:
+        target = position + shift
+        while j < len(right) and right[j] < target:
+            j += 1
+        if j < len(right) and right[j] == target:
+            result.append(position)
+    return result
 
 
 class OperatorNode(object):
@@ -69,6 +171,7 @@ class OperatorNode(object):
         else:
             self._operands = operands
         self._operator = operator
+        self.index = None
 
     def __str__(self):
         return ('{operator: ' + str(self._operator) + ', operands: ['
@@ -80,14 +183,38 @@ class OperatorNode(object):
 
     def get_postings(self):
         '''Returns the result of apply the operator node.'''
+        return set(self.get_sorted_postings())
+
+    def get_sorted_postings(self):
+        '''Returns the result of apply the operator node, sorted by doc id.'''
         return self._operator.apply_operator(self._operands)
 
     def add_operand(self, operand):
         '''Add an operand to the operator.'''
         self._operands.append(operand)
 
+    def get_operator(self):
+        '''Returns the operator applied by the node.'''
+        return self._operator
+
+    def get_operands(self):
+        '''Returns the operands of the node.'''
+        return self._operands
+
+    def cache_key(self):
+        '''
+        Returns a key identifying the documents matched by the node,
+        built from the analyzed terms of its leaves. The operands of
+        AND and OR are sorted, as their order does not change the result.
+        '''
+        keys = [operand.cache_key() for operand in self._operands]
+        if self._operator in (OperatorAnd, OperatorOr):
+            keys.sort(key=repr)
+        return (self._operator.name, tuple(keys))
+
     def set_index(self, index):
         '''Recursively sets the index for the node and its children.'''
+        self.index = index
         for operand in self._operands:
             operand.set_index(index)
 
@@ -108,17 +235,225 @@ class WordLeaf(object):
 
     def get_postings(self):
         '''Returns the result of apply the operator node.'''
-        return {doc_id for doc_id in self.index.search(self._word)}
+        return set(self.get_sorted_postings())
+
+    def get_sorted_postings(self):
+        '''Returns the postings of the word, sorted by doc id.'''
+        return self.index.search(self._word)
+
+    def estimate_size(self):
+        '''
+        Returns the number of documents containing the word,
+        read from its document frequency.
+        '''
+        term = self.index.analyzer().term(self._word)
+        return self.index.document_frequency(term) if term is not None else 0
+
+    def get_term(self):
+        '''
+        Returns the word tokenized like the indexed documents,
+        or None if it is a stop word.
+        '''
+        terms = self.index.get_positioned_terms(self._word)
+        return terms[0][1] if terms else None
+
+    def cache_key(self):
+        '''
+        Returns a key identifying the documents containing the word:
+        its term, searched in the postings, and its tokenized term,
+        whose positions are compared by the NEAR operator.
+        '''
+        return ('WORD', self.index.analyzer().term(self._word), self.get_term())
 
     def set_index(self, index):
         '''Recursively sets the index for the node and its children.'''
         self.index = index
 
 
+class PhraseLeaf(object):
+
+    '''
+    Leaf in the boolean query execution tree matching
+    the documents that contain a phrase.
+    '''
+
+    def __init__(self, phrase):
+        self.index = None
+        self._phrase = phrase
+
+    def __str__(self):
+        return '"' + self._phrase + '"'
+
+    def __unicode__(self):
+        return unicode(str(self))
+
+    def get_postings(self):
+        '''Returns the result of apply the operator node.'''
+        return set(self.get_sorted_postings())
+
+    def get_sorted_postings(self):
+        '''
+        Returns the documents containing all the words of the phrase,
+        then keeps the ones where their positions follow the phrase.
+        '''
+        terms = self.index.get_positioned_terms(self._phrase)
+        if not terms:
+            return []
+        if len(terms) == 1:
+            return self.index.postings(terms[0][1])
+        candidates = intersect([self.index.postings(term) for (_, term) in terms])
+        return [doc_id for doc_id in candidates
+                if self._matches(doc_id, terms)]
+
+    def estimate_size(self):
+        '''Returns an upper bound of the number of documents matching.'''
+        terms = self.index.get_positioned_terms(self._phrase)
+        if not terms:
+            return 0
+        return min(self.index.document_frequency(term) for (_, term) in terms)
+
+    def cache_key(self):
+        '''
+        Returns a key identifying the documents containing the phrase:
+        its terms with their position relative to the first term.
+        '''
+        terms = self.index.get_positioned_terms(self._phrase)
+        first_position = terms[0][0] if terms else 0
+        return ('PHRASE', tuple((position - first_position, term)
+                                for (position, term) in terms))
+
+    def set_index(self, index):
+        '''Recursively sets the index for the node and its children.'''
+        self.index = index
+
+    def _matches(self, doc_id, terms):
+        '''Returns True if the phrase appears in a document.'''
+        (first_position, first_term) = terms[0]
+        starts = self.index.positions(first_term, doc_id)
+        for (position, term) in terms[1:]:
+            starts = _shifted_intersection(
+                starts, self.index.positions(term, doc_id),
+                position - first_position)
+            if not starts:
+                return False
+        return True
+
+
+def _is_not(node):
+    '''Returns True if a node applies the NOT operator.'''
+    return isinstance(node, OperatorNode) and node.get_operator() is OperatorNot
+
+
+class BooleanQueryPlanner(object):
+
+    '''
+    Rewrites a parsed boolean query into a cheaper execution plan:
+    - nested AND and OR nodes are flattened,
+    - double negations are removed,
+    - AND operands are sorted by increasing estimated number of results,
+    - NOT operands of an AND become a difference (a * !b is a AND NOT b),
+      so that the list of all documents is not built,
+    - an AND of NOT operands becomes the NOT of an OR (De Morgan).
+    The estimated sizes use the postings lengths of the index.
+    '''
+
+    def __init__(self, index):
+        self._index = index
+
+    def plan(self, node):
+        '''
+        Returns the execution plan of a parsed query tree.
+        The parsed tree is not modified, leaves are shared.
+        '''
+        if not isinstance(node, OperatorNode):
+            return node
+        operator = node.get_operator()
+        operands = [self.plan(operand) for operand in node.get_operands()]
+        if operator is OperatorNot:
+            if _is_not(operands[0]):
+                return operands[0].get_operands()[0]
+            return self._node(OperatorNot, operands)
+        if operator is OperatorAnd or operator is OperatorOr:
+            operands = self._flatten(operator, operands)
+            if len(operands) == 1:
+                return operands[0]
+        if operator is OperatorAnd:
+            return self._plan_and(operands)
+        return self._node(operator, operands)
+
+    def estimate(self, node):
+        '''Estimates the number of documents returned by a node.'''
+        if not isinstance(node, OperatorNode):
+            return node.estimate_size()
+        operator = node.get_operator()
+        estimates = [self.estimate(operand) for operand in node.get_operands()]
+        number_of_docs = self._index.get_number_of_docs()
+        if operator is OperatorOr:
+            return min(sum(estimates), number_of_docs)
+        if operator is OperatorNot:
+            return number_of_docs - estimates[0]
+        if operator is OperatorAndNot:
+            return estimates[0]
+        return min(estimates)
+
+    def explain(self, node, depth=0):
+        '''Returns a readable description of a plan with its estimates.'''
+        if isinstance(node, OperatorNode):
+            label = node.get_operator().name
+            children = [self.explain(operand, depth + 1)
+                        for operand in node.get_operands()]
+        else:
+            label = str(node)
+            children = []
+        line = '{0}{1} (~{2} docs)'.format('  ' * depth, label, self.estimate(node))
+        return '\n'.join([line] + children)
+
+    def _node(self, operator, operands):
+        '''Creates a plan node working on the index.'''
+        node = OperatorNode(operator, operands)
+        node.index = self._index
+        return node
+
+    @staticmethod
+    def _flatten(operator, operands):
+        '''Merges the operands of children applying the same operator.'''
+        flat = []
+        for operand in operands:
+            if isinstance(operand, OperatorNode) and operand.get_operator() is operator:
+                flat.extend(operand.get_operands())
+            else:
+                flat.append(operand)
+        return flat
+
+    def _plan_and(self, operands):
+        '''
+        Sorts the operands of an AND by estimated size and
+        turns its NOT operands into a difference.
+        '''
+        positives = sorted([operand for operand in operands if not _is_not(operand)],
+                           key=self.estimate)
+        # The largest exclusions come first, they shrink the result the most.
+        negatives = sorted([operand.get_operands()[0] for operand in operands
+                            if _is_not(operand)],
+                           key=self.estimate, reverse=True)
+        if not positives:
+            excluded = negatives[0] if len(negatives) == 1 \
+                else self._node(OperatorOr, negatives)
+            return self._node(OperatorNot, [excluded])
+        positive = positives[0] if len(positives) == 1 \
+            else self._node(OperatorAnd, positives)
+        if not negatives:
+            return positive
+        return self._node(OperatorAndNot, [positive] + negatives)
+
+
 class BooleanExpressionParser(object):
 
     '''
     Parses a boolean expression and creates the execution tree.
+    Besides the boolean operators, a positional index can be queried
+    with phrases ("word1 word2") and with the near operator
+    (word1 ~5 word2) that matches words at most 5 positions apart.
     '''
 
     def __init__(self):
@@ -146,23 +481,50 @@ class BooleanExpressionParser(object):
         '''
         Formats an expression by removing whitespace.
         '''
+        expression = re.sub(r'"([^"]*)"', self._format_phrase, expression)
+        expression = re.sub(r'~\s*(\d+)', r'~\1~', expression)
         expression = '(' + re.sub(r'[\s]', '', expression) + ')'
-        op_pattern = r'([{0}{1}])'.format(
+        op_pattern = r'(~\d+~|[{0}{1}])'.format(
             "".join(self._binary_operators.keys()),
             "".join(self._unary_operators.keys()))
         expression = re.sub(op_pattern, r" \1 ", expression)
         return expression
 
+    @staticmethod
+    def _format_phrase(match):
+        '''
+        Joins the words of a quoted phrase with dots,
+        so that the phrase is kept as a single token.
+        '''
+        words = re.findall(r'\w+', match.group(1))
+        if not words:
+            raise ValueError("Empty phrase")
+        return '"' + '.'.join(words) + '"'
+
+    def _is_binary_operator(self, item):
+        '''Returns True if a parsed item is a binary operator.'''
+        return isinstance(item, str) and (
+            item in self._binary_operators
+            or re.match(r'^~\d+~$', item) is not None)
+
+    def _binary_operator(self, item):
+        '''Returns the operator corresponding to a binary operator item.'''
+        if item in self._binary_operators:
+            return self._binary_operators[item]
+        return OperatorNear(int(item.strip('~')))
+
     def _create_operator(self, nested_item):
         '''
         Returns the root operator corresponding to a list of words,
         operators, and nested expressions.
         '''
         if isinstance(nested_item, str):
-            is_operator = nested_item in self._binary_operators
+            is_operator = self._is_binary_operator(nested_item)
             is_operator = is_operator or nested_item in self._unary_operators
             if is_operator:
                 return nested_item
+            elif nested_item.startswith('"'):
+                return PhraseLeaf(nested_item.strip('"').replace('.', ' '))
             else:
                 return WordLeaf(nested_item)
         if isinstance(nested_item, list):
@@ -213,12 +575,12 @@ class BooleanExpressionParser(object):
         root = operators[0]
         for i in range(1, len(operators)):
             operator = operators[i]
-            if operator in self._binary_operators:
+            if self._is_binary_operator(operator):
                 if i - 1 < 0 or i + 1 >= len(operators):
                     raise ValueError("Binary operator should \
                         be between its operands.")
                 root = OperatorNode(
-                    operator=self._binary_operators[operator],
+                    operator=self._binary_operator(operator),
                     operands=[root])
             else:
                 root.add_operand(operator)
@@ -230,20 +592,40 @@ class BooleanQuery(object):
     '''
     Represents a boolean query.
     The query can use the * (and), + (or) and ! (not) operators.
+    Phrases ("a b") and the near operator (a ~5 b) need a positional index.
     '''
 
     def __init__(self, query, parser=BooleanExpressionParser()):
         self._root = parser.parse_expression(query)
+        self._index = None
 
     def execute(self, index=None):
-        '''Executes the query and returns the postings.'''
+        '''
+        Executes the query plan and returns the postings.
+        The results are kept in the result cache of the index.
+        '''
         if index:
             self.set_index(index)
-        if self._root:
-            return self._root.get_postings()
-        else:
+        if not self._root:
             raise ValueError("There is no valid boolean query to execute.")
+        return self._index.result_cache().cached(
+            ('BooleanQuery', self._root.cache_key()), self._index.version(),
+            lambda: set(self._plan().get_sorted_postings()))
+
+    def explain(self, index=None):
+        '''Returns a description of the plan chosen to execute the query.'''
+        plan = self._plan(index)
+        return BooleanQueryPlanner(self._index).explain(plan)
 
     def set_index(self, index):
         '''Set the index used for the query.'''
+        self._index = index
         self._root.set_index(index)
+
+    def _plan(self, index=None):
+        '''Returns the execution plan of the query.'''
+        if index:
+            self.set_index(index)
+        if not self._root:
+            raise ValueError("There is no valid boolean query to execute.")
+        return BooleanQueryPlanner(self._index).plan(self._root)
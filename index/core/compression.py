@@ -0,0 +1,58 @@
+'''
+Provides integer compression functions used to store
+postings and positions.
+'''
+
+
+def encode_vbyte(numbers):
+    '''
+    Encodes a list of non negative integers with variable-byte coding.
+    Each number is split in groups of 7 bits, most significant first,
+    and the high bit marks the last byte of a number.
+    '''
+    result = bytearray()
+    for number in numbers:
+        groups = [number & 0x7F | 0x80]
+        number >>= 7
+        while number:
+            groups.append(number & 0x7F)
+            number >>= 7
+        groups.reverse()
+        result.extend(groups)
+    return bytes(result)
+
+
+def decode_vbyte(data):
+    '''Decodes a variable-byte encoded sequence into a list of integers.'''
+    numbers = []
+    number = 0
+    for byte in data:
+        if byte & 0x80:
+            numbers.append(number << 7 | byte & 0x7F)
+            number = 0
+        else:
+            number = number << 7 | byte
+    return numbers
+
+
+def encode_deltas(sorted_numbers):
+    '''
+    Encodes a sorted list of non negative integers as
+    variable-byte coded gaps between consecutive numbers.
+    '''
+    previous = 0
+    gaps = []
+    for number in sorted_numbers:
+        gaps.append(number - previous)
+        previous = number
+    return encode_vbyte(gaps)
+
+
+def decode_deltas(data):
+    '''Decodes gaps encoded by encode_deltas into the sorted numbers.'''
+    numbers = []
+    previous = 0
+    for gap in decode_vbyte(data):
+        previous += gap
+        numbers.append(previous)
+    return numbers
@@ -6,3 +6,10 @@ FILE = 0
 START = 1
 END = 2
 WORDS = 3
+POSITIONS = 4
+
+# Weighting schemes with precomputed document norms.
+TFIDF = 'tfidf'
+NORM_COUNT = 'norm_count'
+# Weighting scheme with precomputed document lengths and cached idf table.
+BM25 = 'bm25'
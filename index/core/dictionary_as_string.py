@@ -13,9 +13,11 @@ class DictionaryAsString(object):
     val_sep = "-"
     item_format = key_sep + "{0}" + val_sep + "{1}"
 
-    def __init__(self):
-        self._data = ""
-        self._length = 0
+    def __init__(self, items=None):
+        items = dict(items) if items else dict()
+        self._data = "".join(DictionaryAsString.item_format.format(key, value)
+                             for (key, value) in items.items())
+        self._length = len(items)
 
     def __len__(self):
         return self._length
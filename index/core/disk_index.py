@@ -0,0 +1,556 @@
+'''
+Provides a versioned binary index format that is read through memory maps.
+
+An index is saved in a directory holding one file per structure:
+    - metadata.json: format version, collection statistics and settings,
+    - terms.bin and term_offsets.bin: the sorted vocabulary,
+    - term_entries.bin: one fixed size record per term (postings location,
+      document frequency, skip table size, maximal tf-idf weight),
+    - postings.bin: compressed postings and their skip tables,
+    - doc_ids.bin and doc_entries.bin: the sorted doc ids and one fixed
+      size record per document (lines and bytes of the document in its
+      file, maximal frequency, norms, length, sums of its tf-idf norm),
+    - positions.bin: the positions of the words in each document.
+Opening an index only reads metadata.json and maps the other files,
+postings and documents are decoded when they are requested.
+'''
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import ChainMap
+from collections.abc import Mapping
+from .analyzer import Analyzer
+from .compression import encode_vbyte
+from .constants import FILE, START, END, POSITIONS, TFIDF, NORM_COUNT, BM25
+from .document_store import DocumentStore
+from .index import Index
+from .lexicon import Lexicon
+from .postings import CompressedPostings
+from .result_cache import ResultCache
+
+FORMAT_VERSION = 4
+
+METADATA_FILE = 'metadata.json'
+TERMS_FILE = 'terms.bin'
+TERM_OFFSETS_FILE = 'term_offsets.bin'
+TERM_ENTRIES_FILE = 'term_entries.bin'
+POSTINGS_FILE = 'postings.bin'
+DOC_IDS_FILE = 'doc_ids.bin'
+DOC_ENTRIES_FILE = 'doc_entries.bin'
+POSITIONS_FILE = 'positions.bin'
+
+# Postings offset, encoded size, number of postings, skip table size
+# and maximal tf-idf weight of a term.
+TERM_ENTRY = struct.Struct('<QQQQd')
+# File number, first and last line, maximal frequency, tf-idf norm,
+# norm count norm, positions offset and size, byte offset and length,
+# number of indexed words of a document, and the sums of w^2, w^2 log df
+# and w^2 log^2 df over its terms its tf-idf norm is derived from.
+DOC_ENTRY = struct.Struct('<QQQQddQQQQQddd')
+
+# Position of the maximal weight in a TERM_ENTRY.
+_MAX_WEIGHT_OFFSET = 32
+# Fields of DOC_ENTRY exposed as document statistics.
+_MAX_FREQUENCY = 3
+_TFIDF_NORM = 4
+_NORM_COUNT_NORM = 5
+_DOCUMENT_LENGTH = 10
+_TFIDF_SUMS = slice(11, 14)
+# Position of the byte offset and length in a DOC_ENTRY.
+_BYTE_OFFSET = 8
+_BYTE_LENGTH = 9
+
+_ALIGNMENT = 8
+
+
+def is_disk_index(path):
+    '''Returns True if path is a directory holding a saved disk index.'''
+    return os.path.isfile(os.path.join(path, METADATA_FILE))
+
+
+def save_disk_index(index, path):
+    '''
+    Writes an index to the path directory, term by term and document
+    by document. The index is left untouched.
+    '''
+    # The saved document frequencies must be the ones of the sums.
+    index._find_deleted_terms()
+    writer = DiskIndexWriter(path)
+    for term in sorted(index.terms()):
+        postings = index.postings(term)
+        if not len(postings):
+            continue
+        if not isinstance(postings, CompressedPostings):
+            pairs = list(index.postings_with_frequencies(term))
+            postings = CompressedPostings([doc_id for (doc_id, _) in pairs],
+                                          [count for (_, count) in pairs])
+        writer.add_term(term, postings,
+                        index.max_document_weight(TFIDF, term))
+    document_store = index.document_store()
+    for doc_id in sorted(index.get_all_doc_ids()):
+        doc_index = index._index[doc_id]
+        writer.add_document(
+            doc_id, doc_index[FILE], doc_index[START], doc_index[END],
+            index.max_frequency(doc_id),
+            index.document_norm(TFIDF, doc_id),
+            index.document_norm(NORM_COUNT, doc_id),
+            doc_index[POSITIONS] if index.is_positional() else None,
+            document_store.location(doc_id)[1:] if doc_id in document_store else None,
+            index.document_length(doc_id), index._tfidf_sums[doc_id])
+    writer.close(index.get_number_of_docs(), index._stop_words,
+                 index.is_positional())
+
+
+def update_max_weights(path, max_weights):
+    '''
+    Overwrites the maximal tf-idf weights of the terms of a saved index,
+    given in the order of the vocabulary. It allows writers to save the
+    postings before the document norms the weights depend on are known.
+    '''
+    with open(os.path.join(path, TERM_ENTRIES_FILE), 'r+b') as file_ptr:
+        for (term_id, max_weight) in enumerate(max_weights):
+            file_ptr.seek(term_id * TERM_ENTRY.size + _MAX_WEIGHT_OFFSET)
+            file_ptr.write(struct.pack('<d', max_weight))
+
+
+def load_disk_index(path):
+    '''
+    Opens an index saved by save_disk_index.
+    The returned index is query only: the word counts of the documents
+    are not stored, every other structure is read from the memory maps.
+    Documents are read from their files at their saved byte location.
+    Documents added to the index are kept in memory, in front of the
+    mapped structures. The statistics of the index are updated from the
+    saved sums of the documents and document frequencies of the terms,
+    without reading every posting.
+    '''
+    disk_file = DiskIndexFile(path)
+    lexicon = DiskLexicon(disk_file)
+    documents = DiskDocumentTable(disk_file, lexicon)
+    # The index is not built from documents, its structures are mapped.
+    index = Index.__new__(Index)
+    index._disk_file = disk_file
+    index._data_files = disk_file.metadata['files']
+    index._query_only = True
+    index._positional = disk_file.metadata['positional']
+    index._compressed = True
+    index._stop_words = disk_file.metadata['stop_words']
+    index._analyzer = Analyzer(index._stop_words)
+    index._lexicon = Lexicon()
+    index._document_store = DocumentStore(
+        locations=ChainMap(dict(), DiskDocumentLocations(documents)))
+    index._index = ChainMap(dict(), documents)
+    index._inverted_index = lexicon
+    index._frequencies = dict()
+    index._max_frequencies = ChainMap(
+        dict(), documents.column(_MAX_FREQUENCY))
+    index._norms = {
+        TFIDF: ChainMap(dict(), documents.column(_TFIDF_NORM)),
+        NORM_COUNT: ChainMap(dict(), documents.column(_NORM_COUNT_NORM))}
+    index._max_weights = {TFIDF: ChainMap(dict(), DiskMaxWeights(lexicon))}
+    index._idfs = {BM25: dict()}
+    index._idfs_version = None
+    index._document_lengths = ChainMap(dict(), documents.column(_DOCUMENT_LENGTH))
+    index._number_of_docs = disk_file.metadata['number_of_docs']
+    index._total_length = round(disk_file.metadata['average_document_length']
+                                * index._number_of_docs)
+    index._result_cache = ResultCache()
+    index._version = 0
+    index._init_segments()
+    index._init_base(documents.doc_ids())
+    index._tfidf_sums = ChainMap(dict(), documents.column(_TFIDF_SUMS))
+    index._tfidf_frequencies = ChainMap(dict(), DiskDocumentFrequencies(lexicon))
+    return index
+
+
+class DiskIndexWriter(object):
+
+    '''
+    Streams an index to disk.
+    Terms must be added in sorted order, then documents by increasing
+    doc id. Every structure is appended to its own file as soon as it
+    is added, and metadata.json is written last by close().
+    '''
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        metadata_path = os.path.join(path, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            # An interrupted save must not look like a complete index.
+            os.remove(metadata_path)
+        self._path = path
+        self._files = dict(
+            (name, open(os.path.join(path, name), 'wb'))
+            for name in [TERMS_FILE, TERM_OFFSETS_FILE, TERM_ENTRIES_FILE,
+                         POSTINGS_FILE, DOC_IDS_FILE, DOC_ENTRIES_FILE,
+                         POSITIONS_FILE])
+        self._term_ids = dict()
+        self._terms_size = 0
+        self._postings_size = 0
+        self._positions_size = 0
+        self._data_files = []
+        self._data_file_numbers = dict()
+        self._last_term = None
+        self._last_doc_id = None
+        self._documents_length = 0
+        self._documents_added = 0
+        self._files[TERM_OFFSETS_FILE].write(array('Q', [0]).tobytes())
+
+    def add_term(self, term, postings, max_weight=0.0):
+        '''
+        Appends a term, its CompressedPostings and the highest weight
+        of the term in a document divided by the norm of the document.
+        '''
+        if self._last_term is not None and term <= self._last_term:
+            raise ValueError("Terms must be added in sorted order.")
+        self._last_term = term
+        self._term_ids[term] = len(self._term_ids)
+        encoded_term = term.encode('utf8')
+        self._terms_size += len(encoded_term)
+        self._files[TERMS_FILE].write(encoded_term)
+        self._files[TERM_OFFSETS_FILE].write(
+            array('Q', [self._terms_size]).tobytes())
+        (data, length, skip_doc_ids, skip_offsets) = postings.encoded()
+        skip_size = len(skip_doc_ids) if skip_doc_ids else 0
+        self._files[TERM_ENTRIES_FILE].write(TERM_ENTRY.pack(
+            self._postings_size, len(data), length, skip_size, max_weight))
+        postings_file = self._files[POSTINGS_FILE]
+        postings_file.write(data)
+        padding = -len(data) % _ALIGNMENT
+        postings_file.write(b'\0' * padding)
+        self._postings_size += len(data) + padding
+        if skip_size:
+            skips = array('Q', skip_doc_ids).tobytes() \
+                + array('Q', skip_offsets).tobytes()
+            postings_file.write(skips)
+            self._postings_size += len(skips)
+
+    def add_document(self, doc_id, file, start, end, max_frequency,
+                     tfidf_norm, norm_count_norm, positions=None, location=None,
+                     length=0, tfidf_sums=(0.0, 0.0, 0.0)):
+        '''
+        Appends a document: its lines, its (byte offset, length) location
+        in the file when it is known, its statistics with its number of
+        indexed words and the sums of its tf-idf norm and, for a
+        positional index, its delta encoded positions by term.
+        '''
+        if self._last_doc_id is not None and doc_id <= self._last_doc_id:
+            raise ValueError("Documents must be added by increasing doc id.")
+        self._last_doc_id = doc_id
+        if file not in self._data_file_numbers:
+            self._data_file_numbers[file] = len(self._data_files)
+            self._data_files.append(file)
+        positions_offset = self._positions_size
+        if positions:
+            data = bytearray(encode_vbyte([len(positions)]))
+            for term in positions:
+                term_positions = positions[term]
+                data.extend(encode_vbyte(
+                    [self._term_ids[term], len(term_positions)]))
+                data.extend(term_positions)
+            self._files[POSITIONS_FILE].write(data)
+            self._positions_size += len(data)
+        self._files[DOC_IDS_FILE].write(array('Q', [doc_id]).tobytes())
+        self._files[DOC_ENTRIES_FILE].write(DOC_ENTRY.pack(
+            self._data_file_numbers[file], start, end, max_frequency,
+            tfidf_norm, norm_count_norm, positions_offset,
+            self._positions_size - positions_offset,
+            *(location if location is not None else (0, 0)), length, *tfidf_sums))
+        self._documents_length += length
+        self._documents_added += 1
+
+    def close(self, number_of_docs, stop_words, positional):
+        '''Closes the files and writes the metadata of the index.'''
+        for file_ptr in self._files.values():
+            file_ptr.close()
+        metadata = {
+            'version': FORMAT_VERSION,
+            'number_of_docs': number_of_docs,
+            'number_of_terms': len(self._term_ids),
+            'average_document_length': self._documents_length / self._documents_added
+                                       if self._documents_added else 0.0,
+            'files': self._data_files,
+            'stop_words': list(stop_words),
+            'positional': positional
+        }
+        with open(os.path.join(self._path, METADATA_FILE), 'w',
+                  encoding='utf8') as file_ptr:
+            json.dump(metadata, file_ptr)
+
+
+class DiskIndexFile(object):
+
+    '''Memory maps the files of a saved index.'''
+
+    def __init__(self, path):
+        with open(os.path.join(path, METADATA_FILE), encoding='utf8') as file_ptr:
+            self.metadata = json.load(file_ptr)
+        if self.metadata.get('version') != FORMAT_VERSION:
+            raise ValueError("Unsupported index format version: {0}".format(
+                self.metadata.get('version')))
+        self._path = path
+        self._maps = []
+
+    def view(self, name, item_format=None):
+        '''
+        Returns a read-only memoryview over a file of the index,
+        cast to item_format when it is given.
+        '''
+        with open(os.path.join(self._path, name), 'rb') as file_ptr:
+            if os.fstat(file_ptr.fileno()).st_size:
+                memory_map = mmap.mmap(file_ptr.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+                self._maps.append(memory_map)
+                view = memoryview(memory_map)
+            else:
+                # Empty files cannot be mapped.
+                view = memoryview(b'')
+        return view.cast(item_format) if item_format else view
+
+
+class DiskLexicon(Mapping):
+
+    '''
+    Maps the terms of a saved index to their CompressedPostings.
+    Terms are found by binary search in the sorted vocabulary and their
+    postings wrap slices of the memory map, so nothing is decoded
+    before a cursor reads it.
+    '''
+
+    def __init__(self, disk_file):
+        self._terms = disk_file.view(TERMS_FILE)
+        self._term_offsets = disk_file.view(TERM_OFFSETS_FILE, 'Q')
+        self._entries = disk_file.view(TERM_ENTRIES_FILE)
+        self._postings = disk_file.view(POSTINGS_FILE)
+
+    def __len__(self):
+        return len(self._term_offsets) - 1
+
+    def __iter__(self):
+        return (self.term(term_id) for term_id in range(len(self)))
+
+    def __contains__(self, term):
+        return self.term_id(term) >= 0
+
+    def __getitem__(self, term):
+        term_id = self.term_id(term)
+        if term_id < 0:
+            raise KeyError(term)
+        (offset, size, length, skip_size, _) = self._entry(term_id)
+        if not skip_size:
+            return CompressedPostings.from_encoded(
+                self._postings[offset:offset + size], length)
+        skip_start = offset + size + -size % _ALIGNMENT
+        skip_end = skip_start + skip_size * 8
+        return CompressedPostings.from_encoded(
+            self._postings[offset:offset + size], length,
+            self._postings[skip_start:skip_end].cast('Q'),
+            self._postings[skip_end:skip_end + skip_size * 8].cast('Q'))
+
+    def term(self, term_id):
+        '''Returns the term stored at a position of the vocabulary.'''
+        return self._term_bytes(term_id).decode('utf8')
+
+    def term_id(self, term):
+        '''Returns the position of a term in the vocabulary, or -1.'''
+        if not isinstance(term, str):
+            return -1
+        target = term.encode('utf8')
+        low = 0
+        high = len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._term_bytes(low) == target:
+            return low
+        return -1
+
+    def max_weight(self, term_id):
+        '''Returns the maximal tf-idf weight of a term.'''
+        return self._entry(term_id)[4]
+
+    def document_frequency(self, term_id):
+        '''Returns the number of postings of a term.'''
+        return self._entry(term_id)[2]
+
+    def _term_bytes(self, term_id):
+        return bytes(self._terms[
+            self._term_offsets[term_id]:self._term_offsets[term_id + 1]])
+
+    def _entry(self, term_id):
+        return TERM_ENTRY.unpack_from(self._entries, term_id * TERM_ENTRY.size)
+
+
+class DiskMaxWeights(Mapping):
+
+    '''Maps the terms of a saved index to their maximal tf-idf weight.'''
+
+    def __init__(self, lexicon):
+        self._lexicon = lexicon
+
+    def __len__(self):
+        return len(self._lexicon)
+
+    def __iter__(self):
+        return iter(self._lexicon)
+
+    def __getitem__(self, term):
+        term_id = self._lexicon.term_id(term)
+        if term_id < 0:
+            raise KeyError(term)
+        return self._lexicon.max_weight(term_id)
+
+
+class DiskDocumentFrequencies(Mapping):
+
+    '''Maps the terms of a saved index to their document frequency.'''
+
+    def __init__(self, lexicon):
+        self._lexicon = lexicon
+
+    def __len__(self):
+        return len(self._lexicon)
+
+    def __iter__(self):
+        return iter(self._lexicon)
+
+    def __getitem__(self, term):
+        term_id = self._lexicon.term_id(term)
+        if term_id < 0:
+            raise KeyError(term)
+        return self._lexicon.document_frequency(term_id)
+
+
+class DiskDocumentTable(Mapping):
+
+    '''
+    Maps the doc ids of a saved index to entries shaped like the ones of
+    the in-memory forward index: [file, start, end, words(, positions)].
+    The words are not stored, their mapping is always empty.
+    '''
+
+    def __init__(self, disk_file, lexicon):
+        self._lexicon = lexicon
+        self._files = disk_file.metadata['files']
+        self._positional = disk_file.metadata['positional']
+        self._doc_ids = disk_file.view(DOC_IDS_FILE, 'Q')
+        self._entries = disk_file.view(DOC_ENTRIES_FILE)
+        self._positions = disk_file.view(POSITIONS_FILE)
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def __iter__(self):
+        return iter(self._doc_ids)
+
+    def __contains__(self, doc_id):
+        return self._position(doc_id) >= 0
+
+    def __getitem__(self, doc_id):
+        entry = self.entry(doc_id)
+        result = [self._files[entry[0]], entry[1], entry[2], None]
+        if self._positional:
+            result.append(self._read_positions(entry[6], entry[7]))
+        return result
+
+    def doc_ids(self):
+        '''Returns the sorted doc ids of the table.'''
+        return self._doc_ids
+
+    def entry(self, doc_id):
+        '''Returns the raw DOC_ENTRY fields of a document.'''
+        position = self._position(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return DOC_ENTRY.unpack_from(self._entries, position * DOC_ENTRY.size)
+
+    def file(self, entry):
+        '''Returns the data file of a DOC_ENTRY.'''
+        return self._files[entry[0]]
+
+    def column(self, field):
+        '''Returns a mapping of the doc ids to one field of their entry.'''
+        return DiskDocumentColumn(self, field)
+
+    def _position(self, doc_id):
+        if not isinstance(doc_id, int) or doc_id < 0:
+            return -1
+        position = bisect_left(self._doc_ids, doc_id)
+        if position < len(self._doc_ids) and self._doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def _read_positions(self, offset, size):
+        '''Decodes the term -> encoded positions mapping of a document.'''
+        data = self._positions[offset:offset + size]
+        positions = dict()
+        if not size:
+            return positions
+        (count, offset) = _read_vbyte(data, 0)
+        for _ in range(count):
+            (term_id, offset) = _read_vbyte(data, offset)
+            (length, offset) = _read_vbyte(data, offset)
+            positions[self._lexicon.term(term_id)] = \
+                bytes(data[offset:offset + length])
+            offset += length
+        return positions
+
+
+class DiskDocumentLocations(Mapping):
+
+    '''
+    Maps the doc ids of a saved index to the (file, byte offset, length)
+    of their documents. Documents saved without a location are missing.
+    '''
+
+    def __init__(self, documents):
+        self._documents = documents
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    def __getitem__(self, doc_id):
+        entry = self._documents.entry(doc_id)
+        if not entry[_BYTE_LENGTH]:
+            raise KeyError(doc_id)
+        return (self._documents.file(entry), entry[_BYTE_OFFSET],
+                entry[_BYTE_LENGTH])
+
+
+class DiskDocumentColumn(Mapping):
+
+    '''Maps the doc ids of a saved index to one field of their entry.'''
+
+    def __init__(self, documents, field):
+        self._documents = documents
+        self._field = field
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    def __getitem__(self, doc_id):
+        return self._documents.entry(doc_id)[self._field]
+
+
+def _read_vbyte(data, offset):
+    '''Decodes the variable-byte number at offset, returns it and the next offset.'''
+    number = 0
+    byte = data[offset]
+    while not byte & 0x80:
+        number = number << 7 | byte
+        offset += 1
+        byte = data[offset]
+    return (number << 7 | byte & 0x7F, offset + 1)
@@ -1,32 +1,51 @@
 '''
 Provides classes to index single documents.
 '''
-from .utility import get_word_list, count_tokens
+from .analyzer import Analyzer
+from .compression import encode_deltas
+from .utility import count_tokens
 
 
 class DocumentIndex(object):
 
     '''
     Class containing the indexing result for one document.
-    The indexing will filter out stop words.
+    The content is turned into terms by an analyzer, by default one
+    filtering out stop_words.
+    A positional document index also keeps the positions of the words.
     '''
 
-    def __init__(self, content, stop_words=None):
+    def __init__(self, content, stop_words=None, positional=False,
+                 analyzer=None):
         self.word_count = {}
+        self.positions = {}
         self._maxword_count = -1
-        if stop_words:
-            self._stop_words = stop_words
-        else:
-            self._stop_words = []
+        self._positional = positional
+        self._analyzer = analyzer if analyzer else Analyzer(stop_words)
         self._init_index(content)
 
     def get_word_count(self):
         '''Returns a dictionary with words and their counts.'''
         return self.word_count
 
+    def get_positions(self):
+        '''
+        Returns a dictionary with words and their positions
+        in the document, delta-encoded as bytes.
+        '''
+        return {word: encode_deltas(positions)
+                for (word, positions) in self.positions.items()}
+
     def _init_index(self, content):
         '''Indexes one document and populates word_count.'''
-        self.word_count = self._compute_word_count(content)
+        if self._positional:
+            positioned_tokens = self._analyzer.analyze_positions(content)
+            self.word_count = count_tokens(
+                [token for (_, token) in positioned_tokens])
+            for (position, token) in positioned_tokens:
+                self.positions.setdefault(token, []).append(position)
+        else:
+            self.word_count = self._compute_word_count(content)
 
     def _compute_word_count(self, content):
         '''Computes the word count for a string.'''
@@ -34,5 +53,4 @@ class DocumentIndex(object):
 
     def _tokenize(self, content):
         '''Returns an array of tokens (clean words) in a string.'''
-        tokens = get_word_list(content, self._stop_words)
-        return tokens
+        return self._analyzer.analyze(content)
@@ -2,6 +2,7 @@
 Provides document the general document parser structure
 along with parsers for different types of documents.
 '''
+import os
 import re
 
 
@@ -17,42 +18,114 @@ class DocumentParser(object):
         self._file_path = file_path
         self._start_marker = None
 
-    def get_documents(self):
+    def get_documents(self, start_offset=0, end_offset=None, first_line=0):
         '''
         Generator.
-        Iterates over all the documents in the file.
+        Iterates over all the documents in the file, or in the byte range
+        of the file between start_offset and end_offset, as returned by
+        split. first_line is the line number of start_offset, so that
+        the positions of the documents are line numbers in the file.
+        Each document also holds its raw text and the byte offset and
+        length of that text in the file.
         '''
-        self._file_ptr = open(self._file_path, 'r', encoding="utf8")
-        document_content = ""
-        i = 0
-        document_start_pos = 0
+        self._file_ptr = open(self._file_path, 'rb')
+        self._file_ptr.seek(start_offset)
+        document_lines = []
+        i = first_line
+        document_start_pos = first_line
+        document_offset = start_offset
+        offset = start_offset
         started = False
-        for i, line in enumerate(self._file_ptr):
+        for i, (line_offset, offset, line) in enumerate(self._read_lines(end_offset),
+                                                         first_line):
             if line.startswith(self._start_marker):
-                if document_content and started:
+                if document_lines and started:
                     # Indexing previous document
-                    doc = self.parse_document(document_content)
                     document_end_pos = i - 1
-                    yield (document_start_pos, document_end_pos, doc)
+                    yield (document_start_pos, document_end_pos,
+                           self._parse_raw_document(document_lines, document_offset,
+                                                    line_offset))
                 document_start_pos = i
-                document_content = line
+                document_offset = line_offset
+                document_lines = []
                 started = True
-            document_content = document_content + "\n" + line
+            document_lines.append(line)
 
-        # Handling last document.
-        if document_content:
-            doc = self.parse_document(document_content)
-            document_end_pos = i - 1
-            yield (document_start_pos, document_end_pos, doc)
+        # Handling last document, which ends with the last line.
+        if document_lines:
+            document_end_pos = i
+            yield (document_start_pos, document_end_pos,
+                   self._parse_raw_document(document_lines, document_offset, offset))
         self._file_ptr.close()
         self._file_ptr = None
 
+    def split(self, number_of_ranges):
+        '''
+        Cuts the file into at most number_of_ranges byte ranges of similar
+        size, each one but the first starting with a document start marker.
+        Returns the (start offset, end offset, first line) of the ranges,
+        to be parsed independently by get_documents.
+        '''
+        marker = self._start_marker.encode("utf8")
+        size = os.path.getsize(self._file_path)
+        offsets = [0]
+        ranges = []
+        with open(self._file_path, 'rb') as file_ptr:
+            for part in range(1, number_of_ranges):
+                target = size * part // number_of_ranges
+                if target <= offsets[-1]:
+                    continue
+                # Skips to the first document starting after target.
+                file_ptr.seek(target - 1)
+                file_ptr.readline()
+                offset = file_ptr.tell()
+                line = file_ptr.readline()
+                while line and not line.startswith(marker):
+                    offset = file_ptr.tell()
+                    line = file_ptr.readline()
+                if not line:
+                    break
+                if offset > offsets[-1]:
+                    offsets.append(offset)
+            # Counts the lines of each range to number the lines of the next.
+            first_line = 0
+            for (start_offset, end_offset) in zip(offsets, offsets[1:] + [size]):
+                ranges.append((start_offset, end_offset, first_line))
+                file_ptr.seek(start_offset)
+                remaining = end_offset - start_offset
+                while remaining:
+                    chunk = file_ptr.read(min(remaining, 1 << 20))
+                    first_line += chunk.count(b"\n")
+                    remaining -= len(chunk)
+        return ranges
+
+    def _read_lines(self, end_offset):
+        '''
+        Iterates over the (offset, next line offset, decoded line) of the
+        lines of the file until end_offset.
+        '''
+        offset = self._file_ptr.tell()
+        for line in self._file_ptr:
+            if end_offset is not None and offset >= end_offset:
+                return
+            line_offset = offset
+            offset += len(line)
+            if line.endswith(b"\r\n"):
+                line = line[:-2] + b"\n"
+            yield (line_offset, offset, line.decode("utf8"))
+
+    def _parse_raw_document(self, lines, start_offset, end_offset):
+        '''Parses the lines of a document found between two byte offsets.'''
+        document = self.parse_document("".join(lines))
+        document.set_location(start_offset, end_offset - start_offset)
+        return document
+
     def parse_document(self, document_content):
         '''Parses one document and returns document object.'''
         title = self._extract_title(document_content)
         content = self._extract_focus_content(document_content)
         doc_id = self._extract_doc_id(document_content)
-        return StructuredDocument(doc_id, title, content)
+        return StructuredDocument(doc_id, title, content, document_content)
 
     def _extract_title(self, content):
         '''Extracts the title from the whole content.'''
@@ -144,10 +217,12 @@ class StructuredDocument(object):
     Class representing one structured document for read access.
     '''
 
-    def __init__(self, doc_id, title, content):
+    def __init__(self, doc_id, title, content, raw_content=None):
         self._doc_id = doc_id
         self._title = title
         self._content = content
+        self._raw_content = raw_content
+        self._location = None
 
     def get_content(self):
         '''Returns the indexed content of the document.'''
@@ -161,6 +236,21 @@ class StructuredDocument(object):
         '''Returns the doc id of the document.'''
         return self._doc_id
 
+    def get_raw_content(self):
+        '''Returns the text the document was parsed from.'''
+        return self._raw_content
+
+    def get_location(self):
+        '''
+        Returns the (byte offset, length) of the document in its file,
+        or None if it was not read from a file.
+        '''
+        return self._location
+
+    def set_location(self, offset, length):
+        '''Sets the byte offset and length of the document in its file.'''
+        self._location = (offset, length)
+
 
 class PlainDocument(object):
 
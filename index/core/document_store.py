@@ -0,0 +1,87 @@
+'''
+Provides the document store giving the raw text of the documents of an
+index by doc id, to render results without scanning the data files.
+'''
+import zlib
+
+
+class DocumentStore(object):
+
+    '''
+    Maps doc ids to the (file, byte offset, length) of their documents,
+    so that a document is read with a single seek and read of its bytes.
+    A compressed store also keeps the raw text of every document,
+    compressed with zlib, and its title: documents and titles are then
+    read without their data files.
+    locations may be any mapping of doc ids to locations, such as the
+    document table of a saved index.
+    '''
+
+    def __init__(self, compressed=False, locations=None):
+        self._compressed = compressed
+        self._locations = locations if locations is not None else dict()
+        self._texts = dict()
+        self._titles = dict()
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._texts or doc_id in self._locations
+
+    def is_compressed(self):
+        '''Returns True if the store keeps the texts of the documents.'''
+        return self._compressed
+
+    def add(self, doc_id, file_path, location, packed=None):
+        '''
+        Adds a document found at a (byte offset, length) location of a file.
+        packed is the (compressed text, title) of the document returned by
+        pack_document, kept by a compressed store.
+        '''
+        self._locations[doc_id] = (file_path, location[0], location[1])
+        if self._compressed and packed is not None:
+            (self._texts[doc_id], self._titles[doc_id]) = packed
+
+    def add_document(self, doc_id, file_path, document):
+        '''Adds a document as returned by a DocumentParser.'''
+        self.add(doc_id, file_path, document.get_location(),
+                 pack_document(document) if self._compressed else None)
+
+    def remove(self, doc_id):
+        '''Removes a document from the store.'''
+        self._locations.pop(doc_id, None)
+        self._texts.pop(doc_id, None)
+        self._titles.pop(doc_id, None)
+
+    def read(self, doc_id):
+        '''Returns the raw text of a document.'''
+        if doc_id in self._texts:
+            return zlib.decompress(self._texts[doc_id]).decode("utf8")
+        (file_path, offset, length) = self._locations[doc_id]
+        with open(file_path, 'rb') as file_ptr:
+            file_ptr.seek(offset)
+            data = file_ptr.read(length)
+        return data.replace(b"\r\n", b"\n").decode("utf8")
+
+    def title(self, doc_id):
+        '''Returns the stored title of a document, or None.'''
+        return self._titles.get(doc_id)
+
+    def location(self, doc_id):
+        '''Returns the (file, byte offset, length) of a document.'''
+        return self._locations[doc_id]
+
+    def stored_size(self):
+        '''Returns the number of bytes of the compressed texts.'''
+        return sum(len(text) for text in self._texts.values())
+
+
+def pack_document(document):
+    '''
+    Returns the (compressed raw text, title) of a document, as kept by
+    a compressed DocumentStore. It runs where documents are parsed, so
+    that the workers building an index compress their own documents.
+    '''
+    return (zlib.compress(document.get_raw_content().encode("utf8")),
+            document.get_title())
@@ -0,0 +1,159 @@
+'''
+Provides the evaluation of ranked results against relevance judgments:
+the interpolated recall-precision curve, mean average precision,
+precision and nDCG of the k first results.
+Each ranking is turned once into a vector of relevance, whose cumulative
+sums give the number of relevant documents found at every rank.
+'''
+from bisect import bisect_left
+from itertools import accumulate
+from math import ceil, log2
+from multiprocessing import Pool
+
+# Recall levels of the interpolated curve.
+CURVE_RECALLS = [level / 10 for level in range(0, 11)]
+# Percentages of the results at which recall and precision are measured.
+CURVE_PERCENTAGES = [percentage * 0.001 for percentage in range(1, 100)] \
+    + list(range(1, 100))
+# Number of first results evaluated by precision and nDCG.
+EVALUATION_DEPTH = 10
+
+
+def relevance_vector(results, relevant):
+    '''
+    Returns the list holding 1 for each of the (doc_id, score) results
+    that is relevant and 0 for the others.
+    '''
+    return [1 if doc_id in relevant else 0 for (doc_id, _) in results]
+
+
+def curve_cutoffs(number_of_results):
+    '''
+    Returns the sorted distinct numbers of first results at which the
+    curve is measured: the CURVE_PERCENTAGES of the results, rounded up.
+    '''
+    return sorted(set(int(ceil(number_of_results * percentage / 100))
+                      for percentage in CURVE_PERCENTAGES) - set([0]))
+
+
+def interpolated_curve(found, number_relevant):
+    '''
+    Returns the interpolated precision at each of the CURVE_RECALLS, given
+    the cumulative number of relevant documents found at each rank: the
+    best precision at the cutoffs whose recall reaches the level, or None
+    when none does. Recall is 1 when no document is relevant.
+    '''
+    recalls = []
+    precisions = []
+    for cutoff in curve_cutoffs(len(found)):
+        recalls.append(found[cutoff - 1] / number_relevant if number_relevant > 0 else 1.0)
+        precisions.append(found[cutoff - 1] / cutoff)
+    # Best precision at each cutoff or a later one, whose recall is higher.
+    best = list(accumulate(reversed(precisions), max))[::-1]
+    curve = []
+    for level in CURVE_RECALLS:
+        position = bisect_left(recalls, level)
+        curve.append(best[position] if position < len(best) else None)
+    return curve
+
+
+def average_precision(vector, found, number_relevant):
+    '''
+    Returns the sum of the precisions at the ranks of the relevant
+    documents of a relevance vector, divided by the number of relevant
+    documents.
+    '''
+    if number_relevant == 0:
+        return 0.0
+    return sum(found[rank] / (rank + 1) for (rank, relevance) in enumerate(vector)
+               if relevance) / number_relevant
+
+
+def precision_at(found, k):
+    '''Returns the precision of the k first results.'''
+    return found[min(k, len(found)) - 1] / k if found else 0.0
+
+
+def ndcg_at(vector, number_relevant, k):
+    '''
+    Returns the normalized discounted cumulative gain of the k first
+    results with binary gains: the gain of the rank r is discounted by
+    log2(r + 1) and the sum is divided by the one of an ideal ranking.
+    '''
+    ideal = sum(1 / log2(rank + 2) for rank in range(min(number_relevant, k)))
+    if ideal == 0:
+        return 0.0
+    return sum(relevance / log2(rank + 2)
+               for (rank, relevance) in enumerate(vector[0:k])) / ideal
+
+
+def evaluate_ranking(results, relevant, k=EVALUATION_DEPTH):
+    '''
+    Evaluates the (doc_id, score) results of a query against its relevant
+    doc ids. Returns a dictionary of the interpolated 'curve', the
+    'average_precision', and the 'precision' and 'ndcg' of the k first
+    results.
+    '''
+    relevant = set(relevant)
+    vector = relevance_vector(results, relevant)
+    found = list(accumulate(vector))
+    return {
+        'curve': interpolated_curve(found, len(relevant)),
+        'average_precision': average_precision(vector, found, len(relevant)),
+        'precision': precision_at(found, k),
+        'ndcg': ndcg_at(vector, len(relevant), k)
+    }
+
+
+def evaluate_run(run, relevant, k=EVALUATION_DEPTH):
+    '''
+    Evaluates a run, the results of queries by query id, against the
+    relevant doc ids of each query id. Returns a dictionary of:
+    - 'recalls' and 'precisions': the CURVE_RECALLS and the interpolated
+    precisions averaged over the queries reaching each recall level,
+    queries without relevant documents included,
+    - 'mean_average_precision', 'precision' and 'ndcg': the averages over
+    the queries having relevant documents.
+    '''
+    curves = [[] for _ in CURVE_RECALLS]
+    metrics = dict((name, []) for name in ['average_precision', 'precision', 'ndcg'])
+    for (query_id, results) in run.items():
+        query_relevant = relevant.get(query_id, [])
+        evaluation = evaluate_ranking(results, query_relevant, k)
+        for (level, precision) in enumerate(evaluation['curve']):
+            if precision is not None:
+                curves[level].append(precision)
+        if query_relevant:
+            for (name, values) in metrics.items():
+                values.append(evaluation[name])
+    averages = dict((name, sum(values) / len(values) if values else 0.0)
+                    for (name, values) in metrics.items())
+    return {
+        'recalls': list(CURVE_RECALLS),
+        'precisions': [sum(values) / len(values) if values else 0.0
+                       for values in curves],
+        'mean_average_precision': averages['average_precision'],
+        'precision': averages['precision'],
+        'ndcg': averages['ndcg']
+    }
+
+
+def evaluate_run_worker(task):
+    '''Pool worker evaluating a (run, relevant, k) task.'''
+    return evaluate_run(*task)
+
+
+def evaluate_runs(runs, relevant, k=EVALUATION_DEPTH, processes=1):
+    '''
+    Evaluates several runs, given by name, against the same relevance
+    judgments and returns the evaluation of each name, like evaluate_run.
+    With several processes, the runs are evaluated by a pool of processes.
+    '''
+    names = list(runs)
+    tasks = [(runs[name], relevant, k) for name in names]
+    if processes <= 1 or len(tasks) <= 1:
+        evaluations = [evaluate_run_worker(task) for task in tasks]
+    else:
+        with Pool(min(processes, len(tasks))) as pool:
+            evaluations = pool.map(evaluate_run_worker, tasks)
+    return dict(zip(names, evaluations))
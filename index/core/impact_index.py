@@ -0,0 +1,241 @@
+'''
+Provides impact-ordered postings, scored one score at a time with early
+termination.
+'''
+import heapq
+from array import array
+from .constants import TFIDF, NORM_COUNT, BM25
+from .utility import tf_idf
+
+# Number of bits of the quantized impacts.
+IMPACT_BITS = 8
+# Number of documents per result that may still overtake the k-th one,
+# above which early termination is not checked further.
+_MAX_CANDIDATES = 4
+
+
+def _result_order(result):
+    '''Sort key of the (doc_id, score) results: descending score, then doc id.'''
+    return (-result[1], result[0])
+
+
+def impact_functions(index, model):
+    '''
+    Returns a function giving, for a term, its impact_function(doc_id,
+    frequency): the contribution of a posting to the score of a document
+    before it is multiplied by the query weight of the term, for a
+    vectorial query class. It is the document weight divided by the
+    document norm for tf-idf and normalized count, the saturated
+    frequency of BM25, and 1 for the probabilistic model.
+    '''
+    weighting = model._weighting
+    if weighting == TFIDF:
+        number_of_docs = index.get_number_of_docs()
+
+        def tfidf_function(term):
+            document_frequency = index.document_frequency(term)
+
+            def impact(doc_id, frequency):
+                doc_norm = index.document_norm(TFIDF, doc_id)
+                return tf_idf(frequency, document_frequency, number_of_docs) \
+                    / doc_norm if doc_norm else 0.0
+            return impact
+        return tfidf_function
+    if weighting == NORM_COUNT:
+        def norm_count_impact(doc_id, frequency):
+            doc_norm = index.document_norm(NORM_COUNT, doc_id)
+            return frequency / index.max_frequency(doc_id) / doc_norm \
+                if doc_norm else 0.0
+        return lambda term: norm_count_impact
+    if weighting == BM25:
+        (constant, slope) = model._length_normalization(index)
+        lengths = index.document_lengths()
+        return lambda term: lambda doc_id, frequency: \
+            frequency / (frequency + constant + slope * lengths[doc_id])
+    return lambda term: lambda doc_id, frequency: 1.0
+
+
+class ImpactIndex(object):
+
+    '''
+    Postings of an index for a vectorial query class, such as
+    VectorialQueryTfIdf, holding quantized impacts instead of frequencies.
+    The impacts of a term are divided into 2 ** bits - 1 levels. Its
+    postings are grouped by level into segments of sorted doc ids, stored
+    by decreasing level.
+    Queries read the segments of their terms by decreasing contribution
+    (score at a time): the highest impacts come first, and the reading
+    stops as soon as the rest of the segments cannot change the top k,
+    or once a budget of postings has been read.
+    The impacts are computed again when the index changes.
+    '''
+
+    def __init__(self, index, model, bits=IMPACT_BITS):
+        self._index = index
+        self._model = model
+        self._levels = (1 << bits) - 1
+        self._version = None
+        self._terms = dict()
+        self._impact_functions = None
+        self.read_postings = 0
+
+    def terms(self):
+        '''
+        Returns the mapping of the terms to their (step, segments), where
+        an impact of level l stands for l * step, and segments are the
+        (level, doc ids, number of doc ids) of the term.
+        '''
+        if self._version != self._index.version():
+            self._build()
+        return self._terms
+
+    def execute(self, query, k=None, budget=None):
+        '''
+        Returns the k best (doc_id, score) pairs of a query text, sorted
+        by descending score then doc id.
+        Without budget, the results are the ones of reading every segment:
+        reading stops when the k best documents are known, then their
+        scores are completed. With a budget, at most budget postings are
+        read and the best documents found so far are returned.
+        The number of postings read is kept in read_postings.
+        '''
+        impacts = self.terms()
+        weights = self._model(query).query_weights(self._index)
+        terms = [term for term in sorted(weights) if term in impacts]
+        # Segments of each term as (highest contribution, term number,
+        # position, contribution, level, doc ids, number of doc ids).
+        streams = []
+        for (number, term) in enumerate(terms):
+            (step, segments) = impacts[term]
+            weight = weights[term]
+            streams.append([
+                (abs(weight) * level * step, number, position, weight * level * step,
+                 level, doc_ids, count)
+                for (position, (level, doc_ids, count)) in enumerate(segments)])
+        # Highest contribution of the unread segments of each term.
+        bounds = [stream[0][0] for stream in streams]
+        # Lowest level read of each term.
+        read_levels = [self._levels + 1] * len(streams)
+        accumulators = dict()
+        read_postings = 0
+        next_check = 0
+        done = False
+        for (_, number, position, contribution, level, doc_ids, count) in heapq.merge(
+                *streams, key=lambda segment: -segment[0]):
+            if budget is not None and read_postings + count > budget:
+                doc_ids = doc_ids[0:budget - read_postings]
+            for doc_id in doc_ids:
+                accumulators[doc_id] = accumulators.get(doc_id, 0.0) + contribution
+            read_postings += len(doc_ids)
+            read_levels[number] = level
+            bounds[number] = streams[number][position + 1][0] \
+                if position + 1 < len(streams[number]) else 0.0
+            if budget is not None:
+                if read_postings >= budget:
+                    break
+            elif k is not None and read_postings >= next_check:
+                if self._is_final(accumulators, k, terms, weights, bounds, read_levels):
+                    done = True
+                    break
+                next_check = read_postings + 2 * max(k, len(accumulators))
+        self.read_postings = read_postings
+        if k is None:
+            results = sorted(accumulators.items(), key=_result_order)
+        else:
+            results = heapq.nsmallest(k, accumulators.items(), key=_result_order)
+        if done:
+            # Adds the contributions of the segments left unread.
+            scores = dict(results)
+            for (doc_id, levels) in self._levels_of(scores, terms).items():
+                for (number, level) in enumerate(levels):
+                    if 0 <= level < read_levels[number]:
+                        scores[doc_id] += weights[terms[number]] * level \
+                            * impacts[terms[number]][0]
+            results = sorted(scores.items(), key=_result_order)
+        return results
+
+    def _is_final(self, accumulators, k, terms, weights, bounds, read_levels):
+        '''
+        Returns True if the unread segments cannot change which documents
+        are the k best: a document can gain, or lose for the terms with a
+        negative weight, at most the bounds of the terms it holds in the
+        segments not read yet. The order of the k best is found once their scores are completed.
+        '''
+        if len(accumulators) < k:
+            return False
+        kth_score = heapq.nlargest(k, accumulators.values())[-1]
+        if not any(bounds):
+            # Only null contributions are left.
+            return kth_score > 0
+        gain = sum(bound for (term, bound) in zip(terms, bounds) if weights[term] > 0)
+        loss = sum(bound for (term, bound) in zip(terms, bounds) if weights[term] < 0)
+        if kth_score - loss <= gain:
+            # A document not read yet could still enter the k best.
+            return False
+        best = heapq.nsmallest(k, accumulators.items(), key=_result_order)
+        top = set(doc_id for (doc_id, _) in best)
+        candidates = [doc_id for (doc_id, score) in accumulators.items()
+                      if score + gain >= kth_score - loss and doc_id not in top]
+        if len(candidates) > _MAX_CANDIDATES * k:
+            # Looking up so many documents costs more than reading on.
+            return False
+        levels = self._levels_of(candidates + list(top), terms)
+
+        def unread_bound(doc_id, negative):
+            '''
+            Sums the bounds of the terms of a sign held by a document in
+            a segment not read yet.
+            '''
+            return sum(bound for (number, bound) in enumerate(bounds)
+                       if (weights[terms[number]] < 0) == negative
+                       and 0 <= levels[doc_id][number] < read_levels[number])
+
+        threshold = min(score - unread_bound(doc_id, True) for (doc_id, score) in best)
+        return all(accumulators[doc_id] + unread_bound(doc_id, False) < threshold
+                   for doc_id in candidates)
+
+    def _levels_of(self, doc_ids, terms):
+        '''
+        Returns the levels of the impacts of terms in documents, found with
+        the postings cursors of the index: a list per doc id holding the
+        level of each term, or -1 when the document does not hold it.
+        '''
+        doc_ids = sorted(doc_ids)
+        levels = dict((doc_id, [-1] * len(terms)) for doc_id in doc_ids)
+        for (number, term) in enumerate(terms):
+            step = self._terms[term][0]
+            impact = self._impact_functions(term)
+            cursor = self._index.postings_cursor(term)
+            for doc_id in doc_ids:
+                cursor.next_geq(doc_id)
+                if cursor.at_end():
+                    break
+                if cursor.doc_id() == doc_id:
+                    levels[doc_id][number] = self._level(
+                        impact(doc_id, cursor.frequency()), step)
+        return levels
+
+    def _build(self):
+        '''Quantizes the impacts of the postings of the index.'''
+        self._impact_functions = impact_functions(self._index, self._model)
+        self._terms = dict()
+        for term in self._index.terms():
+            impact = self._impact_functions(term)
+            postings = [(doc_id, impact(doc_id, frequency)) for (doc_id, frequency)
+                        in self._index.postings_with_frequencies(term)]
+            if not postings:
+                continue
+            max_impact = max(value for (_, value) in postings)
+            step = max_impact / self._levels if max_impact > 0 else 1.0
+            segments = dict()
+            for (doc_id, value) in postings:
+                segments.setdefault(self._level(value, step), []).append(doc_id)
+            self._terms[term] = (step, [
+                (level, array('Q', segments[level]), len(segments[level]))
+                for level in sorted(segments, reverse=True)])
+        self._version = self._index.version()
+
+    @staticmethod
+    def _level(value, step):
+        '''Returns the quantized level of an impact.'''
+        return int(round(value / step))
@@ -3,39 +3,409 @@ Main entry point of the package.
 Provides the Index class that is able to index a collection
 of documents and can be used to query them.
 '''
+import heapq
+import os
+import shutil
+import tempfile
+import threading
 import time
+from array import array
+from math import log, sqrt
 from multiprocessing import Pool
-from functools import reduce
 from .configuration import Configuration
-from .constants import FILE, WORDS, START, END
+from .compression import decode_deltas
+from .constants import FILE, WORDS, POSITIONS, START, END, TFIDF, NORM_COUNT, BM25
+from .analyzer import Analyzer
 from .document_index import DocumentIndex
-from .utility import merge_dictionaries, tf_idf, tokenize
+from .document_store import DocumentStore
+from .lexicon import Lexicon, TermCounts, encode_term_counts
+from .parallel_indexing import split_files, invert_file, merge_partition, \
+    invert_file_to_disk, merge_partition_files, load
+from .postings import CompressedPostings, MergedPostingsCursor, union
+from .scoring import score_batch, init_batch_worker, score_batch_worker
+from .result_cache import ResultCache, RESULT_CACHE_SIZE
+from .segment import Segment, TieredMergePolicy, merge_segments
+from .snippets import SNIPPET_LENGTH, HIGHLIGHT, make_snippet
+from .utility import tf_idf, bm25_idf, norm_count_statistics
 
 
 class Index:
 
     '''
-    Class containing the whole index: documents and the lists of frequencies
+    Class containing the whole index: documents and the lists of frequencies.
+    A positional index also stores the positions of the words in each
+    document, which allows phrase and proximity queries.
+    A compressed index stores its postings as CompressedPostings
+    instead of lists of doc ids.
+    Documents added after the index was built are inverted in small
+    immutable segments, which are merged in the background.
+    Deleted documents are marked in a bitmap of their segment and
+    skipped by queries until they are purged.
+    Documents and queries are turned into terms by the analyzer of the
+    index, which removes the stop words and stems by default.
+    The lexicon gives each term an integer id, and the forward index
+    stores the term counts of each document as arrays of term ids
+    and counts.
+    The document store locates the bytes of each document in its file,
+    and with store_documents also keeps the compressed text and the
+    title of the documents, so that results are rendered without
+    reading the data files.
+    Query results are kept in a result cache of result_cache_size bytes,
+    emptied whenever documents are added or deleted.
     '''
 
-    def __init__(self, data_files, stop_words_file="", stop_words=None):
+    def __init__(self, data_files, stop_words_file="", stop_words=None,
+                 query_only=False, positional=False, compressed=False,
+                 analyzer=None, store_documents=False,
+                 result_cache_size=RESULT_CACHE_SIZE):
         self._data_files = data_files
+        self._query_only = query_only
+        self._positional = positional
+        self._compressed = compressed
         if stop_words:
             self._stop_words = stop_words
         elif stop_words_file:
             self._read_stop_words(stop_words_file)
         else:
             self._stop_words = []
+        self._analyzer = analyzer if analyzer else Analyzer(self._stop_words)
+        self._lexicon = Lexicon()
+        self._document_store = DocumentStore(compressed=store_documents)
+        self._result_cache = ResultCache(result_cache_size)
+        self._version = 0
         self._index = dict()
         self._inverted_index = dict()
+        self._frequencies = dict()
+        self._max_frequencies = dict()
+        self._norms = {TFIDF: dict(), NORM_COUNT: dict()}
+        self._max_weights = {TFIDF: dict()}
+        self._idfs = {BM25: dict()}
+        self._idfs_version = None
+        self._document_lengths = dict()
+        self._total_length = 0
         self._number_of_docs = len(self._index)
+        self._init_segments()
         self._init_index()
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # Locks and threads cannot be pickled.
+        del state['_merge_lock']
+        del state['_merge_thread']
+        del state['_merging']
+        del state['_statistics_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_analyzer' not in state:
+            # Indexes pickled before analyzers were configured per index.
+            self._analyzer = Analyzer(self._stop_words)
+        if '_document_store' not in state:
+            # Indexes pickled before documents were located by offset
+            # are read line by line.
+            self._document_store = DocumentStore()
+        if '_result_cache' not in state:
+            self._result_cache = ResultCache()
+            self._version = 0
+        if '_statistics_version' not in state:
+            # Indexes pickled before the statistics were updated
+            # incrementally compute them again from their postings.
+            for name in ['_stale_statistics', '_idfs', '_average_document_length']:
+                self.__dict__.pop(name, None)
+            self._init_statistics()
+            self._statistics_version = None
+            self.__dict__.setdefault('_document_lengths', dict())
+            self.__dict__.setdefault('_total_length', 0)
+        if '_idfs_version' not in state:
+            self._idfs = {BM25: dict()}
+            self._idfs_version = None
+        self._merge_lock = threading.Lock()
+        self._merge_thread = None
+        self._merging = []
+        self._statistics_lock = threading.Lock()
+
     def search(self, word):
         '''Returns a list of doc_ids containing the requested word.'''
-        standardized_word = tokenize(word)
-        return self._inverted_index[standardized_word] \
-            if standardized_word in self._inverted_index else []
+        term = self._analyzer.term(word)
+        return self.postings(term) if term is not None else []
+
+    def postings(self, term):
+        '''
+        Returns the sorted doc_ids containing an already tokenized term,
+        as a list or as CompressedPostings for a compressed index.
+        '''
+        segments = self._searched_segments()
+        if len(segments) == 1:
+            return segments[0].postings(term)
+        return union([segment.postings(term) for segment in segments])
+
+    def postings_with_frequencies(self, term):
+        '''
+        Iterates over (doc_id, term frequency) pairs for an already
+        tokenized term.
+        '''
+        return _postings_with_frequencies(self._searched_segments(), term)
+
+    def postings_cursor(self, term):
+        '''Returns a cursor over the postings and frequencies of a term.'''
+        segments = self._searched_segments()
+        if len(segments) == 1:
+            return segments[0].postings_cursor(term)
+        return MergedPostingsCursor([segment.postings_cursor(term)
+                                     for segment in segments])
+
+    def document_frequency(self, term):
+        '''Returns the number of documents containing a tokenized term.'''
+        return sum(segment.document_frequency(term)
+                   for segment in self._searched_segments())
+
+    def terms(self):
+        '''Returns the tokenized terms of the index.'''
+        segments = self._searched_segments()
+        if len(segments) == 1:
+            return segments[0].terms()
+        terms = set()
+        for segment in segments:
+            terms.update(segment.terms())
+        return terms
+
+    def add_file(self, file_path):
+        '''
+        Indexes the documents of a file in a new segment.
+        The documents can be queried as soon as this method returns.
+        '''
+        parser = Configuration.DocumentParser(file_path)
+        self.add_documents(file_path, parser.get_documents())
+
+    def add_documents(self, file_path, documents):
+        '''
+        Indexes documents of a file in a new segment, from the
+        (start line, end line, document) tuples given by a DocumentParser.
+        The statistics of the new documents are computed right away, the
+        ones depending on the whole collection are updated from the
+        postings of their terms before they are next used, and small
+        segments are merged in the background.
+        '''
+        index = dict()
+        for (start_pos, end_pos, document) in documents:
+            doc_id = document.get_doc_id()
+            if self._is_live(doc_id) or doc_id in index:
+                raise ValueError("doc {0} is already indexed".format(doc_id))
+            self._save_document_location(doc_id, file_path,
+                                         start_pos, end_pos, index)
+            self._add_document_to_index(doc_id, document.get_content(), index)
+            if document.get_location() is not None:
+                self._document_store.add_document(doc_id, file_path, document)
+        if not index:
+            return
+        (inverted_index, frequencies) = self._invert_index(index)
+        segment = Segment(inverted_index, frequencies,
+                          array('Q', sorted(index)), self._compressed)
+        with self._merge_lock:
+            for (doc_id, doc_index) in index.items():
+                self._compute_document_statistics(doc_id, doc_index[WORDS])
+                if self._query_only:
+                    doc_index[WORDS] = None
+                self._index[doc_id] = doc_index
+            self._segments = self._segments + [segment]
+            self._number_of_docs += len(index)
+            self._changed_terms.update(inverted_index)
+            self._added_documents.update(index)
+            self._version += 1
+        self._schedule_merge()
+
+    def delete_document(self, doc_id):
+        '''
+        Deletes a document. Its postings are skipped by queries until
+        they are dropped by purge() or by a merge. Its norms and length
+        are dropped right away, and the statistics depending on the whole
+        collection are updated from the postings of its terms before they
+        are next used.
+        The terms of a document whose term counts are not kept, in a
+        query only or memory-mapped index, are only looked up in the
+        postings when its segment is merged or purged, or when the index
+        is saved: until then, the tf-idf norms of the other documents are
+        computed with the document frequencies counting it.
+        '''
+        with self._merge_lock:
+            segment = self._live_segment(doc_id)
+            if segment is None:
+                raise ValueError("doc {0} not found".format(doc_id))
+            if self._tfidf_sums is not None:
+                term_counts = self._index[doc_id][WORDS]
+                if term_counts is None:
+                    self._deleted_documents.add(doc_id)
+                else:
+                    lexicon = self._lexicon
+                    self._changed_terms.update(
+                        lexicon.term(term_id)
+                        for term_id in term_counts[0:len(term_counts) // 2])
+                self._tfidf_sums.pop(doc_id, None)
+            segment.delete(doc_id)
+            self._number_of_docs -= 1
+            for norms in self._norms.values():
+                norms.pop(doc_id, None)
+            self._total_length -= self._document_lengths.get(doc_id, 0)
+            self._document_lengths.pop(doc_id, None)
+            self._added_documents.discard(doc_id)
+            self._version += 1
+
+    def update_document(self, doc_id, file_path):
+        '''
+        Replaces a document by the document with the same doc id
+        found in a file, which is indexed in a new segment. The
+        statistics are updated from the postings of the terms of
+        both versions of the document.
+        '''
+        parser = Configuration.DocumentParser(file_path)
+        documents = [(start_pos, end_pos, document)
+                     for (start_pos, end_pos, document) in parser.get_documents()
+                     if document.get_doc_id() == doc_id]
+        if not documents:
+            raise ValueError("doc {0} not found in {1}".format(doc_id, file_path))
+        self.delete_document(doc_id)
+        self.add_documents(file_path, documents)
+
+    def purge(self):
+        '''
+        Drops the postings and the forward index entries of the deleted
+        documents. The postings of a memory-mapped index are left as they
+        are: they are dropped when the index is saved again. The segments
+        being merged in the background are left to the merge, which drops
+        their deleted documents, and so are the segments of documents
+        deleted while their terms were looked up.
+        '''
+        self._find_deleted_terms()
+        with self._merge_lock:
+            self._segments = [
+                merge_segments([segment], self._compressed)
+                if self._can_purge(segment) and segment not in self._merging
+                else segment
+                for segment in self._segments]
+            if self._can_purge(self._base) and isinstance(self._inverted_index, dict):
+                self._base = merge_segments([self._base], self._compressed)
+                self._inverted_index = self._base._inverted_index
+                self._frequencies = self._base._frequencies
+            if isinstance(self._index, dict):
+                deleted = [doc_id for doc_id in self._index
+                           if self._live_segment(doc_id) is None]
+                for doc_id in deleted:
+                    del self._index[doc_id]
+                    self._document_store.remove(doc_id)
+                    del self._max_frequencies[doc_id]
+                    for norms in self._norms.values():
+                        norms.pop(doc_id, None)
+                    self._document_lengths.pop(doc_id, None)
+
+    def segments(self):
+        '''Returns the segments added since the index was built.'''
+        return list(self._segments)
+
+    def wait_for_merges(self):
+        '''Blocks until the background merges are done.'''
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
+
+    def get_number_of_docs(self):
+        '''Returns the number of documents in the index.'''
+        return self._number_of_docs
+
+    def max_frequency(self, doc_id):
+        '''Returns the highest term frequency of a document.'''
+        return self._max_frequencies[doc_id]
+
+    def document_norm(self, weighting, doc_id):
+        '''
+        Returns the precomputed norm of a document vector
+        for a weighting scheme (TFIDF or NORM_COUNT).
+        '''
+        if weighting == TFIDF and self._statistics_version != self._version:
+            self._refresh_statistics()
+        try:
+            return self._norms[weighting][doc_id]
+        except KeyError:
+            if weighting != TFIDF:
+                raise
+            # The document was added after the statistics were checked.
+            self._refresh_statistics()
+            return self._norms[weighting][doc_id]
+
+    def max_document_weight(self, weighting, term):
+        '''
+        Returns the highest weight of a term in a document divided by
+        the norm of the document, for a weighting scheme (TFIDF).
+        It bounds the contribution of the term to a cosine score, and is
+        computed from the postings of the term the first time it is asked
+        for a version of the index.
+        '''
+        while True:
+            if self._statistics_version != self._version:
+                self._refresh_statistics()
+            with self._merge_lock:
+                version = self._statistics_version
+                if version != self._version:
+                    continue
+                weights = self._max_weights[weighting]
+                if term in weights:
+                    return weights[term]
+                segments = self._searched_segments()
+                number_of_docs = self._number_of_docs
+                norms = self._norms[TFIDF]
+            postings = list(_postings_with_frequencies(segments, term))
+            max_weight = 0.0
+            for (doc_id, count) in postings:
+                doc_norm = norms[doc_id]
+                if doc_norm:
+                    max_weight = max(max_weight, tf_idf(
+                        count, len(postings), number_of_docs) / doc_norm)
+            with self._merge_lock:
+                if self._version == version:
+                    weights[term] = max_weight
+                    return max_weight
+
+    def document_length(self, doc_id):
+        '''Returns the number of indexed words of a document.'''
+        return self.document_lengths()[doc_id]
+
+    def document_lengths(self):
+        '''
+        Returns the mapping of the doc ids to the number of indexed words
+        of their document, read by the scorers for every posting.
+        '''
+        if self._statistics_version != self._version:
+            self._refresh_statistics()
+        return self._document_lengths
+
+    def average_document_length(self):
+        '''Returns the average number of indexed words of the documents.'''
+        if self._statistics_version != self._version:
+            self._refresh_statistics()
+        return self._total_length / self._number_of_docs if self._number_of_docs else 0.0
+
+    def idf(self, weighting, term):
+        '''
+        Returns the inverse document frequency of a term for a weighting
+        scheme (BM25), 0 for an unknown term. It is computed from the
+        document frequency of the term in the live documents of the
+        segments the first time it is asked for a version of the index.
+        '''
+        with self._merge_lock:
+            if self._idfs_version != self._version:
+                self._idfs = {BM25: dict()}
+                self._idfs_version = self._version
+            version = self._version
+            idfs = self._idfs[weighting]
+            if term in idfs:
+                return idfs[term]
+            number_of_docs = self._number_of_docs
+        document_frequency = self.document_frequency(term)
+        idf = bm25_idf(document_frequency, number_of_docs) if document_frequency else 0.0
+        with self._merge_lock:
+            if self._version == version:
+                idfs[term] = idf
+        return idf
 
     def document_by_id(self, doc_id):
         '''Returns a Document object for a requested doc id.'''
@@ -43,22 +413,148 @@ class Index:
             self._get_document_content(doc_id)
         )
 
+    def document_title(self, doc_id):
+        '''
+        Returns the title of a document, without parsing it when
+        the title is kept by the document store.
+        '''
+        title = self._document_store.title(doc_id) if self._is_live(doc_id) else None
+        if title is not None:
+            return title
+        return self.document_by_id(doc_id).get_title()
+
+    def snippet(self, doc_id, query, length=SNIPPET_LENGTH, highlight=HIGHLIGHT):
+        '''
+        Returns the passage of length words of a document that best
+        matches a query text, the words of the query being surrounded by
+        the highlight markers. Terms are weighted by their inverse
+        document frequency, so that a passage holding the rare terms of
+        the query is preferred. The positions of the terms are read from
+        a positional index, and found by the analyzer otherwise.
+        '''
+        content = self.document_by_id(doc_id).get_content()
+        terms = set(self._analyzer.analyze(query))
+        if self._positional:
+            matches = sorted((position, term) for term in terms
+                             for position in self.positions(term, doc_id))
+        else:
+            matches = [(position, term) for (position, term)
+                       in self._analyzer.analyze_positions(content) if term in terms]
+        number_of_docs = self.get_number_of_docs()
+        weights = dict((term, log(1 + number_of_docs / max(self.document_frequency(term), 1)))
+                       for term in terms)
+        return make_snippet(content, self._analyzer.spans(content), matches,
+                            weights, length, highlight)
+
+    def execute_batch(self, queries, model, k=None, processes=1):
+        '''
+        Executes query texts with a vectorial query class, such as
+        VectorialQueryTfIdf, and returns the list of their results, the
+        same as model(query).execute(index, k) for each query.
+        The queries are analyzed first, then the postings of each distinct
+        term are read once and scored for all the queries holding it.
+        With several processes, the queries are split in as many batches
+        scored by a pool of processes, each one holding a copy of the index.
+        '''
+        queries = list(queries)
+        if self._statistics_version != self._version:
+            self._refresh_statistics()
+        if processes <= 1 or len(queries) <= 1:
+            return score_batch(self, queries, model, k)
+        # The workers get a copy of the index without pending merges.
+        self.wait_for_merges()
+        size = (len(queries) + processes - 1) // processes
+        with Pool(processes, initializer=init_batch_worker, initargs=(self,)) as pool:
+            batches = pool.map(score_batch_worker, [
+                (queries[start:start + size], model, k)
+                for start in range(0, len(queries), size)])
+        return [results for batch in batches for results in batch]
+
+    def version(self):
+        '''
+        Returns the version of the index, which changes whenever
+        documents are added or deleted.
+        '''
+        return self._version
+
+    def result_cache(self):
+        '''Returns the cache of the query results.'''
+        return self._result_cache
+
+    def document_store(self):
+        '''Returns the store locating the documents of the index.'''
+        return self._document_store
+
     def index_by_doc_id(self, doc_id):
-        '''Returns a dictionary of words with their frequency in a document'''
-        return self._index[doc_id] if doc_id in self._index else dict()
+        '''
+        Returns the location of a document followed by a dictionary
+        of its words with their frequency, and by its positions
+        for a positional index.
+        '''
+        if not self._is_live(doc_id):
+            return dict()
+        entry = self._index[doc_id]
+        return entry[0:WORDS] + [TermCounts(self._lexicon, entry[WORDS])] \
+            + entry[WORDS + 1:]
+
+    def lexicon(self):
+        '''Returns the lexicon giving the ids of the terms of the forward index.'''
+        return self._lexicon
+
+    def collection_frequency(self, term):
+        '''Returns the number of occurrences of a tokenized term in the documents.'''
+        if self._statistics_version != self._version:
+            self._refresh_statistics()
+        term_id = self._lexicon.term_id(term)
+        if term_id is None:
+            # The terms of a memory-mapped index are only added to the
+            # lexicon when its statistics are computed again.
+            return sum(count for (_, count) in self.postings_with_frequencies(term))
+        return self._lexicon.collection_frequencies[term_id]
+
+    def is_positional(self):
+        '''Returns True if the index stores word positions.'''
+        return self._positional
+
+    def positions(self, term, doc_id):
+        '''
+        Returns the sorted positions of an already tokenized term
+        in a document.
+        '''
+        if not self._positional:
+            raise ValueError("The index does not store positions.")
+        if not self._is_live(doc_id):
+            return []
+        doc_positions = self._index[doc_id][POSITIONS]
+        return decode_deltas(doc_positions[term]) \
+            if term in doc_positions else []
+
+    def get_positioned_terms(self, text):
+        '''
+        Tokenizes a text like the indexed documents and returns
+        the list of (position, term).
+        '''
+        return self._analyzer.analyze_positions(text)
+
+    def analyzer(self):
+        '''Returns the analyzer turning documents and queries into terms.'''
+        return self._analyzer
 
     def get_all_doc_ids(self):
         '''Returns a list with all doc ids in the index'''
-        return [doc_id for doc_id in self._index]
+        if not self._has_deletions():
+            return [doc_id for doc_id in self._index]
+        return [doc_id for doc_id in self._index if self._is_live(doc_id)]
 
     def compute_tfidf_for_word(self, word, vector):
         '''
         Computes the tfidf for one word in one vector,
         using the current index statistics.
         '''
-        if word in self._inverted_index:
+        document_frequency = self.document_frequency(word)
+        if document_frequency:
             tfidf = tf_idf(vector[word],
-                           len(self._inverted_index[word]),
+                           document_frequency,
                            self._number_of_docs)
             return tfidf
         else:
@@ -75,60 +571,381 @@ class Index:
     def _init_index(self):
         '''Initializes the index and inverted index.'''
         if isinstance(self._data_files, str):
-            self._index_files_threading([self._data_files], 1)
+            self._index_files_threading([self._data_files],
+                                        Configuration.number_of_threads)
         elif type(self._data_files) is list:
             self._index_files_threading(self._data_files, Configuration.number_of_threads)
         else:
             raise TypeError("dataFiles should be a string or a list")
+        self._init_base()
         self._number_of_docs = len(self._index)
+        self._refresh_statistics(full=True)
+
+    def _build_inverted_index(self):
+        '''Rebuilds the inverted index and statistics from the forward index.'''
+        (self._inverted_index, self._frequencies) = \
+            self._invert_index(self._index)
+        self._version += 1
+        self._segments = []
+        self._init_base()
+        self._compute_statistics()
+
+    def _init_base(self, doc_ids=None):
+        '''
+        Wraps the postings built with the index in the base segment.
+        doc_ids are the sorted doc ids of the documents of the postings.
+        '''
+        if doc_ids is None:
+            doc_ids = array('Q', sorted(self._index))
+        self._base = Segment(self._inverted_index, self._frequencies,
+                             doc_ids, self._compressed)
+
+    def _searched_segments(self):
+        '''Returns the base segment followed by the added segments.'''
+        return [self._base] + self._segments
+
+    def _live_segment(self, doc_id):
+        '''Returns the segment holding the live version of a document, or None.'''
+        for segment in reversed(self._searched_segments()):
+            if segment.contains(doc_id):
+                return segment
+        return None
+
+    def _find_deleted_terms(self, segments=None):
+        '''
+        Looks up the terms of the deleted documents whose term counts are
+        not kept in the postings of segments, all of them by default, so
+        that the statistics are updated from the postings of these terms.
+        The postings are read without holding the merge lock.
+        '''
+        with self._merge_lock:
+            if segments is None:
+                segments = self._searched_segments()
+            found = [(segment, [doc_id for doc_id in self._deleted_documents
+                                if doc_id in segment.deleted()])
+                     for segment in segments]
+        terms = set()
+        doc_ids = set()
+        for (segment, deleted) in found:
+            if deleted:
+                terms.update(segment.terms_of_documents(deleted))
+                doc_ids.update(deleted)
+        if not doc_ids:
+            return
+        with self._merge_lock:
+            self._changed_terms.update(terms)
+            self._deleted_documents.difference_update(doc_ids)
+            self._version += 1
+
+    def _can_purge(self, segment):
+        '''
+        Returns True if a segment has deleted documents, and the terms of
+        all of them are known.
+        '''
+        deleted = segment.deleted()
+        return bool(deleted) and not any(
+            doc_id in deleted for doc_id in self._deleted_documents)
+
+    def _has_deletions(self):
+        return any(segment.deleted() for segment in self._searched_segments())
+
+    def _is_live(self, doc_id):
+        '''Returns True if a document is indexed and not deleted.'''
+        if not self._has_deletions():
+            return doc_id in self._index
+        return doc_id in self._index and self._live_segment(doc_id) is not None
+
+    def _init_segments(self):
+        '''Initializes an index without added segments.'''
+        self._segments = []
+        self._merge_policy = TieredMergePolicy()
+        self._merge_lock = threading.Lock()
+        self._merge_thread = None
+        self._merging = []
+        self._init_statistics()
+
+    def _init_statistics(self):
+        '''
+        Initializes the state from which the statistics depending on the
+        whole collection are updated: the (sum of w^2, sum of w^2 log df,
+        sum of w^2 log^2 df) of the tf weights w of each document, the
+        document frequencies they were computed with, and the terms and
+        documents changed since.
+        '''
+        self._tfidf_sums = None
+        self._tfidf_frequencies = None
+        self._changed_terms = set()
+        self._added_documents = set()
+        self._deleted_documents = set()
+        self._statistics_version = self._version
+        self._statistics_lock = threading.Lock()
+
+    def _compute_statistics(self):
+        '''
+        Computes the document norms used by the vectorial models,
+        so that queries only have to read the postings of their terms.
+        '''
+        self._number_of_docs = len(self._index)
+        self._max_frequencies = dict()
+        self._norms = {TFIDF: dict(), NORM_COUNT: dict()}
+        self._document_lengths = dict()
+        self._total_length = 0
+        for (doc_id, doc_index) in self._index.items():
+            self._compute_document_statistics(doc_id, doc_index[WORDS])
+        self._refresh_statistics(full=True)
+
+    def _compute_document_statistics(self, doc_id, term_counts):
+        '''
+        Computes the statistics of a document that do not depend
+        on the rest of the collection, from its term counts.
+        '''
+        counts = term_counts[len(term_counts) // 2:]
+        (self._max_frequencies[doc_id], self._norms[NORM_COUNT][doc_id]) = \
+            norm_count_statistics(counts)
+        length = sum(counts)
+        self._document_lengths[doc_id] = length
+        self._total_length += length
+
+    def _refresh_statistics(self, full=False):
+        '''
+        Brings the statistics depending on the whole collection up to date:
+        the tf-idf document norms, and the document and collection
+        frequencies of the lexicon. They are computed from a snapshot of
+        the segments taken under the merge lock, and only replace the
+        current ones if no document was added or deleted meanwhile.
+        Only the postings of the terms of the changed documents are read,
+        and the norms are derived from the sums of the documents and the
+        number of documents when they are read. The first computation of
+        an index built in memory, or a full one, reads every posting; a
+        memory-mapped index reads the sums saved with it.
+        The maximal weights of the terms are computed again when they
+        are next asked for.
+        '''
+        with self._statistics_lock:
+            while full or self._statistics_version != self._version:
+                with self._merge_lock:
+                    version = self._version
+                    segments = self._searched_segments()
+                    number_of_docs = self._number_of_docs
+                    changed_terms = None
+                    if not full and self._tfidf_sums is not None:
+                        changed_terms = set(self._changed_terms)
+                        added_documents = set(self._added_documents)
+                        sums = self._tfidf_sums
+                        frequencies = self._tfidf_frequencies
+                if changed_terms is None:
+                    statistics = _collection_statistics(segments, number_of_docs)
+                else:
+                    statistics = _updated_statistics(
+                        segments, number_of_docs, changed_terms,
+                        added_documents, sums, frequencies)
+                with self._merge_lock:
+                    if self._version == version:
+                        self._publish_statistics(version, statistics)
+                        full = False
+
+    def _publish_statistics(self, version, statistics):
+        '''
+        Replaces the statistics by the ones computed for a version of the
+        index, or updates them with the sums and document frequencies
+        that changed.
+        '''
+        if statistics['norms'] is not None:
+            # Every posting was read, deleted documents included.
+            self._deleted_documents = set()
+            self._tfidf_sums = statistics['sums']
+            self._tfidf_frequencies = statistics['frequencies']
+            self._norms[TFIDF] = statistics['norms']
+        else:
+            self._tfidf_sums.update(statistics['sums'])
+            self._tfidf_frequencies.update(statistics['frequencies'])
+            self._norms[TFIDF] = _TfIdfNorms(self._tfidf_sums, self._number_of_docs)
+        self._max_weights = {TFIDF: dict()}
+        lexicon = self._lexicon
+        for (term, (document_frequency, collection_frequency)) \
+                in statistics['term_frequencies'].items():
+            term_id = lexicon.add(term)
+            lexicon.document_frequencies[term_id] = document_frequency
+            lexicon.collection_frequencies[term_id] = collection_frequency
+        if statistics['lengths'] is not None:
+            self._document_lengths = statistics['lengths']
+            self._total_length = sum(statistics['lengths'].values())
+        self._changed_terms = set()
+        self._added_documents = set()
+        self._statistics_version = version
+
+    def _schedule_merge(self):
+        '''Starts a background merge if the merge policy finds one.'''
+        with self._merge_lock:
+            if self._merge_thread is not None:
+                # The running merge looks for another merge once it is done.
+                return
+            if not self._merge_policy.find_merge(self._segments):
+                return
+            self._merge_thread = threading.Thread(target=self._merge)
+            self._merge_thread.daemon = True
+            self._merge_thread.start()
+
+    def _merge(self):
+        '''Merges segments until the merge policy finds nothing to merge.'''
+        while True:
+            with self._merge_lock:
+                selected = self._merge_policy.find_merge(self._segments)
+                if not selected:
+                    self._merge_thread = None
+                    self._merging = []
+                    return
+                self._merging = selected
+                snapshots = [segment.snapshot() for segment in selected]
+            # The postings of the deleted documents are dropped by the merge.
+            self._find_deleted_terms(selected)
+            merged = merge_segments(snapshots, self._compressed)
+            with self._merge_lock:
+                # Documents deleted during the merge are deleted again. The
+                # ones deleted before are not in the merged segment, and
+                # their doc id may be the one of a live updated document.
+                for (segment, snapshot) in zip(selected, snapshots):
+                    for doc_id in segment.deleted():
+                        if doc_id not in snapshot.deleted() and merged.contains(doc_id):
+                            merged.delete(doc_id)
+                self._segments = [segment for segment in self._segments
+                                  if segment not in selected] + [merged]
+                self._merging = []
 
     def _index_files_threading(self, data_files, nbr_threads):
+        '''
+        Indexes the files with nbr_threads processes.
+        The files are cut at document boundaries into byte ranges of
+        similar size, so that a single large file is shared between the
+        workers. Each range is inverted by a worker into a partial index,
+        then each partition of the terms is merged by a worker. The forward index
+        only keeps the word counts of the documents when the index
+        is not query only.
+        '''
+        forward = not self._query_only
         start_time = time.time()
         if nbr_threads <= 1:
-            indexes = [self._index_file(x) for x in data_files]
+            partials = [invert_file(file_path, Configuration.DocumentParser,
+                                    self._analyzer, self._positional, forward, 1,
+                                    store_documents=self._document_store.is_compressed())
+                        for file_path in data_files]
+            print("map ended in {0} seconds".format(time.time() - start_time))
+            start_time = time.time()
+            (self._inverted_index, self._frequencies) = merge_partition(
+                [partial.postings[0] for partial in partials], self._compressed)
+            documents = [(partial.file_path, partial.documents, partial.vocabulary)
+                         for partial in partials]
+            # The postings of the partial indexes are not needed anymore.
+            partials = None
         else:
-            with Pool(nbr_threads) as pool:
-                indexes = pool.map(self._index_file, data_files)
-        print("map ended in {0} seconds".format(time.time() - start_time))
-        start_time = time.time()
-        self._index = reduce(lambda x, y: merge_dictionaries(x, y, merge_dictionaries), indexes, dict())
-        print("reduce ended in {0} seconds".format(time.time() - start_time))
-        start_time = time.time()
-        self._inverted_index = self._invert_index(self._index)
-        print("inversion ended in {0} seconds".format(time.time() - start_time))
+            ranges = split_files(data_files, Configuration.DocumentParser,
+                                 nbr_threads)
+            directory = tempfile.mkdtemp()
+            try:
+                with Pool(nbr_threads) as pool:
+                    outputs = pool.map(invert_file_to_disk, [
+                        (file_path, byte_range, Configuration.DocumentParser,
+                         self._analyzer, self._positional, forward, nbr_threads,
+                         self._document_store.is_compressed(),
+                         os.path.join(directory, str(number)))
+                        for (number, (file_path, byte_range)) in enumerate(ranges)])
+                    print("map ended in {0} seconds".format(time.time() - start_time))
+                    start_time = time.time()
+                    merged_paths = pool.map(merge_partition_files, [
+                        ([partition_paths[partition] for (_, partition_paths) in outputs],
+                         self._compressed,
+                         os.path.join(directory, "merged.{0}".format(partition)))
+                        for partition in range(0, nbr_threads)])
+                self._inverted_index = dict()
+                self._frequencies = dict()
+                for path in merged_paths:
+                    (inverted_index, frequencies) = load(path)
+                    self._inverted_index.update(inverted_index)
+                    self._frequencies.update(frequencies)
+                documents = [(file_path,) + load(documents_path)
+                             for ((file_path, _), (documents_path, _))
+                             in zip(ranges, outputs)]
+            finally:
+                shutil.rmtree(directory)
+        # Term ids follow the order of the terms, and the lexicon holds
+        # the same term strings as the inverted index.
+        for term in sorted(self._inverted_index):
+            self._lexicon.add(term)
+        for (file_path, file_documents, vocabulary) in documents:
+            self._add_partial_documents(file_path, file_documents, vocabulary)
+        print("merge ended in {0} seconds".format(time.time() - start_time))
+
+    def _add_partial_documents(self, file_path, documents, vocabulary):
+        '''
+        Adds the documents of a PartialIndex to the forward index and to
+        the document store, translating the term ids of the partial index
+        to the ids of the lexicon.
+        '''
+        term_ids = [self._lexicon.term_id(term) for term in vocabulary]
+        for (doc_id, start_pos, end_pos, max_frequency, norm_count_norm,
+             positions, word_counts, location, packed) in documents:
+            term_counts = None
+            if word_counts:
+                term_counts = encode_term_counts(
+                    [term_ids[term_id] for term_id in word_counts[0]], word_counts[1])
+            self._index[doc_id] = [file_path, start_pos, end_pos, term_counts]
+            if self._positional:
+                self._index[doc_id].append(positions)
+            self._max_frequencies[doc_id] = max_frequency
+            self._norms[NORM_COUNT][doc_id] = norm_count_norm
+            self._document_store.add(doc_id, file_path, location, packed)
 
     def _invert_index(self, index):
+        '''
+        Returns the inverted index (word -> sorted doc ids) and the
+        term frequencies stored in the same order as the postings.
+        A compressed index stores the frequencies inside its postings.
+        '''
+        postings = dict()
+        for doc_id in sorted(index):
+            term_counts = index[doc_id][WORDS]
+            length = len(term_counts) // 2
+            for position in range(0, length):
+                term_id = term_counts[position]
+                if term_id not in postings:
+                    postings[term_id] = ([], [])
+                postings[term_id][0].append(doc_id)
+                postings[term_id][1].append(term_counts[length + position])
         inverted_index = dict()
-        for (doc_id, doc_index) in index.items():
-            for word in doc_index[WORDS]:
-                if not word in inverted_index:
-                    inverted_index[word] = []
-                inverted_index[word].append(doc_id)
-        return inverted_index
-
-    def _index_file(self, file_path):
-        '''Populating the index with the results for one file.'''
-        index = dict()
-        parser = Configuration.DocumentParser(file_path)
-        for (start_pos, end_pos, document) in parser.get_documents():
-            self._save_document_location(document.get_doc_id(), file_path,
-                                         start_pos, end_pos, index)
-            self._add_document_to_index(document.get_doc_id(),
-                                        document.get_content(), index)
-        return index
+        frequencies = dict()
+        for (term_id, (doc_ids, counts)) in postings.items():
+            term = self._lexicon.term(term_id)
+            inverted_index[term] = doc_ids
+            frequencies[term] = counts
+        if self._compressed:
+            for word in inverted_index:
+                inverted_index[word] = CompressedPostings(
+                    inverted_index[word], frequencies[word])
+            frequencies = dict()
+        return (inverted_index, frequencies)
 
     def _save_document_location(self, doc_id, file, start_pos, end_pos, index):
         '''Saves the position of the document in its file for later reads.'''
-        index[doc_id] = [file, start_pos, end_pos, {}]
+        index[doc_id] = [file, start_pos, end_pos, None]
+        if self._positional:
+            index[doc_id].append({})
 
     def _add_document_to_index(self, doc_id, content, index):
         '''Populating the index with the result for one document.'''
-        word_count = DocumentIndex(content, self._stop_words).get_word_count()
-        index[doc_id][WORDS] = word_count
+        doc_index = DocumentIndex(content, positional=self._positional,
+                                  analyzer=self._analyzer)
+        index[doc_id][WORDS] = self._lexicon.encode(doc_index.get_word_count())
+        if self._positional:
+            index[doc_id][POSITIONS] = doc_index.get_positions()
 
     def _get_document_content(self, doc_id):
-        '''Outputs the document content as a list of lines'''
-        if doc_id in self._index:
+        '''
+        Returns the raw text of a document, read from the document store,
+        or line by line from its file for documents without a byte location.
+        '''
+        if self._is_live(doc_id):
+            if doc_id in self._document_store:
+                return self._document_store.read(doc_id)
             content = ""
             doc_info = self._index[doc_id]
             with open(doc_info[FILE], encoding="utf8") as file_ptr:
@@ -136,4 +953,143 @@ class Index:
                     if i >= doc_info[START] and i <= doc_info[END]:
                         content = content + "\n" + line
             return content
-        raise ValueError("doc " + doc_id + " not found")
+        raise ValueError("doc {0} not found".format(doc_id))
+
+
+def _postings_with_frequencies(segments, term):
+    '''Iterates over the (doc_id, term frequency) pairs of a term in segments.'''
+    if len(segments) == 1:
+        return segments[0].postings_with_frequencies(term)
+    return heapq.merge(*[segment.postings_with_frequencies(term)
+                         for segment in segments])
+
+
+def _live_doc_ids(segments):
+    '''Returns the doc ids of the live documents of segments.'''
+    doc_ids = []
+    for segment in segments:
+        deleted = segment.deleted()
+        doc_ids.extend(doc_id for doc_id in segment.doc_ids()
+                       if doc_id not in deleted)
+    return doc_ids
+
+
+def _tfidf_norm(sums, number_of_docs):
+    '''
+    Returns the tf-idf norm of a document from its (sum of w^2, sum of
+    w^2 log df, sum of w^2 log^2 df) over its terms, w being the log of
+    the term frequency plus one: the root of the sum of w^2 (log N - log df)^2,
+    divided by log(10)^2 as tf_idf uses base 10 logarithms.
+    '''
+    (weights, log_weights, squared_log_weights) = sums
+    log_docs = log(number_of_docs) if number_of_docs else 0.0
+    squared_norm = weights * log_docs * log_docs - 2 * log_docs * log_weights \
+        + squared_log_weights
+    return sqrt(max(squared_norm, 0.0)) / log(10) ** 2
+
+
+def _collection_statistics(segments, number_of_docs):
+    '''
+    Computes the statistics depending on the whole collection from every
+    posting of segments, along with the lengths of the documents.
+    '''
+    terms = set()
+    for segment in segments:
+        terms.update(segment.terms())
+    doc_ids = _live_doc_ids(segments)
+    sums = dict.fromkeys(doc_ids, (0.0, 0.0, 0.0))
+    squared_norms = dict.fromkeys(doc_ids, 0.0)
+    lengths = dict.fromkeys(doc_ids, 0)
+    frequencies = dict()
+    term_frequencies = dict()
+    for term in terms:
+        postings = list(_postings_with_frequencies(segments, term))
+        document_frequency = len(postings)
+        collection_frequency = 0
+        if document_frequency:
+            frequencies[term] = document_frequency
+            log_frequency = log(document_frequency)
+        for (doc_id, count) in postings:
+            weight = log(count + 1) ** 2
+            (weights, log_weights, squared_log_weights) = sums[doc_id]
+            sums[doc_id] = (weights + weight, log_weights + weight * log_frequency,
+                            squared_log_weights + weight * log_frequency ** 2)
+            squared_norms[doc_id] += tf_idf(
+                count, document_frequency, number_of_docs) ** 2
+            lengths[doc_id] += count
+            collection_frequency += count
+        term_frequencies[term] = (document_frequency, collection_frequency)
+    return {
+        'sums': sums,
+        'frequencies': frequencies,
+        'norms': {doc_id: sqrt(squared_norm)
+                  for (doc_id, squared_norm) in squared_norms.items()},
+        'term_frequencies': term_frequencies,
+        'lengths': lengths
+    }
+
+
+def _updated_statistics(segments, number_of_docs, changed_terms,
+                        added_documents, sums, frequencies):
+    '''
+    Returns the sums and document frequencies that changed, computed from
+    the postings of the changed terms only: the added documents get the
+    sums of these terms, the sums of the other documents holding a term
+    whose document frequency changed are corrected. The current sums and
+    frequencies are only read.
+    '''
+    updated_sums = dict.fromkeys(added_documents, (0.0, 0.0, 0.0))
+    updated_frequencies = dict()
+    term_frequencies = dict()
+    for term in changed_terms:
+        postings = list(_postings_with_frequencies(segments, term))
+        document_frequency = len(postings)
+        previous_frequency = frequencies.get(term, 0)
+        log_frequency = log(document_frequency) if document_frequency else 0.0
+        previous_log = log(previous_frequency) if previous_frequency else 0.0
+        collection_frequency = 0
+        for (doc_id, count) in postings:
+            collection_frequency += count
+            if doc_id in added_documents:
+                weight = log(count + 1) ** 2
+                (weights, log_weights, squared_log_weights) = updated_sums[doc_id]
+                updated_sums[doc_id] = (
+                    weights + weight, log_weights + weight * log_frequency,
+                    squared_log_weights + weight * log_frequency ** 2)
+            elif document_frequency != previous_frequency:
+                doc_sums = updated_sums.get(doc_id) or sums.get(doc_id)
+                if doc_sums is None:
+                    # Deleted meanwhile, these statistics are not published.
+                    continue
+                weight = log(count + 1) ** 2
+                (weights, log_weights, squared_log_weights) = doc_sums
+                updated_sums[doc_id] = (
+                    weights, log_weights + weight * (log_frequency - previous_log),
+                    squared_log_weights + weight * (log_frequency ** 2 - previous_log ** 2))
+        updated_frequencies[term] = document_frequency
+        term_frequencies[term] = (document_frequency, collection_frequency)
+    return {
+        'sums': updated_sums,
+        'frequencies': updated_frequencies,
+        'norms': None,
+        'term_frequencies': term_frequencies,
+        'lengths': None
+    }
+
+
+class _TfIdfNorms(dict):
+
+    '''
+    Tf-idf norms of the documents, each one computed from the sums of the
+    document and the number of documents when it is first read.
+    '''
+
+    def __init__(self, sums, number_of_docs):
+        dict.__init__(self)
+        self._sums = sums
+        self._number_of_docs = number_of_docs
+
+    def __missing__(self, doc_id):
+        norm = _tfidf_norm(self._sums[doc_id], self._number_of_docs)
+        self[doc_id] = norm
+        return norm
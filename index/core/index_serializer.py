@@ -1,13 +1,17 @@
 '''
 Allow to save an index to a file or read a saved index.
 '''
+import copy
 import pickle
+from .disk_index import save_disk_index, load_disk_index, is_disk_index
 
 
 class IndexSerializer(object):
 
     '''
     Allow to save an index to a file or read a saved index.
+    An index is either pickled in a single file, or saved in the
+    memory-mapped disk format in a directory.
     '''
 
     def __init__(self):
@@ -18,18 +22,38 @@ class IndexSerializer(object):
         '''
         Save the index to the specified file.
         '''
-        file_ptr = open(file_path, 'wb')
-        index._inverted_index = []
-        pickle.dump(index, file_ptr, protocol=4)
-        file_ptr.close()
+        saved_index = index
+        if not index._query_only:
+            # The postings are rebuilt from the forward index when loading,
+            # they are only left out of a shallow copy of the index.
+            saved_index = copy.copy(index)
+            saved_index._index = {doc_id: index._index[doc_id]
+                                  for doc_id in index.get_all_doc_ids()}
+            saved_index._inverted_index = dict()
+            saved_index._frequencies = dict()
+            saved_index._base = None
+            saved_index._segments = []
+        with open(file_path, 'wb') as file_ptr:
+            pickle.dump(saved_index, file_ptr, protocol=4)
+
+    @staticmethod
+    def save_to_directory(index, path):
+        '''
+        Save the index in the memory-mapped disk format,
+        in the specified directory.
+        '''
+        save_disk_index(index, path)
 
     @staticmethod
     def load_from_file(file_path):
         '''
-        Load and returns and index from a file.
+        Load and returns and index from a file, or from a directory
+        holding an index in the memory-mapped disk format.
         '''
-        file_ptr = open(file_path, 'rb')
-        index = pickle.load(file_ptr)
-        index._inverted_index = index._invert_index(index._index)
-        file_ptr.close()
+        if is_disk_index(file_path):
+            return load_disk_index(file_path)
+        with open(file_path, 'rb') as file_ptr:
+            index = pickle.load(file_ptr)
+        if not index._query_only:
+            index._build_inverted_index()
         return index
@@ -0,0 +1,104 @@
+'''
+Provides the lexicon mapping the terms of an index to dense integer ids,
+and the compact term counts of the forward index built on it.
+'''
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+
+class Lexicon(object):
+
+    '''
+    Maps every term of an index to a dense integer id.
+    Each term string is stored once, and the document frequency and the
+    collection frequency of the terms are stored in arrays indexed
+    by term id.
+    '''
+
+    def __init__(self):
+        self._ids = dict()
+        self._terms = []
+        self.document_frequencies = array('I')
+        self.collection_frequencies = array('Q')
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term):
+        return term in self._ids
+
+    def add(self, term):
+        '''Returns the id of a term, adding the term if it is new.'''
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._ids[term] = term_id
+            self._terms.append(term)
+            self.document_frequencies.append(0)
+            self.collection_frequencies.append(0)
+        return term_id
+
+    def term_id(self, term):
+        '''Returns the id of a term, or None if it is not in the lexicon.'''
+        return self._ids.get(term)
+
+    def term(self, term_id):
+        '''Returns the term of an id.'''
+        return self._terms[term_id]
+
+    def terms(self):
+        '''Returns the list of the terms, indexed by id.'''
+        return self._terms
+
+    def encode(self, words):
+        '''
+        Returns the term counts of a dictionary of words and counts,
+        adding the new words to the lexicon.
+        '''
+        return encode_term_counts([self.add(word) for word in words],
+                                  [words[word] for word in words])
+
+
+def encode_term_counts(term_ids, counts):
+    '''
+    Returns the term counts of a document as a single array('I'): the
+    sorted term ids followed by their counts in the same order.
+    '''
+    pairs = sorted(zip(term_ids, counts))
+    return array('I', [term_id for (term_id, _) in pairs]
+                 + [count for (_, count) in pairs])
+
+
+class TermCounts(Mapping):
+
+    '''
+    Read-only dictionary view mapping the terms of a document to their
+    counts, over term counts and the lexicon of their term ids.
+    None stands for the term counts of a document that are not kept.
+    '''
+
+    __slots__ = ['_lexicon', '_data', '_length']
+
+    def __init__(self, lexicon, term_counts):
+        self._lexicon = lexicon
+        self._data = term_counts if term_counts is not None else array('I')
+        self._length = len(self._data) // 2
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        lexicon = self._lexicon
+        return (lexicon.term(term_id) for term_id in self._data[0:self._length])
+
+    def __getitem__(self, term):
+        term_id = self._lexicon.term_id(term)
+        if term_id is not None:
+            position = bisect_left(self._data, term_id, 0, self._length)
+            if position < self._length and self._data[position] == term_id:
+                return self._data[self._length + position]
+        raise KeyError(term)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,198 @@
+'''
+Provides the functions run by the processes that build an index.
+
+Each file, or each byte range of a large file cut at document
+boundaries, is inverted by a worker into a compact partial index: postings
+stored in arrays, split in partitions of terms, along with the
+statistics of its documents. Each partition of the terms is then merged
+by a worker of its own. Partial indexes and merged partitions are handed
+over through temporary files, so that only file paths are pickled
+between processes.
+'''
+import os
+import pickle
+import zlib
+from array import array
+from .document_index import DocumentIndex
+from .document_store import pack_document
+from .postings import CompressedPostings
+from .utility import norm_count_statistics
+
+
+class PartialIndex(object):
+
+    '''
+    Inverted index of the documents of one file, or of a byte range of it.
+    postings holds one dictionary per partition of the terms, mapping
+    a term to the arrays of its sorted doc ids and of its frequencies.
+    documents holds one tuple per document: doc id, start line, end line,
+    maximal frequency, norm count norm, positions, word counts, byte
+    location and packed document.
+    Word counts are (term ids, counts) arrays indexing the vocabulary,
+    or None when the forward index is not kept. The byte location is the
+    (offset, length) of the document in the file, and the packed document
+    its (compressed text, title) when documents are stored, or None.
+    '''
+
+    def __init__(self, file_path, partitions):
+        self.file_path = file_path
+        self.postings = [dict() for _ in range(0, partitions)]
+        self.documents = []
+        self.vocabulary = []
+
+
+def term_partition(term, partitions):
+    '''Returns the partition of a term, the same in every process.'''
+    return zlib.crc32(term.encode('utf8')) % partitions
+
+
+def split_files(data_files, parser_class, parts):
+    '''
+    Cuts the files into about parts byte ranges of similar size, so that
+    a single large file is indexed by several workers.
+    Returns the (file path, byte range) of the ranges, in the order
+    of the files. A byte range is None for a whole file.
+    '''
+    if parts <= 1:
+        return [(file_path, None) for file_path in data_files]
+    sizes = [os.path.getsize(file_path) for file_path in data_files]
+    range_size = max(sum(sizes) // parts, 1)
+    ranges = []
+    for (file_path, size) in zip(data_files, sizes):
+        file_ranges = parser_class(file_path).split((size + range_size - 1) // range_size) \
+            if size > range_size else []
+        if len(file_ranges) > 1:
+            ranges.extend((file_path, byte_range) for byte_range in file_ranges)
+        else:
+            ranges.append((file_path, None))
+    return ranges
+
+
+def invert_file(file_path, parser_class, analyzer, positional,
+                forward, partitions, byte_range=None, store_documents=False):
+    '''
+    Parses and inverts the documents of a file into a PartialIndex.
+    byte_range is a (start offset, end offset, first line) range
+    returned by the split method of the parser, or None for the whole file.
+    The word counts of the documents are kept when forward is True, and
+    their compressed texts and titles when store_documents is True.
+    '''
+    partial = PartialIndex(file_path, partitions)
+    term_ids = dict()
+    previous_doc_id = None
+    sorted_doc_ids = True
+    parser = parser_class(file_path)
+    for (start_pos, end_pos, document) in parser.get_documents(*(byte_range or ())):
+        doc_id = document.get_doc_id()
+        if previous_doc_id is not None and doc_id <= previous_doc_id:
+            sorted_doc_ids = False
+        previous_doc_id = doc_id
+        doc_index = DocumentIndex(document.get_content(), positional=positional,
+                                  analyzer=analyzer)
+        words = doc_index.get_word_count()
+        counts = [words[word] for word in words]
+        word_counts = None
+        if forward:
+            word_counts = (array('I'), array('I', counts))
+        for (word, count) in zip(words, counts):
+            if word not in term_ids:
+                term_ids[word] = len(partial.vocabulary)
+                partial.vocabulary.append(word)
+                partial.postings[term_partition(word, partitions)][word] = \
+                    (array('Q'), array('I'))
+            (doc_ids, frequencies) = \
+                partial.postings[term_partition(word, partitions)][word]
+            doc_ids.append(doc_id)
+            frequencies.append(count)
+            if forward:
+                word_counts[0].append(term_ids[word])
+        (max_frequency, norm_count_norm) = norm_count_statistics(counts)
+        partial.documents.append((
+            doc_id, start_pos, end_pos, max_frequency, norm_count_norm,
+            doc_index.get_positions() if positional else None, word_counts,
+            document.get_location(),
+            pack_document(document) if store_documents else None))
+    if not sorted_doc_ids:
+        for postings in partial.postings:
+            for (term, (doc_ids, frequencies)) in postings.items():
+                pairs = sorted(zip(doc_ids, frequencies))
+                postings[term] = (array('Q', [doc_id for (doc_id, _) in pairs]),
+                                  array('I', [count for (_, count) in pairs]))
+    return partial
+
+
+def merge_partition(postings_list, compressed):
+    '''
+    Merges the postings of one partition of the terms coming from
+    several partial indexes, whose doc ids are disjoint.
+    Returns the (inverted index, frequencies) of the partition.
+    '''
+    parts = dict()
+    for postings in postings_list:
+        for (term, arrays) in postings.items():
+            parts.setdefault(term, []).append(arrays)
+    inverted_index = dict()
+    frequencies = dict()
+    for (term, arrays) in parts.items():
+        arrays.sort(key=lambda term_arrays: term_arrays[0][0])
+        doc_ids = [doc_id for (term_doc_ids, _) in arrays for doc_id in term_doc_ids]
+        counts = [count for (_, term_counts) in arrays for count in term_counts]
+        if any(arrays[i][0][-1] > arrays[i + 1][0][0]
+               for i in range(0, len(arrays) - 1)):
+            # The doc ids of the partial indexes overlap.
+            pairs = sorted(zip(doc_ids, counts))
+            doc_ids = [doc_id for (doc_id, _) in pairs]
+            counts = [count for (_, count) in pairs]
+        if compressed:
+            inverted_index[term] = CompressedPostings(doc_ids, counts)
+        else:
+            inverted_index[term] = doc_ids
+            frequencies[term] = counts
+    return (inverted_index, frequencies)
+
+
+def invert_file_to_disk(task):
+    '''
+    Pool worker inverting a file or a byte range of it.
+    Writes the documents and each partition of the postings of the
+    PartialIndex to files prefixed by output_prefix and returns the
+    (documents path, [partition paths]).
+    '''
+    (file_path, byte_range, parser_class, analyzer, positional, forward,
+     partitions, store_documents, output_prefix) = task
+    partial = invert_file(file_path, parser_class, analyzer, positional,
+                          forward, partitions, byte_range, store_documents)
+    documents_path = output_prefix + ".documents"
+    _dump((partial.documents, partial.vocabulary), documents_path)
+    partition_paths = []
+    for (partition, postings) in enumerate(partial.postings):
+        path = "{0}.{1}.postings".format(output_prefix, partition)
+        _dump(postings, path)
+        partition_paths.append(path)
+    return (documents_path, partition_paths)
+
+
+def merge_partition_files(task):
+    '''
+    Pool worker merging one partition of the terms from the files written
+    by invert_file_to_disk. Writes the merged (inverted index, frequencies)
+    to output_path and returns it.
+    '''
+    (partition_paths, compressed, output_path) = task
+    postings_list = []
+    for path in partition_paths:
+        postings_list.append(load(path))
+        os.remove(path)
+    _dump(merge_partition(postings_list, compressed), output_path)
+    return output_path
+
+
+def load(path):
+    '''Loads an object written by a worker.'''
+    with open(path, 'rb') as file_ptr:
+        return pickle.load(file_ptr)
+
+
+def _dump(value, path):
+    with open(path, 'wb') as file_ptr:
+        pickle.dump(value, file_ptr, protocol=4)
@@ -0,0 +1,384 @@
+'''
+Provides postings lists representations and cursors to walk through them.
+'''
+import heapq
+from array import array
+from bisect import bisect_left
+from .compression import encode_vbyte
+
+
+class PostingsCursor(object):
+
+    '''
+    Forward-only cursor over a postings list sorted by doc id
+    and the term frequencies stored in the same order.
+    Frequencies can be omitted when only doc ids are read.
+    '''
+
+    def __init__(self, doc_ids, frequencies=None):
+        self._doc_ids = doc_ids
+        self._frequencies = frequencies
+        self._position = 0
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def at_end(self):
+        '''Returns True once every posting has been read.'''
+        return self._position >= len(self._doc_ids)
+
+    def doc_id(self):
+        '''Returns the doc id of the current posting.'''
+        return self._doc_ids[self._position]
+
+    def frequency(self):
+        '''Returns the term frequency of the current posting.'''
+        return self._frequencies[self._position]
+
+    def next(self):
+        '''Moves to the next posting.'''
+        self._position += 1
+
+    def next_geq(self, target):
+        '''
+        Moves to the first posting whose doc id is greater than
+        or equal to target.
+        Gallops from the current position so that short jumps are cheap
+        and long jumps cost a logarithmic number of comparisons.
+        '''
+        doc_ids = self._doc_ids
+        length = len(doc_ids)
+        low = self._position
+        if low >= length or doc_ids[low] >= target:
+            return
+        step = 1
+        while low + step < length and doc_ids[low + step] < target:
+            low += step
+            step *= 2
+        self._position = bisect_left(
+            doc_ids, target, low + 1, min(low + step + 1, length))
+
+
+class CompressedPostings(object):
+
+    '''
+    Postings list stored as variable-byte coded (doc id gap, frequency)
+    pairs in a single bytes object.
+    A skip table records the position of every block of SKIP_INTERVAL
+    postings, so that cursors can jump over whole blocks.
+    '''
+
+    SKIP_INTERVAL = 64
+
+    __slots__ = ['_data', '_length', '_skip_doc_ids', '_skip_offsets']
+
+    def __init__(self, doc_ids, frequencies):
+        '''Compresses a sorted list of doc ids and their frequencies.'''
+        numbers = []
+        previous = 0
+        skip_doc_ids = []
+        skip_offsets = []
+        data = bytearray()
+        for (position, (doc_id, frequency)) in enumerate(zip(doc_ids, frequencies)):
+            if position and position % CompressedPostings.SKIP_INTERVAL == 0:
+                data.extend(encode_vbyte(numbers))
+                numbers = []
+                skip_doc_ids.append(previous)
+                skip_offsets.append(len(data))
+            numbers.append(doc_id - previous)
+            numbers.append(frequency)
+            previous = doc_id
+        data.extend(encode_vbyte(numbers))
+        self._data = bytes(data)
+        self._length = len(doc_ids)
+        # The skip table is only stored for lists longer than one block.
+        self._skip_doc_ids = array('Q', skip_doc_ids) if skip_doc_ids else None
+        self._skip_offsets = array('Q', skip_offsets) if skip_offsets else None
+
+    @classmethod
+    def from_encoded(cls, data, length, skip_doc_ids=None, skip_offsets=None):
+        '''
+        Wraps already encoded postings, as returned by encoded().
+        data can be any buffer of bytes, such as a slice of a memory map.
+        '''
+        postings = cls.__new__(cls)
+        postings._data = data
+        postings._length = length
+        postings._skip_doc_ids = skip_doc_ids if skip_doc_ids else None
+        postings._skip_offsets = skip_offsets if skip_offsets else None
+        return postings
+
+    def encoded(self):
+        '''
+        Returns the encoded data, the number of postings and the skip table
+        (doc ids and offsets, or None) of the postings list.
+        '''
+        return (self._data, self._length, self._skip_doc_ids, self._skip_offsets)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return (doc_id for (doc_id, _) in self.with_frequencies())
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def with_frequencies(self):
+        '''Iterates over the (doc_id, frequency) pairs.'''
+        doc_id = 0
+        number = 0
+        is_frequency = False
+        for byte in self._data:
+            if byte & 0x80:
+                number = number << 7 | byte & 0x7F
+                if is_frequency:
+                    yield (doc_id, number)
+                else:
+                    doc_id += number
+                is_frequency = not is_frequency
+                number = 0
+            else:
+                number = number << 7 | byte
+
+    def cursor(self):
+        '''Returns a cursor over the postings list.'''
+        return CompressedPostingsCursor(self)
+
+    def memory_size(self):
+        '''Returns the number of bytes used by the compressed data.'''
+        size = len(self._data)
+        if self._skip_doc_ids:
+            size += self._skip_doc_ids.itemsize * len(self._skip_doc_ids) * 2
+        return size
+
+
+class CompressedPostingsCursor(object):
+
+    '''
+    Forward-only cursor over a compressed postings list.
+    Postings are decoded one at a time, and the skip table
+    is used to jump over blocks that are before a target.
+    '''
+
+    def __init__(self, postings):
+        self._data = postings._data
+        self._length = postings._length
+        self._skip_doc_ids = postings._skip_doc_ids
+        self._skip_offsets = postings._skip_offsets
+        self._position = -1
+        self._offset = 0
+        self._doc_id = 0
+        self._frequency = 0
+        self.next()
+
+    def __len__(self):
+        return self._length
+
+    def at_end(self):
+        '''Returns True once every posting has been read.'''
+        return self._position >= self._length
+
+    def doc_id(self):
+        '''Returns the doc id of the current posting.'''
+        return self._doc_id
+
+    def frequency(self):
+        '''Returns the term frequency of the current posting.'''
+        return self._frequency
+
+    def next(self):
+        '''Moves to the next posting.'''
+        self._position += 1
+        if self._position >= self._length:
+            return
+        self._doc_id += self._read_number()
+        self._frequency = self._read_number()
+
+    def next_geq(self, target):
+        '''
+        Moves to the first posting whose doc id is greater than
+        or equal to target, skipping whole blocks when possible.
+        '''
+        if self.at_end() or self._doc_id >= target:
+            return
+        if self._skip_doc_ids:
+            # Last block whose previous doc id is still before target.
+            block = bisect_left(self._skip_doc_ids, target)
+            first_position = block * CompressedPostings.SKIP_INTERVAL
+            if block > 0 and first_position > self._position:
+                self._position = first_position - 1
+                self._offset = self._skip_offsets[block - 1]
+                self._doc_id = self._skip_doc_ids[block - 1]
+                self.next()
+        while not self.at_end() and self._doc_id < target:
+            self.next()
+
+    def _read_number(self):
+        '''Decodes the variable-byte number at the current offset.'''
+        data = self._data
+        number = 0
+        byte = data[self._offset]
+        while not byte & 0x80:
+            number = number << 7 | byte
+            self._offset += 1
+            byte = data[self._offset]
+        self._offset += 1
+        return number << 7 | byte & 0x7F
+
+
+class MergedPostingsCursor(object):
+
+    '''
+    Forward-only cursor over the union of postings lists whose doc ids
+    are disjoint, such as the postings of a term in several segments.
+    The current posting is the one with the lowest doc id among the
+    cursors of the lists.
+    '''
+
+    def __init__(self, cursors):
+        self._cursors = cursors
+        self._current = None
+        self._select()
+
+    def __len__(self):
+        return sum(len(cursor) for cursor in self._cursors)
+
+    def at_end(self):
+        '''Returns True once every posting has been read.'''
+        return self._current is None
+
+    def doc_id(self):
+        '''Returns the doc id of the current posting.'''
+        return self._current.doc_id()
+
+    def frequency(self):
+        '''Returns the term frequency of the current posting.'''
+        return self._current.frequency()
+
+    def next(self):
+        '''Moves to the next posting.'''
+        self._current.next()
+        self._select()
+
+    def next_geq(self, target):
+        '''
+        Moves to the first posting whose doc id is greater than
+        or equal to target.
+        '''
+        for cursor in self._cursors:
+            cursor.next_geq(target)
+        self._select()
+
+    def _select(self):
+        '''Selects the cursor with the lowest doc id.'''
+        self._current = None
+        for cursor in self._cursors:
+            if not cursor.at_end() and (
+                    self._current is None
+                    or cursor.doc_id() < self._current.doc_id()):
+                self._current = cursor
+
+
+class LiveDocumentsCursor(object):
+
+    '''
+    Forward-only cursor that skips the postings of deleted documents
+    in the postings read by another cursor.
+    Its length is the one of the underlying postings.
+    '''
+
+    def __init__(self, cursor, deleted):
+        self._cursor = cursor
+        self._deleted = deleted
+        self._skip_deleted()
+
+    def __len__(self):
+        return len(self._cursor)
+
+    def at_end(self):
+        '''Returns True once every posting has been read.'''
+        return self._cursor.at_end()
+
+    def doc_id(self):
+        '''Returns the doc id of the current posting.'''
+        return self._cursor.doc_id()
+
+    def frequency(self):
+        '''Returns the term frequency of the current posting.'''
+        return self._cursor.frequency()
+
+    def next(self):
+        '''Moves to the next posting of a live document.'''
+        self._cursor.next()
+        self._skip_deleted()
+
+    def next_geq(self, target):
+        '''
+        Moves to the first posting of a live document whose doc id
+        is greater than or equal to target.
+        '''
+        self._cursor.next_geq(target)
+        self._skip_deleted()
+
+    def _skip_deleted(self):
+        cursor = self._cursor
+        while not cursor.at_end() and cursor.doc_id() in self._deleted:
+            cursor.next()
+
+
+def postings_cursor(postings):
+    '''
+    Returns a cursor over sorted doc ids stored either
+    as a list or as CompressedPostings.
+    '''
+    if isinstance(postings, CompressedPostings):
+        return postings.cursor()
+    return PostingsCursor(postings)
+
+
+def intersect(postings_lists):
+    '''
+    Returns the sorted list of doc ids present in every sorted postings list.
+    The shortest list is iterated and the cursors of the other lists
+    skip forward to each of its doc ids, so that the cost is about
+    O(short list * log(long list)).
+    '''
+    if not postings_lists:
+        return []
+    ordered = sorted(postings_lists, key=len)
+    cursors = [postings_cursor(postings) for postings in ordered[1:]]
+    result = []
+    for doc_id in ordered[0]:
+        for cursor in cursors:
+            cursor.next_geq(doc_id)
+            if cursor.at_end():
+                return result
+            if cursor.doc_id() != doc_id:
+                break
+        else:
+            result.append(doc_id)
+    return result
+
+
+def union(postings_lists):
+    '''Returns the sorted list of doc ids present in any sorted postings list.'''
+    result = []
+    for doc_id in heapq.merge(*postings_lists):
+        if not result or result[-1] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+def difference(postings, excluded):
+    '''
+    Returns the sorted list of doc ids of a sorted postings list
+    that are not in the sorted excluded list.
+    '''
+    cursor = postings_cursor(excluded)
+    result = []
+    for doc_id in postings:
+        cursor.next_geq(doc_id)
+        if cursor.at_end() or cursor.doc_id() != doc_id:
+            result.append(doc_id)
+    return result
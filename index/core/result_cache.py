@@ -0,0 +1,106 @@
+'''
+Provides the cache of the results of the queries run on an index.
+'''
+import sys
+from collections import OrderedDict
+from copy import copy
+
+# Default number of bytes taken by the results kept in a cache.
+RESULT_CACHE_SIZE = 16 * 1024 * 1024
+
+
+class ResultCache(object):
+
+    '''
+    Keeps the results of queries, by key, within a bound on their size
+    in bytes. The least recently used results are evicted first.
+    Results are valid for one version of the index: the cache is emptied
+    as soon as it is used with another version.
+    A cache with a size of 0 keeps nothing.
+    '''
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # Results are not saved, a copy of a cache starts empty.
+        state['_entries'] = OrderedDict()
+        state['_size'] = 0
+        state['_version'] = None
+        return state
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cached(self, key, version, compute):
+        '''
+        Returns a copy of the results stored for a key and a version of
+        the index, or computes them with compute() and stores them.
+        '''
+        self._check_version(version)
+        if key in self._entries:
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return copy(self._entries[key][0])
+        self._misses += 1
+        results = compute()
+        self._put(key, results)
+        return results
+
+    def clear(self):
+        '''Drops every result.'''
+        self._entries.clear()
+        self._size = 0
+
+    def statistics(self):
+        '''Returns the counters of the cache and the size of its results.'''
+        lookups = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+            'evictions': self._evictions,
+            'invalidations': self._invalidations,
+            'entries': len(self._entries),
+            'size': self._size,
+            'max_size': self._max_size
+        }
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+                self.clear()
+            self._version = version
+
+    def _put(self, key, results):
+        size = result_size(key, results)
+        if size > self._max_size:
+            return
+        self._entries[key] = (copy(results), size)
+        self._size += size
+        while self._size > self._max_size:
+            (_, (_, evicted_size)) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self._evictions += 1
+
+
+def result_size(key, results):
+    '''
+    Returns an estimate of the bytes taken by a key and its results:
+    a collection of doc ids or of (doc id, score) pairs.
+    '''
+    size = sys.getsizeof(key) + sys.getsizeof(results)
+    for item in results:
+        size += sys.getsizeof(item)
+        if isinstance(item, tuple):
+            size += sum(sys.getsizeof(value) for value in item)
+    return size
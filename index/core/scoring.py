@@ -0,0 +1,266 @@
+'''
+Provides the scoring engine shared by the vectorial models.
+'''
+import heapq
+from itertools import accumulate
+
+
+def _score(result):
+    '''Sort key of a (doc_id, score) result.'''
+    return result[1]
+
+
+def top_k(results, k=None):
+    '''
+    Returns the k (doc_id, score) pairs with the highest scores,
+    sorted by descending score. Returns every result when k is None.
+    Ties keep the order of the input.
+    '''
+    if k is None:
+        return sorted(results, key=_score, reverse=True)
+    return heapq.nlargest(k, results, key=_score)
+
+
+class TermAtATimeScorer(object):
+
+    '''
+    Scores documents one query term at a time.
+    The postings of each term are read once and the contribution of
+    the term is added to a per-document accumulator, so the cost of a
+    query only depends on the length of the postings of its terms.
+    '''
+
+    def __init__(self, index):
+        self._index = index
+        self._accumulators = {}
+
+    def accumulate(self, term, weight_function):
+        '''
+        Walks the postings of a term and adds
+        weight_function(doc_id, frequency) to each document accumulator.
+        '''
+        accumulators = self._accumulators
+        for (doc_id, frequency) in self._index.postings_with_frequencies(term):
+            accumulators[doc_id] = accumulators.get(doc_id, 0.0) \
+                + weight_function(doc_id, frequency)
+
+    def normalize(self, normalization_function):
+        '''
+        Divides every accumulator by normalization_function(doc_id).
+        Documents with a null normalization get a null score.
+        '''
+        accumulators = self._accumulators
+        for doc_id in accumulators:
+            denominator = normalization_function(doc_id)
+            accumulators[doc_id] = accumulators[doc_id] / denominator \
+                if denominator else 0.0
+
+    def top_k(self, k=None):
+        '''
+        Returns the k best (doc_id, score) pairs using a bounded heap.
+        Returns all the scored documents when k is None.
+        '''
+        return top_k(self._accumulators.items(), k)
+
+
+class BatchScorer(object):
+
+    '''
+    Scores several queries one term at a time.
+    The postings of each distinct term of the queries are read once and
+    the contribution of the term is added to the accumulators of every
+    query holding it, so that a batch costs about one pass over the
+    postings of its terms, however many queries share them.
+    Terms are read in sorted order, the order in which a single query
+    accumulates its terms, so that each query gets the same scores.
+    '''
+
+    def __init__(self, index):
+        self._index = index
+        self._queries = []
+        self._terms = dict()
+
+    def add_query(self, weight_functions, normalization_function=None):
+        '''
+        Adds a query, given by the weight_function(doc_id, frequency) of
+        each of its terms and an optional normalization_function(doc_id).
+        '''
+        query_number = len(self._queries)
+        self._queries.append(normalization_function)
+        for (term, weight_function) in weight_functions.items():
+            self._terms.setdefault(term, []).append((query_number, weight_function))
+
+    def top_k(self, k=None):
+        '''
+        Scores the queries and returns the list of the k best
+        (doc_id, score) pairs of each query, in the order of the queries.
+        '''
+        accumulators = [dict() for _ in self._queries]
+        for term in sorted(self._terms):
+            postings = list(self._index.postings_with_frequencies(term))
+            for (query_number, weight_function) in self._terms[term]:
+                query_accumulators = accumulators[query_number]
+                for (doc_id, frequency) in postings:
+                    query_accumulators[doc_id] = query_accumulators.get(doc_id, 0.0) \
+                        + weight_function(doc_id, frequency)
+        results = []
+        for (query_accumulators, normalization_function) in zip(accumulators, self._queries):
+            if normalization_function:
+                for doc_id in query_accumulators:
+                    denominator = normalization_function(doc_id)
+                    query_accumulators[doc_id] = query_accumulators[doc_id] / denominator \
+                        if denominator else 0.0
+            results.append(top_k(query_accumulators.items(), k))
+        return results
+
+
+def score_batch(index, queries, model, k=None):
+    '''
+    Executes query texts with a vectorial query class in a single
+    BatchScorer and returns the results of each query.
+    '''
+    scorer = BatchScorer(index)
+    for query in queries:
+        scorer.add_query(*model(query).weight_functions(index))
+    return scorer.top_k(k)
+
+
+# Index scored by the processes of a batch pool.
+_batch_index = None
+
+
+def init_batch_worker(index):
+    '''Pool initializer keeping the index scored by a batch worker.'''
+    global _batch_index
+    _batch_index = index
+
+
+def score_batch_worker(task):
+    '''Pool worker scoring a (queries, model, k) batch on the worker index.'''
+    (queries, model, k) = task
+    return score_batch(_batch_index, queries, model, k)
+
+
+class _PrunedTerm(object):
+
+    '''Postings cursor of a query term along with its scoring data.'''
+
+    def __init__(self, cursor, upper_bound, weight_function):
+        self.cursor = cursor
+        self.upper_bound = upper_bound
+        self.weight_function = weight_function
+
+
+class MaxScoreScorer(object):
+
+    '''
+    Scores documents one document at a time and keeps the k best.
+    Each term has an upper bound of its contribution to a score.
+    Terms are sorted by increasing upper bound: the lowest ones, whose
+    bounds summed together cannot beat the current k-th score, are
+    non-essential (MaxScore dynamic pruning). Only documents of the
+    essential terms are candidates, the postings of the non-essential
+    terms are skipped to the candidates and only read while the
+    candidate can still enter the top k.
+    '''
+
+    # Margin absorbing rounding errors between bounds and actual scores.
+    _BOUND_MARGIN = 1e-9
+
+    def __init__(self, index):
+        self._index = index
+        self._terms = []
+        self.postings_count = 0
+        self.scored_postings = 0
+
+    def add_term(self, term, upper_bound, weight_function):
+        '''
+        Adds a query term. weight_function(doc_id, frequency) gives its
+        contribution to a document score before normalization and
+        upper_bound is the highest possible normalized contribution.
+        '''
+        cursor = self._index.postings_cursor(term)
+        self.postings_count += len(cursor)
+        if not cursor.at_end():
+            margin = abs(upper_bound) * MaxScoreScorer._BOUND_MARGIN
+            self._terms.append(
+                _PrunedTerm(cursor, upper_bound + margin, weight_function))
+
+    def skipped_postings(self):
+        '''Returns the number of postings that were never scored.'''
+        return self.postings_count - self.scored_postings
+
+    def top_k(self, k, normalization_function=None):
+        '''
+        Returns the k best (doc_id, score) pairs sorted by descending
+        score. Scores are divided by normalization_function(doc_id)
+        when it is given.
+        '''
+        terms = sorted(self._terms, key=lambda term: term.upper_bound)
+        # bounds[i] is the sum of the upper bounds of terms[0:i + 1].
+        bounds = list(accumulate(term.upper_bound for term in terms))
+        # Essential terms ordered by the doc id of their cursor.
+        candidates = [(term.cursor.doc_id(), position)
+                      for (position, term) in enumerate(terms)]
+        heapq.heapify(candidates)
+        heap = []
+        essential = 0
+        while k > 0:
+            while candidates and candidates[0][1] < essential:
+                heapq.heappop(candidates)
+            if not candidates:
+                break
+            candidate = candidates[0][0]
+            denominator = normalization_function(candidate) \
+                if normalization_function else 1.0
+            score = 0.0
+            while candidates and candidates[0][0] == candidate:
+                position = candidates[0][1]
+                if position < essential:
+                    # The term became non-essential, it is read on demand.
+                    heapq.heappop(candidates)
+                    continue
+                cursor = terms[position].cursor
+                score += terms[position].weight_function(
+                    candidate, cursor.frequency())
+                self.scored_postings += 1
+                cursor.next()
+                if cursor.at_end():
+                    heapq.heappop(candidates)
+                else:
+                    heapq.heapreplace(candidates, (cursor.doc_id(), position))
+            score = self._complete_score(
+                candidate, score, denominator, terms, essential, bounds,
+                heap[0][0] if len(heap) >= k else None)
+            if score is None:
+                continue
+            if len(heap) < k:
+                heapq.heappush(heap, (score, candidate))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, candidate))
+            if len(heap) >= k:
+                while essential < len(terms) and bounds[essential] <= heap[0][0]:
+                    essential += 1
+        return [(doc_id, score) for (score, doc_id)
+                in sorted(heap, key=lambda item: item[0], reverse=True)]
+
+    def _complete_score(self, doc_id, score, denominator, terms, essential,
+                        bounds, threshold):
+        '''
+        Adds the contributions of the non-essential terms to the score of
+        a candidate, by decreasing upper bound, as long as the candidate
+        can still beat the threshold.
+        Returns the normalized score, or None when the candidate was
+        discarded.
+        '''
+        for position in range(essential - 1, -1, -1):
+            partial = score / denominator if denominator else 0.0
+            if threshold is not None and partial + bounds[position] <= threshold:
+                return None
+            cursor = terms[position].cursor
+            cursor.next_geq(doc_id)
+            if not cursor.at_end() and cursor.doc_id() == doc_id:
+                score += terms[position].weight_function(doc_id, cursor.frequency())
+                self.scored_postings += 1
+                cursor.next()
+        return score / denominator if denominator else 0.0
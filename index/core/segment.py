@@ -0,0 +1,246 @@
+'''
+Provides the segments that hold the postings of an index,
+and the policy that merges them.
+'''
+import heapq
+from array import array
+from bisect import bisect_left
+from math import log
+from .postings import PostingsCursor, CompressedPostings, LiveDocumentsCursor
+
+
+class Bitmap(object):
+
+    '''Set of non negative integers stored as one bit per integer.'''
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, number):
+        byte = number >> 3
+        return byte < len(self._bits) \
+            and bool(self._bits[byte] & (1 << (number & 7)))
+
+    def __iter__(self):
+        for (byte, bits) in enumerate(self._bits):
+            if bits:
+                for bit in range(0, 8):
+                    if bits & (1 << bit):
+                        yield byte << 3 | bit
+
+    def add(self, number):
+        '''Adds an integer to the set.'''
+        if number in self:
+            return
+        byte = number >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte + 1 - len(self._bits)))
+        self._bits[byte] |= 1 << (number & 7)
+        self._count += 1
+
+    def copy(self):
+        '''Returns a copy of the set.'''
+        bitmap = Bitmap()
+        bitmap._bits = bytearray(self._bits)
+        bitmap._count = self._count
+        return bitmap
+
+
+class Segment(object):
+
+    '''
+    Inverted index of a batch of documents.
+    Its postings are either lists of doc ids along with the lists of
+    their frequencies, or CompressedPostings, and are never modified.
+    Deleted documents are recorded in a bitmap and skipped when the
+    postings are read, until the segment is merged.
+    '''
+
+    def __init__(self, inverted_index, frequencies, doc_ids, compressed=False):
+        self._inverted_index = inverted_index
+        self._frequencies = frequencies
+        self._doc_ids = doc_ids
+        self._compressed = compressed
+        self._deleted = Bitmap()
+        # Document frequencies corrected for the deleted documents.
+        self._live_frequencies = dict()
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def doc_ids(self):
+        '''Returns the sorted doc ids of the segment, deleted ones included.'''
+        return self._doc_ids
+
+    def contains(self, doc_id):
+        '''Returns True if a live document of the segment has this doc id.'''
+        position = bisect_left(self._doc_ids, doc_id)
+        return position < len(self._doc_ids) \
+            and self._doc_ids[position] == doc_id \
+            and doc_id not in self._deleted
+
+    def delete(self, doc_id):
+        '''Marks a document of the segment as deleted.'''
+        self._deleted.add(doc_id)
+        self._live_frequencies = dict()
+
+    def deleted(self):
+        '''Returns the bitmap of the deleted documents.'''
+        return self._deleted
+
+    def snapshot(self):
+        '''
+        Returns a segment sharing the postings of this one, whose deleted
+        documents are the ones deleted so far.
+        '''
+        segment = Segment(self._inverted_index, self._frequencies,
+                          self._doc_ids, self._compressed)
+        segment._deleted = self._deleted.copy()
+        return segment
+
+    def terms(self):
+        '''Returns the terms of the segment.'''
+        return self._inverted_index.keys()
+
+    def terms_of_documents(self, doc_ids):
+        '''
+        Returns the set of the terms of the documents of the segment with
+        these doc ids, deleted ones included, looking them up in the
+        postings of every term of the segment.
+        '''
+        doc_ids = sorted(doc_ids)
+        terms = set()
+        for term in self._inverted_index:
+            postings = self._inverted_index[term]
+            if self._compressed:
+                cursor = postings.cursor()
+                for doc_id in doc_ids:
+                    cursor.next_geq(doc_id)
+                    if cursor.at_end():
+                        break
+                    if cursor.doc_id() == doc_id:
+                        terms.add(term)
+                        break
+            else:
+                for doc_id in doc_ids:
+                    position = bisect_left(postings, doc_id)
+                    if position < len(postings) and postings[position] == doc_id:
+                        terms.add(term)
+                        break
+        return terms
+
+    def postings(self, term):
+        '''Returns the sorted doc ids containing a term in the segment.'''
+        postings = self._inverted_index[term] \
+            if term in self._inverted_index else []
+        deleted = self._deleted
+        if not deleted:
+            return postings
+        return [doc_id for doc_id in postings if doc_id not in deleted]
+
+    def postings_with_frequencies(self, term):
+        '''Iterates over the (doc_id, term frequency) pairs of a term.'''
+        if term not in self._inverted_index:
+            return iter([])
+        if self._compressed:
+            pairs = self._inverted_index[term].with_frequencies()
+        else:
+            pairs = zip(self._inverted_index[term], self._frequencies[term])
+        deleted = self._deleted
+        if not deleted:
+            return pairs
+        return ((doc_id, count) for (doc_id, count) in pairs
+                if doc_id not in deleted)
+
+    def postings_cursor(self, term):
+        '''Returns a cursor over the postings and frequencies of a term.'''
+        if term not in self._inverted_index:
+            return PostingsCursor([], [])
+        if self._compressed:
+            cursor = self._inverted_index[term].cursor()
+        else:
+            cursor = PostingsCursor(self._inverted_index[term],
+                                    self._frequencies[term])
+        if not self._deleted:
+            return cursor
+        return LiveDocumentsCursor(cursor, self._deleted)
+
+    def document_frequency(self, term):
+        '''
+        Returns the number of live documents of the segment containing
+        a term. It is only counted again for the terms that are queried
+        after a deletion.
+        '''
+        if not self._deleted:
+            return len(self._inverted_index[term]) \
+                if term in self._inverted_index else 0
+        live_frequencies = self._live_frequencies
+        if term not in live_frequencies:
+            live_frequencies[term] = len(self.postings(term))
+        return live_frequencies[term]
+
+
+def merge_segments(segments, compressed=False):
+    '''
+    Returns a new segment holding the postings of the live documents
+    of several segments, whose live doc ids must be disjoint.
+    The postings of deleted documents are dropped.
+    '''
+    terms = set()
+    for segment in segments:
+        terms.update(segment.terms())
+    inverted_index = dict()
+    frequencies = dict()
+    for term in terms:
+        postings = list(heapq.merge(*[
+            segment.postings_with_frequencies(term) for segment in segments]))
+        if not postings:
+            continue
+        doc_ids = [doc_id for (doc_id, _) in postings]
+        counts = [count for (_, count) in postings]
+        if compressed:
+            inverted_index[term] = CompressedPostings(doc_ids, counts)
+        else:
+            inverted_index[term] = doc_ids
+            frequencies[term] = counts
+    doc_ids = array('Q', heapq.merge(*[
+        [doc_id for doc_id in segment.doc_ids()
+         if doc_id not in segment.deleted()]
+        for segment in segments]))
+    return Segment(inverted_index, frequencies, doc_ids, compressed)
+
+
+class TieredMergePolicy(object):
+
+    '''
+    Chooses the segments to merge.
+    Segments are grouped in tiers by their number of documents, each
+    tier holding segments merge_factor times bigger than the previous
+    one. When a tier holds merge_factor segments, they are merged into
+    a segment of the next tier, so that an index holds a logarithmic
+    number of segments and each document is merged a logarithmic
+    number of times.
+    '''
+
+    def __init__(self, merge_factor=10):
+        self.merge_factor = merge_factor
+
+    def find_merge(self, segments):
+        '''
+        Returns the segments that should be merged together,
+        or an empty list when no merge is needed.
+        '''
+        tiers = dict()
+        for segment in segments:
+            tiers.setdefault(self._tier(segment), []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return sorted(tiers[tier], key=len)[0:self.merge_factor]
+        return []
+
+    def _tier(self, segment):
+        return int(log(max(len(segment), 1), self.merge_factor))
@@ -0,0 +1,80 @@
+'''
+Provides query-biased snippets: the passage of a document that best
+matches a query, with the words of the query highlighted.
+'''
+
+# Number of words of a snippet.
+SNIPPET_LENGTH = 30
+# Markers written before and after the highlighted words.
+HIGHLIGHT = ("[", "]")
+
+
+def best_window(matches, weights, length):
+    '''
+    Returns the first position of the window of length consecutive words
+    that best matches a query.
+    matches is the sorted list of (position, term) of the query terms in
+    the document and weights maps each term to its weight. A window scores
+    the sum of the weights of the distinct terms it holds, ties are broken
+    by its number of matches. The matches of the best window are centered
+    in it.
+    '''
+    best = (0.0, 0)
+    best_window_start = 0
+    counts = dict()
+    end = 0
+    for (first, (start, _)) in enumerate(matches):
+        while end < len(matches) and matches[end][0] < start + length:
+            term = matches[end][1]
+            counts[term] = counts.get(term, 0) + 1
+            end += 1
+        score = (sum(weights.get(term, 0.0) for term in counts), end - first)
+        if score > best:
+            best = score
+            span = matches[end - 1][0] - start + 1
+            best_window_start = max(0, start - (length - span) // 2)
+        term = matches[first][1]
+        counts[term] -= 1
+        if not counts[term]:
+            del counts[term]
+    return best_window_start
+
+
+def highlight_passage(content, spans, positions, start, length, highlight=HIGHLIGHT):
+    '''
+    Returns the words of a text from position start to start + length,
+    the words at the given positions being surrounded by the highlight
+    markers. spans are the (start, end) offsets of the words in the text.
+    Spaces are collapsed, and an ellipsis marks the text left out.
+    '''
+    start = max(0, min(start, len(spans) - length))
+    end = min(start + length, len(spans))
+    if start >= end:
+        return ""
+    parts = []
+    offset = spans[start][0]
+    for position in range(start, end):
+        if position in positions:
+            (word_start, word_end) = spans[position]
+            parts.append(content[offset:word_start])
+            parts.append(highlight[0] + content[word_start:word_end] + highlight[1])
+            offset = word_end
+    parts.append(content[offset:spans[end - 1][1]])
+    passage = " ".join("".join(parts).split())
+    if start > 0:
+        passage = "... " + passage
+    if end < len(spans):
+        passage = passage + " ..."
+    return passage
+
+
+def make_snippet(content, spans, matches, weights, length=SNIPPET_LENGTH,
+                 highlight=HIGHLIGHT):
+    '''
+    Returns the snippet of a text for a query: the best window of length
+    words with the query terms highlighted, or the first words of the text
+    when it holds none of them.
+    '''
+    start = best_window(matches, weights, length)
+    return highlight_passage(content, spans, set(position for (position, _) in matches),
+                             start, length, highlight)
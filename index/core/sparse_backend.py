@@ -0,0 +1,213 @@
+'''
+Provides an optional scoring backend for the vectorial models, storing
+the collection as a sparse document-term matrix in CSC format.
+It needs numpy and scipy, the rest of the package runs without them.
+'''
+from .constants import TFIDF, NORM_COUNT, BM25
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = None
+    sparse = None
+
+
+def is_available():
+    '''Returns True if numpy and scipy are installed.'''
+    return numpy is not None and sparse is not None
+
+
+class DocumentTermMatrix(object):
+
+    '''
+    Weights of the terms in the documents, as a sparse matrix with a row
+    per document and a column per term. Weights are stored as given:
+    the model weighting and the document norms are applied beforehand,
+    so that the scores of a query are a single product of the matrix
+    with the vector of the query weights.
+    The matrix is compressed by column (CSC) rather than by row: a product
+    then reads only the columns of the query terms, where a CSR product
+    goes through every row of the collection.
+    A document matches a query when it contains one of its terms, even
+    if its score is null, like with the term at a time scorers.
+    '''
+
+    def __init__(self, doc_ids, terms, rows, columns, weights):
+        self._doc_ids = numpy.asarray(doc_ids, dtype=numpy.int64)
+        self._columns = dict((term, column) for (column, term) in enumerate(terms))
+        self._matrix = sparse.csc_matrix(
+            (numpy.asarray(weights, dtype=numpy.float64), (rows, columns)),
+            shape=(len(self._doc_ids), len(self._columns)))
+        self._matrix.sort_indices()
+
+    def shape(self):
+        '''Returns the (number of documents, number of terms) of the matrix.'''
+        return self._matrix.shape
+
+    def top_k(self, query_weights, k=None):
+        '''
+        Returns the k best (doc_id, score) pairs of a query given by
+        the weights of its terms, sorted by descending score then doc id.
+        '''
+        (columns, weights) = self._query_columns(query_weights)
+        matrix = self._matrix[:, columns]
+        scores = matrix.dot(weights)
+        rows = numpy.unique(matrix.indices)
+        return self._top_k(rows, scores[rows], k)
+
+    def top_k_batch(self, queries_weights, k=None):
+        '''
+        Returns the k best (doc_id, score) pairs of each query of a batch,
+        scored together by a product of the matrix with the sparse matrix
+        of the query weights.
+        '''
+        queries_weights = list(queries_weights)
+        if not queries_weights:
+            return []
+        rows = []
+        columns = []
+        weights = []
+        for (query_number, query_weights) in enumerate(queries_weights):
+            for (term, weight) in query_weights.items():
+                if term in self._columns:
+                    rows.append(self._columns[term])
+                    columns.append(query_number)
+                    weights.append(weight)
+        queries = sparse.csc_matrix(
+            (numpy.asarray(weights, dtype=numpy.float64), (rows, columns)),
+            shape=(len(self._columns), len(queries_weights)))
+        scores = sparse.csc_matrix(self._matrix.dot(queries))
+        results = []
+        for (query_number, query_weights) in enumerate(queries_weights):
+            start = scores.indptr[query_number]
+            end = scores.indptr[query_number + 1]
+            positive = scores.data[start:end] > 0
+            if k is not None and numpy.count_nonzero(positive) >= k:
+                # The k best documents all have a positive score, the ones
+                # left out by the product with a null score do not matter.
+                results.append(self._top_k(scores.indices[start:end][positive],
+                                           scores.data[start:end][positive], k))
+            else:
+                results.append(self.top_k(query_weights, k))
+        return results
+
+    def _query_columns(self, query_weights):
+        '''Returns the columns of the terms of a query and their weights.'''
+        columns = []
+        weights = []
+        for (term, weight) in query_weights.items():
+            if term in self._columns:
+                columns.append(self._columns[term])
+                weights.append(weight)
+        return (numpy.asarray(columns, dtype=numpy.int64),
+                numpy.asarray(weights, dtype=numpy.float64))
+
+    def _top_k(self, rows, scores, k):
+        '''
+        Selects the k best of the rows with the given scores, with
+        argpartition, then sorts them by descending score and doc id.
+        '''
+        if k is not None and len(rows) > k:
+            best = numpy.argpartition(-scores, k - 1)[:k]
+            (rows, scores) = (rows[best], scores[best])
+        order = numpy.lexsort((rows, -scores))
+        return [(int(self._doc_ids[row]), float(score))
+                for (row, score) in zip(rows[order], scores[order])]
+
+
+def document_term_matrix(index, model):
+    '''
+    Builds the DocumentTermMatrix of an index for a vectorial query class:
+    tf-idf weights or frequencies divided by the maximal frequency, both
+    divided by the document norm, the saturated frequencies of BM25, or
+    ones for the probabilistic model.
+    '''
+    weighting = model._weighting
+    doc_ids = numpy.asarray(sorted(index.get_all_doc_ids()), dtype=numpy.int64)
+    terms = sorted(index.terms())
+    rows = []
+    columns = []
+    frequencies = []
+    document_frequencies = []
+    for (column, term) in enumerate(terms):
+        postings = list(index.postings_with_frequencies(term))
+        term_doc_ids = numpy.fromiter((doc_id for (doc_id, _) in postings),
+                                      dtype=numpy.int64, count=len(postings))
+        rows.append(numpy.searchsorted(doc_ids, term_doc_ids))
+        columns.append(numpy.full(len(postings), column, dtype=numpy.int64))
+        frequencies.append(numpy.fromiter((frequency for (_, frequency) in postings),
+                                          dtype=numpy.float64, count=len(postings)))
+        document_frequencies.append(numpy.full(
+            len(postings), index.document_frequency(term), dtype=numpy.float64))
+    rows = numpy.concatenate(rows) if rows else numpy.zeros(0, dtype=numpy.int64)
+    columns = numpy.concatenate(columns) if columns else numpy.zeros(0, dtype=numpy.int64)
+    frequencies = numpy.concatenate(frequencies) if frequencies else numpy.zeros(0)
+    if weighting == TFIDF:
+        document_frequencies = numpy.concatenate(document_frequencies) \
+            if document_frequencies else numpy.zeros(0)
+        weights = numpy.log10(frequencies + 1) \
+            * numpy.log10(index.get_number_of_docs() / document_frequencies)
+        norms = _document_values(index.document_norm, TFIDF, doc_ids)
+        weights = _divide(weights, norms[rows])
+    elif weighting == NORM_COUNT:
+        max_frequencies = numpy.fromiter(
+            (index.max_frequency(doc_id) for doc_id in doc_ids),
+            dtype=numpy.float64, count=len(doc_ids))
+        norms = _document_values(index.document_norm, NORM_COUNT, doc_ids)
+        weights = _divide(frequencies / max_frequencies[rows], norms[rows])
+    elif weighting == BM25:
+        (constant, slope) = model._length_normalization(index)
+        lengths = index.document_lengths()
+        lengths = numpy.fromiter((lengths[int(doc_id)] for doc_id in doc_ids),
+                                 dtype=numpy.float64, count=len(doc_ids))
+        weights = frequencies / (frequencies + constant + slope * lengths[rows])
+    else:
+        weights = numpy.ones(len(rows))
+    return DocumentTermMatrix(doc_ids, terms, rows, columns, weights)
+
+
+def _document_values(function, weighting, doc_ids):
+    return numpy.fromiter((function(weighting, int(doc_id)) for doc_id in doc_ids),
+                          dtype=numpy.float64, count=len(doc_ids))
+
+
+def _divide(values, denominators):
+    '''Divides the values, giving 0 where the denominator is null.'''
+    result = numpy.zeros(len(values))
+    numpy.divide(values, denominators, out=result, where=denominators != 0)
+    return result
+
+
+class SparseBackend(object):
+
+    '''
+    Runs the queries of a vectorial query class, such as
+    VectorialQueryTfIdf, on the DocumentTermMatrix of an index.
+    The matrix is built again when the index changes.
+    '''
+
+    def __init__(self, index, model):
+        if not is_available():
+            raise ImportError("The sparse backend needs numpy and scipy.")
+        self._index = index
+        self._model = model
+        self._version = None
+        self._matrix = None
+
+    def matrix(self):
+        '''Returns the matrix of the current version of the index.'''
+        if self._version != self._index.version():
+            self._matrix = document_term_matrix(self._index, self._model)
+            self._version = self._index.version()
+        return self._matrix
+
+    def execute(self, query, k=None):
+        '''Returns the k best (doc_id, score) pairs of a query text.'''
+        matrix = self.matrix()
+        return matrix.top_k(self._model(query).query_weights(self._index), k)
+
+    def execute_batch(self, queries, k=None):
+        '''Returns the k best (doc_id, score) pairs of each query text.'''
+        matrix = self.matrix()
+        return matrix.top_k_batch(
+            [self._model(query).query_weights(self._index) for query in queries], k)
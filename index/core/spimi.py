@@ -0,0 +1,292 @@
+'''
+Provides an index builder whose memory does not grow with the size
+of the collection (Single-Pass In-Memory Indexing).
+'''
+import heapq
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from multiprocessing import Pool
+from bisect import bisect_left
+from itertools import groupby
+from math import log, sqrt
+from .analyzer import Analyzer
+from .compression import encode_vbyte, decode_vbyte
+from .configuration import Configuration
+from .constants import TFIDF
+from .disk_index import DiskIndexWriter, load_disk_index, update_max_weights
+from .document_index import DocumentIndex
+from .parallel_indexing import split_files
+from .postings import CompressedPostings
+from .utility import tf_idf, norm_count_statistics
+
+# Term size, number of postings and size of the encoded postings
+# of a term in a run.
+RUN_ENTRY = struct.Struct('<III')
+
+# Estimated memory used by a new term of a block, and by a posting.
+_TERM_OVERHEAD = 200
+_POSTING_SIZE = 12
+_DOCUMENT_OVERHEAD = 200
+
+
+class SpimiIndexBuilder(object):
+
+    '''
+    Builds an index in the memory-mapped disk format without holding
+    the collection in memory.
+    Documents are inverted in blocks. When the estimated size of a block
+    reaches memory_budget bytes, its postings are sorted by term and
+    spilled to a run file, and its documents to another run sorted by
+    doc id. The runs are then merged with a k-way merge, term by term
+    and document by document, into the final index.
+    With several processes, the files are cut at document boundaries
+    into byte ranges of similar size, and each process inverts its ranges
+    into runs of its own, within an equal share of the budget.
+    Besides the budget, the builder keeps the sorted doc ids, the
+    squared tf-idf norms, the lengths and the three sums the tf-idf norm
+    is updated from of the documents, 48 bytes per document.
+    Only the stop words are saved with the index: an index built with
+    a custom analyzer is opened with the default one.
+    '''
+
+    def __init__(self, stop_words=None, memory_budget=64 * 1024 * 1024,
+                 positional=False, temporary_directory=None, analyzer=None,
+                 processes=1):
+        self._stop_words = stop_words if stop_words else []
+        self._analyzer = analyzer if analyzer else Analyzer(self._stop_words)
+        self._memory_budget = memory_budget
+        self._positional = positional
+        self._temporary_directory = temporary_directory
+        self._processes = processes
+        self.runs = 0
+        self.bytes_spilled = 0
+        self.parse_time = 0.0
+        self.merge_time = 0.0
+
+    def build(self, data_files, path):
+        '''
+        Indexes a file or a list of files into the path directory
+        and returns the index opened from it.
+        '''
+        if isinstance(data_files, str):
+            data_files = [data_files]
+        run_directory = tempfile.mkdtemp(dir=self._temporary_directory)
+        try:
+            start_time = time.time()
+            runs = self._invert_blocks(data_files, run_directory)
+            self.parse_time = time.time() - start_time
+            start_time = time.time()
+            self._merge_runs(runs, path)
+            self.merge_time = time.time() - start_time
+        finally:
+            shutil.rmtree(run_directory)
+        return load_disk_index(path)
+
+    def report(self):
+        '''Returns a summary of the last build.'''
+        return "{0} runs, {1} bytes spilled, parsing took {2} seconds, " \
+            "merging took {3} seconds".format(
+                self.runs, self.bytes_spilled, self.parse_time, self.merge_time)
+
+    def _invert_blocks(self, data_files, run_directory):
+        '''
+        Inverts the documents block by block and returns the
+        (postings run, documents run) file paths.
+        '''
+        ranges = split_files(data_files, Configuration.DocumentParser,
+                             self._processes)
+        # Every process gets about the same number of bytes to invert.
+        tasks = [(ranges[number::self._processes], Configuration.DocumentParser,
+                  self._analyzer, self._positional,
+                  self._memory_budget // self._processes,
+                  os.path.join(run_directory, str(number)))
+                 for number in range(0, min(self._processes, len(ranges)))]
+        if len(tasks) <= 1:
+            outputs = [invert_blocks(task) for task in tasks]
+        else:
+            with Pool(len(tasks)) as pool:
+                outputs = pool.map(invert_blocks, tasks)
+        runs = [run for (process_runs, _) in outputs for run in process_runs]
+        self.runs += len(runs)
+        self.bytes_spilled += sum(size for (_, size) in outputs)
+        return runs
+
+    def _merge_runs(self, runs, path):
+        '''Merges the runs into a disk index in the path directory.'''
+        doc_ids = array('Q')
+        for document in heapq.merge(*[_read_documents(documents_path)
+                                      for (_, documents_path) in runs]):
+            if doc_ids and document[0] == doc_ids[-1]:
+                raise ValueError("doc {0} is indexed twice".format(document[0]))
+            doc_ids.append(document[0])
+        number_of_docs = len(doc_ids)
+        squared_norms = array('d', bytes(8 * number_of_docs))
+        lengths = array('Q', bytes(8 * number_of_docs))
+        sums = [array('d', bytes(8 * number_of_docs)) for _ in range(3)]
+        writer = DiskIndexWriter(path)
+        postings_runs = [_read_postings(postings_path) for (postings_path, _) in runs]
+        for (term, entries) in groupby(heapq.merge(*postings_runs),
+                                       key=lambda entry: entry[0]):
+            merged = array('Q')
+            counts = array('I')
+            for (doc_id, count) in heapq.merge(*[
+                    _decode_postings(data) for (_, data) in entries]):
+                merged.append(doc_id)
+                counts.append(count)
+            document_frequency = len(merged)
+            log_frequency = log(document_frequency)
+            for (doc_id, count) in zip(merged, counts):
+                position = bisect_left(doc_ids, doc_id)
+                squared_norms[position] += tf_idf(
+                    count, document_frequency, number_of_docs) ** 2
+                lengths[position] += count
+                weight = log(count + 1) ** 2
+                sums[0][position] += weight
+                sums[1][position] += weight * log_frequency
+                sums[2][position] += weight * log_frequency ** 2
+            writer.add_term(term, CompressedPostings(merged, counts))
+        for document in heapq.merge(*[_read_documents(documents_path)
+                                      for (_, documents_path) in runs]):
+            (doc_id, file_path, start_pos, end_pos, location, max_frequency,
+             norm_count_norm, positions) = document
+            position = bisect_left(doc_ids, doc_id)
+            writer.add_document(
+                doc_id, file_path, start_pos, end_pos, max_frequency,
+                sqrt(squared_norms[position]), norm_count_norm, positions,
+                location, lengths[position],
+                tuple(column[position] for column in sums))
+        writer.close(number_of_docs, self._stop_words, self._positional)
+        update_max_weights(path, self._max_weights(path))
+
+    def _max_weights(self, path):
+        '''
+        Computes the maximal tf-idf weights of the terms of a built index,
+        in the order of its vocabulary.
+        '''
+        index = load_disk_index(path)
+        number_of_docs = index.get_number_of_docs()
+        weights = array('d')
+        for term in index.terms():
+            document_frequency = index.document_frequency(term)
+            max_weight = 0.0
+            for (doc_id, count) in index.postings_with_frequencies(term):
+                doc_norm = index.document_norm(TFIDF, doc_id)
+                if doc_norm:
+                    max_weight = max(max_weight, tf_idf(
+                        count, document_frequency, number_of_docs) / doc_norm)
+            weights.append(max_weight)
+        return weights
+
+
+def invert_blocks(task):
+    '''
+    Pool worker inverting the documents of a list of (file path,
+    byte range) block by block.
+    Spills the blocks to runs prefixed by run_prefix and returns the
+    (postings run, documents run) file paths with the size of the runs.
+    '''
+    (ranges, parser_class, analyzer, positional, memory_budget, run_prefix) = task
+    runs = []
+    block = _Block()
+    for (file_path, byte_range) in ranges:
+        parser = parser_class(file_path)
+        for (start_pos, end_pos, document) in parser.get_documents(*(byte_range or ())):
+            doc_index = DocumentIndex(document.get_content(), positional=positional,
+                                      analyzer=analyzer)
+            block.add(document.get_doc_id(), file_path, start_pos, end_pos,
+                      document.get_location(), doc_index.get_word_count(),
+                      doc_index.get_positions() if positional else None)
+            if block.size >= memory_budget:
+                runs.append(_spill(block, "{0}.{1}".format(run_prefix, len(runs))))
+                block = _Block()
+    if block.documents or not runs:
+        runs.append(_spill(block, "{0}.{1}".format(run_prefix, len(runs))))
+    return (runs, sum(os.path.getsize(path) for run in runs for path in run))
+
+
+def _spill(block, run_prefix):
+    '''Writes the postings and the documents of a block to run files.'''
+    postings_path = run_prefix + ".postings"
+    documents_path = run_prefix + ".documents"
+    with open(postings_path, 'wb') as file_ptr:
+        for term in sorted(block.postings):
+            (doc_ids, counts) = block.postings[term]
+            encoded_term = term.encode('utf8')
+            numbers = []
+            previous = 0
+            for (doc_id, count) in sorted(zip(doc_ids, counts)):
+                numbers.append(doc_id - previous)
+                numbers.append(count)
+                previous = doc_id
+            data = encode_vbyte(numbers)
+            file_ptr.write(RUN_ENTRY.pack(len(encoded_term), len(doc_ids), len(data)))
+            file_ptr.write(encoded_term)
+            file_ptr.write(data)
+    with open(documents_path, 'wb') as file_ptr:
+        for document in sorted(block.documents):
+            pickle.dump(document, file_ptr, protocol=4)
+    return (postings_path, documents_path)
+
+
+class _Block(object):
+
+    '''Postings and documents inverted in memory before they are spilled.'''
+
+    def __init__(self):
+        self.postings = dict()
+        self.documents = []
+        self.size = 0
+
+    def add(self, doc_id, file_path, start_pos, end_pos, location, words,
+            positions):
+        '''Adds the word counts and the location of a document.'''
+        (max_frequency, norm_count_norm) = norm_count_statistics(
+            [words[word] for word in words])
+        self.documents.append((doc_id, file_path, start_pos, end_pos, location,
+                               max_frequency, norm_count_norm, positions))
+        self.size += _DOCUMENT_OVERHEAD + len(file_path)
+        if positions:
+            self.size += sum(len(data) for data in positions.values())
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = (array('Q'), array('I'))
+                self.size += _TERM_OVERHEAD + len(word)
+            (doc_ids, term_counts) = self.postings[word]
+            doc_ids.append(doc_id)
+            term_counts.append(words[word])
+            self.size += _POSTING_SIZE
+
+
+def _read_postings(run_path):
+    '''Iterates over the (term, encoded postings) entries of a run.'''
+    with open(run_path, 'rb') as file_ptr:
+        header = file_ptr.read(RUN_ENTRY.size)
+        while header:
+            (term_size, _, data_size) = RUN_ENTRY.unpack(header)
+            term = file_ptr.read(term_size).decode('utf8')
+            yield (term, file_ptr.read(data_size))
+            header = file_ptr.read(RUN_ENTRY.size)
+
+
+def _decode_postings(data):
+    '''Iterates over the (doc_id, frequency) pairs of encoded postings.'''
+    numbers = decode_vbyte(data)
+    doc_id = 0
+    for position in range(0, len(numbers), 2):
+        doc_id += numbers[position]
+        yield (doc_id, numbers[position + 1])
+
+
+def _read_documents(run_path):
+    '''Iterates over the documents of a run, sorted by doc id.'''
+    with open(run_path, 'rb') as file_ptr:
+        while True:
+            try:
+                yield pickle.load(file_ptr)
+            except EOFError:
+                return
@@ -0,0 +1,54 @@
+import pickle
+import unittest
+from ..analyzer import Analyzer, RegexTokenizer, LowercaseFilter, StopFilter, StemFilter
+from ..configuration import FakeStemmer
+from ..utility import get_word_list
+
+
+class AnalyzerTests(unittest.TestCase):
+
+    def test_analyze(self):
+        analyzer = Analyzer(["the", "of"])
+        self.assertEqual(["preliminari", "report", "algebra", "languag"],
+                         analyzer.analyze("The Preliminary report-of Algebraic (languages)"))
+        self.assertEqual(get_word_list("The report of the languages", ["the", "of"]),
+                         analyzer.analyze("The report of the languages"))
+
+    def test_analyze_positions(self):
+        analyzer = Analyzer(["the", "of"])
+        self.assertEqual([(1, "report"), (4, "languag")],
+                         analyzer.analyze_positions("The report of the languages"))
+
+    def test_spans(self):
+        analyzer = Analyzer(["the"])
+        content = "The (report), languages"
+        self.assertEqual(["The", "report", "languages"],
+                         [content[start:end] for (start, end) in analyzer.spans(content)])
+        self.assertEqual([(1, "report"), (2, "languag")], analyzer.analyze_positions(content))
+
+    def test_term(self):
+        analyzer = Analyzer(["the"])
+        self.assertEqual("languag", analyzer.term("Languages"))
+        self.assertIsNone(analyzer.term("The"))
+
+    def test_custom_stages(self):
+        analyzer = Analyzer(stemmer=FakeStemmer())
+        self.assertEqual(["languages", "reports"], analyzer.analyze("Languages, reports"))
+        analyzer = Analyzer(tokenizer=RegexTokenizer(r"[^ ]+"),
+                            stages=[StopFilter(["a"]), LowercaseFilter()])
+        self.assertEqual([(1, "b-c"), (2, "d")], analyzer.analyze_positions("a B-c d"))
+
+    def test_stem_cache(self):
+        stem_filter = StemFilter(cache_size=2)
+        analyzer = Analyzer(stages=[stem_filter])
+        analyzer.analyze("running running jumps running")
+        self.assertEqual({'hits': 2, 'misses': 2, 'hit_rate': 0.5},
+                         analyzer.statistics()['StemFilter'])
+        self.assertEqual({}, Analyzer(stages=[LowercaseFilter()]).statistics())
+
+    def test_pickle(self):
+        analyzer = Analyzer(["the"])
+        analyzer.analyze("running running")
+        copy = pickle.loads(pickle.dumps(analyzer))
+        self.assertEqual(["run"], copy.analyze("the running"))
+        self.assertEqual(1, copy.statistics()['StemFilter']['misses'])
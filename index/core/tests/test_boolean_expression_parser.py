@@ -71,3 +71,20 @@ class BooleanExpressionParserTests(unittest.TestCase):
         '''Testing query parsing should fail with an unbalanced expression.'''
         expression = "(algebraic * language + expression"
         self.assertRaises(ValueError, BooleanQuery, expression)
+
+    def test_BooleanExpressionParser_format_phrase_and_near(self):
+        '''Testing expression formatter with phrases and near operators'''
+        expression = '"algebraic  language!" * report ~ 5 algebraic'
+        formatted_expr = '("algebraic.language" * report ~5~ algebraic)'
+        parser = BooleanExpressionParser()
+        self.assertEqual(formatted_expr, parser.format_expression(expression))
+
+    def test_BooleanExpressionParser_phrase_and_near(self):
+        '''Testing query parsing for phrases and near operators.'''
+        expression = '"algebraic language" + (report ~5 algebraic)'
+        near = OperatorNode(OperatorNear(5),
+                            [WordLeaf('report'), WordLeaf('algebraic')])
+        expected_root = OperatorNode(
+            OperatorOr, [PhraseLeaf('algebraic language'), near])
+        actual_root = BooleanQuery(expression)._root
+        self.assertEqual(str(expected_root), str(actual_root))
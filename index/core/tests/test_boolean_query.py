@@ -1,6 +1,6 @@
 import unittest
 import os
-from ..boolean_query import OperatorNot, OperatorAnd, OperatorOr, OperatorNode, WordLeaf
+from ..boolean_query import BooleanQuery, OperatorNot, OperatorAnd, OperatorOr, OperatorNode, WordLeaf
 from ..index import Index
 
 
@@ -75,3 +75,93 @@ class BooleanQueryTests(unittest.TestCase):
         actual = root.get_postings()
         expected = {2}
         self.assertEqual(expected, actual)
+
+    def test_BooleanQuery_compressed_index(self):
+        '''Testing query results on a compressed index'''
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data",
+                      compressed=True)
+        query = BooleanQuery("(algebraic + extraction) * !algebraic + language * report")
+        self.assertEqual({1}, query.execute(index))
+        self.assertEqual({2}, BooleanQuery("language * !report").execute(index))
+
+
+class PositionalBooleanQueryTests(unittest.TestCase):
+
+    def setUp(self):
+        self._index = Index(
+            os.path.dirname(os.path.realpath(__file__)) + "/test_data",
+            stop_words=['of', 'by'], positional=True)
+
+    def test_positions(self):
+        self.assertEqual([0, 5], self._index.positions('preliminari', 1))
+        self.assertEqual([], self._index.positions('preliminari', 2))
+        # 'of' and 'by' are stop words but still count in positions.
+        self.assertEqual([2], self._index.positions('root', 2))
+
+    def test_phrase(self):
+        self.assertEqual({1}, BooleanQuery('"algebraic languages"').execute(self._index))
+        self.assertEqual(set(), BooleanQuery('"language algebraic"').execute(self._index))
+        self.assertEqual({2}, BooleanQuery('"extraction of roots"').execute(self._index))
+        self.assertEqual(set(), BooleanQuery('"extraction roots"').execute(self._index))
+
+    def test_near(self):
+        self.assertEqual({1}, BooleanQuery('report ~2 algebraic').execute(self._index))
+        self.assertEqual(set(), BooleanQuery('report ~1 algebraic').execute(self._index))
+        self.assertEqual({2}, BooleanQuery('language ~10 extraction').execute(self._index))
+
+    def test_phrase_combined(self):
+        query = BooleanQuery('("algebraic language" + roots) * !preliminary')
+        self.assertEqual({2}, query.execute(self._index))
+
+    def test_phrase_needs_positions(self):
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+        self.assertRaises(ValueError, BooleanQuery('"algebraic language"').execute, index)
+
+
+class BooleanQueryPlannerTests(unittest.TestCase):
+
+    def setUp(self):
+        self._index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+
+    def test_plan_and_not(self):
+        '''a * !b is planned as a difference.'''
+        expected = ("AND NOT (~2 docs)\n"
+                    "  language (~2 docs)\n"
+                    "  algebraic (~1 docs)")
+        self.assertEqual(expected, BooleanQuery("language*!algebraic").explain(self._index))
+
+    def test_plan_flatten_and_order(self):
+        '''Nested AND nodes are flattened and sorted by postings length.'''
+        expected = ("AND (~1 docs)\n"
+                    "  extraction (~1 docs)\n"
+                    "  digital (~1 docs)\n"
+                    "  language (~2 docs)")
+        query = BooleanQuery("language * (extraction * digital)")
+        self.assertEqual(expected, query.explain(self._index))
+
+    def test_plan_de_morgan(self):
+        '''An AND of NOT operands is the NOT of an OR, double NOT disappear.'''
+        expected = ("NOT (~0 docs)\n"
+                    "  OR (~2 docs)\n"
+                    "    algebraic (~1 docs)\n"
+                    "    extraction (~1 docs)")
+        query = BooleanQuery("!algebraic * !extraction")
+        self.assertEqual(expected, query.explain(self._index))
+        self.assertEqual("language (~2 docs)",
+                         BooleanQuery("!!language").explain(self._index))
+
+    def test_plan_estimates_live_documents(self):
+        '''Estimates are the document frequencies of the live documents.'''
+        self._index.delete_document(1)
+        self.assertEqual("language (~1 docs)",
+                         BooleanQuery("language").explain(self._index))
+
+    def test_plan_same_results(self):
+        '''Planned queries return the same documents as the parsed tree.'''
+        expressions = ["language*!algebraic", "!algebraic*!extraction",
+                       "(language*report)*!(digital+algebraic)", "!!report",
+                       "unknown*language*!report", "!(report*!language)"]
+        for expression in expressions:
+            query = BooleanQuery(expression)
+            query.set_index(self._index)
+            self.assertEqual(query._root.get_postings(), query.execute())
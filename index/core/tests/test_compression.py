@@ -0,0 +1,20 @@
+import unittest
+from ..compression import encode_vbyte, decode_vbyte, encode_deltas, decode_deltas
+
+
+class CompressionTests(unittest.TestCase):
+
+    def test_vbyte(self):
+        numbers = [0, 1, 127, 128, 300, 16383, 16384, 2**32 + 5]
+        self.assertEqual(numbers, decode_vbyte(encode_vbyte(numbers)))
+
+    def test_vbyte_size(self):
+        self.assertEqual(1, len(encode_vbyte([127])))
+        self.assertEqual(2, len(encode_vbyte([128])))
+        self.assertEqual(b'', encode_vbyte([]))
+
+    def test_deltas(self):
+        numbers = [3, 4, 10, 500, 501, 100000]
+        encoded = encode_deltas(numbers)
+        self.assertEqual(numbers, decode_deltas(encoded))
+        self.assertEqual(len(encode_vbyte([3, 1, 6, 490, 1, 99499])), len(encoded))
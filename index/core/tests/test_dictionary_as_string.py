@@ -41,3 +41,9 @@ class DictionaryAsStringTests(unittest.TestCase):
         dic["word"] = 1
 
         self.assertEqual(False, "wordagain" in dic)
+
+    def test_create_from_items(self):
+        dic = DictionaryAsString({"word": 2, "other": 13})
+        self.assertEqual(2, len(dic))
+        self.assertEqual(13, dic["other"])
+        self.assertEqual({"word", "other"}, set(dic))
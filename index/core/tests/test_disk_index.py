@@ -0,0 +1,189 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from collections import ChainMap
+from ..boolean_query import BooleanQuery
+from ..constants import TFIDF, NORM_COUNT, BM25
+from ..disk_index import save_disk_index, load_disk_index, is_disk_index
+from ..index import Index
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25
+
+
+class DiskIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        randomizer = random.Random(7)
+        words = ["word{0}".format(i) for i in range(0, 40)]
+        cls._directory = tempfile.mkdtemp()
+        data_path = os.path.join(cls._directory, "corpus")
+        with open(data_path, "w") as file_ptr:
+            for doc_id in range(1, 201):
+                length = randomizer.randint(3, 30)
+                content = " ".join(
+                    words[int(randomizer.paretovariate(1)) % len(words)]
+                    for _ in range(0, length))
+                file_ptr.write(".I {0}\n.T\n{1}\n".format(doc_id, content))
+        cls._index = Index(data_path, positional=True)
+        cls._path = os.path.join(cls._directory, "saved")
+        save_disk_index(cls._index, cls._path)
+        cls._loaded = load_disk_index(cls._path)
+
+    @classmethod
+    def tearDownClass(cls):
+        # The memory maps must be released before the files are removed.
+        cls._loaded = None
+        shutil.rmtree(cls._directory)
+
+    def test_is_disk_index(self):
+        self.assertTrue(is_disk_index(self._path))
+        self.assertFalse(is_disk_index(self._directory))
+
+    def test_save_keeps_index(self):
+        self.assertTrue(self._index.postings("word1"))
+        self.assertEqual(len(self._index._inverted_index),
+                         len(self._loaded._inverted_index))
+
+    def test_postings(self):
+        for term in self._index._inverted_index:
+            self.assertEqual(list(self._index.postings_with_frequencies(term)),
+                             list(self._loaded.postings_with_frequencies(term)))
+            self.assertEqual(self._index.document_frequency(term),
+                             self._loaded.document_frequency(term))
+        self.assertEqual([], self._loaded.postings("missing"))
+
+    def test_cursor_skips(self):
+        # The most frequent term is long enough to have a skip table.
+        term = max(self._index._inverted_index,
+                   key=self._index.document_frequency)
+        self.assertGreater(self._index.document_frequency(term), 64)
+        doc_ids = list(self._index.postings(term))
+        cursor = self._loaded.postings_cursor(term)
+        cursor.next_geq(doc_ids[100])
+        self.assertEqual(doc_ids[100], cursor.doc_id())
+
+    def test_statistics(self):
+        self.assertEqual(self._index.get_number_of_docs(),
+                         self._loaded.get_number_of_docs())
+        self.assertEqual(sorted(self._index.get_all_doc_ids()),
+                         self._loaded.get_all_doc_ids())
+        for doc_id in self._index.get_all_doc_ids():
+            self.assertEqual(self._index.max_frequency(doc_id),
+                             self._loaded.max_frequency(doc_id))
+            for weighting in [TFIDF, NORM_COUNT]:
+                self.assertEqual(self._index.document_norm(weighting, doc_id),
+                                 self._loaded.document_norm(weighting, doc_id))
+            self.assertEqual(self._index.document_length(doc_id),
+                             self._loaded.document_length(doc_id))
+        self.assertAlmostEqual(self._index.average_document_length(),
+                               self._loaded.average_document_length())
+        for term in self._index._inverted_index:
+            self.assertEqual(self._index.max_document_weight(TFIDF, term),
+                             self._loaded.max_document_weight(TFIDF, term))
+            self.assertEqual(self._index.idf(BM25, term), self._loaded.idf(BM25, term))
+
+    def test_documents(self):
+        self.assertEqual(self._index.document_by_id(5).get_title(),
+                         self._loaded.document_by_id(5).get_title())
+        self.assertEqual(self._index.document_store().location(5),
+                         self._loaded.document_store().location(5))
+        self.assertEqual(dict(), self._loaded.index_by_doc_id(1000))
+        term = self._loaded.get_positioned_terms("word3")[0][1]
+        for doc_id in self._index.postings(term):
+            self.assertEqual(self._index.positions(term, doc_id),
+                             self._loaded.positions(term, doc_id))
+
+    def test_vectorial_queries(self):
+        for query_class in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                            VectorialQueryProbabilistic, VectorialQueryBM25]:
+            query = query_class("word1 word4 word12 word30")
+            self.assertEqual(query.execute(self._index, 10),
+                             query.execute(self._loaded, 10))
+        query = VectorialQueryTfIdf("word1 word4 word12 word30")
+        self.assertEqual(query.execute(self._index, 10),
+                         query.execute_pruned(self._loaded, 10))
+
+    def test_boolean_queries(self):
+        for text in ['word1 * word2', 'word3 + !word0', '"word1 word2"',
+                     'word2 ~3 word5']:
+            self.assertEqual(BooleanQuery(text).execute(self._index),
+                             BooleanQuery(text).execute(self._loaded))
+
+    def test_save_loaded_index(self):
+        path = os.path.join(self._directory, "saved_again")
+        save_disk_index(self._loaded, path)
+        reloaded = load_disk_index(path)
+        for term in self._index._inverted_index:
+            self.assertEqual(list(self._index.postings_with_frequencies(term)),
+                             list(reloaded.postings_with_frequencies(term)))
+        self.assertEqual(self._index.positions('word1', 1),
+                         reloaded.positions('word1', 1))
+
+    def test_unsupported_version(self):
+        path = os.path.join(self._directory, "old")
+        save_disk_index(Index(
+            os.path.dirname(os.path.realpath(__file__)) + "/test_data"), path)
+        with open(os.path.join(path, "metadata.json"), "w") as file_ptr:
+            file_ptr.write('{"version": 0}')
+        self.assertRaises(ValueError, load_disk_index, path)
+
+    def test_add_file(self):
+        path = os.path.join(self._directory, "saved_for_add")
+        save_disk_index(self._index, path)
+        loaded = load_disk_index(path)
+        extra_path = os.path.join(self._directory, "extra")
+        with open(extra_path, "w") as file_ptr:
+            file_ptr.write(".I 500\n.T\nword1 word2 word2 new\n")
+        loaded.add_file(extra_path)
+        expected = Index([os.path.join(self._directory, "corpus"), extra_path])
+        self.assertEqual(201, loaded.get_number_of_docs())
+        self.assertEqual([500], list(loaded.postings("new")))
+        self.assertEqual(expected.document_frequency("word2"),
+                         loaded.document_frequency("word2"))
+        self.assertAlmostEqual(expected.document_norm(TFIDF, 1),
+                               loaded.document_norm(TFIDF, 1))
+        self.assertAlmostEqual(expected.document_norm(TFIDF, 500),
+                               loaded.document_norm(TFIDF, 500))
+        query = VectorialQueryProbabilistic("word2 new")
+        self.assertEqual(query.execute(expected, 5), query.execute(loaded, 5))
+
+    def test_add_file_updates_statistics_incrementally(self):
+        path = os.path.join(self._directory, "saved_for_refresh")
+        save_disk_index(self._index, path)
+        loaded = load_disk_index(path)
+        extra_path = os.path.join(self._directory, "extra_refresh")
+        with open(extra_path, "w") as file_ptr:
+            file_ptr.write(".I 600\n.T\nword1 word3 word3 fresh\n")
+        loaded.add_file(extra_path)
+        expected = Index([os.path.join(self._directory, "corpus"), extra_path])
+        for doc_id in expected.get_all_doc_ids():
+            self.assertAlmostEqual(expected.document_norm(TFIDF, doc_id),
+                                   loaded.document_norm(TFIDF, doc_id))
+        for term in expected.terms():
+            self.assertAlmostEqual(expected.max_document_weight(TFIDF, term),
+                                   loaded.max_document_weight(TFIDF, term))
+        # The saved sums were updated, not computed again from every posting.
+        self.assertIsInstance(loaded._tfidf_sums, ChainMap)
+        self.assertEqual({600} | set(expected.postings("word1"))
+                         | set(expected.postings("word3")),
+                         set(loaded._tfidf_sums.maps[0]))
+
+    def test_delete_document(self):
+        path = os.path.join(self._directory, "saved_for_delete")
+        save_disk_index(self._index, path)
+        loaded = load_disk_index(path)
+        loaded.delete_document(1)
+        self.assertEqual(199, loaded.get_number_of_docs())
+        self.assertNotIn(1, loaded.postings("word1"))
+        # The mapped postings are only dropped when the index is saved.
+        loaded.purge()
+        compacted_path = os.path.join(self._directory, "compacted")
+        save_disk_index(loaded, compacted_path)
+        compacted = load_disk_index(compacted_path)
+        self.assertEqual(199, compacted.get_number_of_docs())
+        self.assertNotIn(1, compacted.get_all_doc_ids())
+        self.assertEqual(list(loaded.postings("word1")),
+                         list(compacted.postings("word1")))
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..document_parser import CACMDocumentParser, INEXDocumentParser
+
+
+class DocumentParserTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "cacm")
+        with open(self._path, "w", encoding="utf8") as file_ptr:
+            for doc_id in range(1, 31):
+                file_ptr.write(".I {0}\n.T\ntitle {0} café\n.W\n".format(doc_id))
+                file_ptr.write("words\n" * (doc_id % 4))
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _documents(self, parser, *byte_range):
+        return [(start_pos, end_pos, document.get_doc_id(), document.get_title())
+                for (start_pos, end_pos, document)
+                in parser.get_documents(*byte_range)]
+
+    def test_get_documents(self):
+        documents = self._documents(CACMDocumentParser(self._path))
+        self.assertEqual(30, len(documents))
+        self.assertEqual((0, 4, 1, "title 1 café"), documents[0])
+        with open(self._path, encoding="utf8") as file_ptr:
+            number_of_lines = len(file_ptr.readlines())
+        # The last document ends with the last line of the file.
+        self.assertEqual(number_of_lines - 1, documents[-1][1])
+
+    def test_locations(self):
+        with open(self._path, "rb") as file_ptr:
+            data = file_ptr.read()
+        documents = [document for (_, _, document)
+                     in CACMDocumentParser(self._path).get_documents()]
+        self.assertEqual((0, len(".I 1\n.T\ntitle 1 café\n.W\nwords\n".encode("utf8"))),
+                         documents[0].get_location())
+        for document in documents:
+            (offset, length) = document.get_location()
+            self.assertEqual(data[offset:offset + length].decode("utf8"),
+                             document.get_raw_content())
+        self.assertEqual(len(data), sum(document.get_location()[1]
+                                        for document in documents))
+
+    def test_split(self):
+        parser = CACMDocumentParser(self._path)
+        expected = self._documents(parser)
+        for number_of_ranges in [1, 2, 4, 7, 100]:
+            ranges = parser.split(number_of_ranges)
+            self.assertLessEqual(len(ranges), number_of_ranges)
+            self.assertEqual(0, ranges[0][0])
+            self.assertEqual(os.path.getsize(self._path), ranges[-1][1])
+            documents = []
+            for byte_range in ranges:
+                documents.extend(self._documents(parser, *byte_range))
+            self.assertEqual(expected, documents)
+        self.assertEqual(4, len(parser.split(4)))
+
+    def test_split_inex(self):
+        path = os.path.join(self._directory, "inex")
+        with open(path, "w", encoding="utf8") as file_ptr:
+            file_ptr.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            for doc_id in range(1, 11):
+                file_ptr.write('<article>\n<name id="{0}">Name {0}</name>\n'
+                               '<body>\ntext\n</body>\n</article>\n'.format(doc_id))
+        parser = INEXDocumentParser(path)
+        expected = self._documents(parser)
+        ranges = parser.split(3)
+        self.assertEqual(3, len(ranges))
+        documents = []
+        for byte_range in ranges:
+            documents.extend(self._documents(parser, *byte_range))
+        self.assertEqual(expected, documents)
@@ -0,0 +1,92 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from ..document_parser import CACMDocumentParser
+from ..document_store import DocumentStore, pack_document
+from ..index import Index
+
+
+class DocumentStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "corpus")
+        with open(self._path, "w", encoding="utf8") as file_ptr:
+            for doc_id in range(1, 21):
+                file_ptr.write(".I {0}\n.T\nTitle {0}\n.W\nsome words of {0}\n".format(doc_id))
+        self._documents = [document for (_, _, document)
+                           in CACMDocumentParser(self._path).get_documents()]
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_read(self):
+        store = DocumentStore()
+        for document in self._documents:
+            store.add_document(document.get_doc_id(), self._path, document)
+        self.assertEqual(20, len(store))
+        self.assertIn(7, store)
+        self.assertEqual(".I 7\n.T\nTitle 7\n.W\nsome words of 7\n", store.read(7))
+        self.assertIsNone(store.title(7))
+        self.assertEqual(0, store.stored_size())
+        store.remove(7)
+        self.assertNotIn(7, store)
+
+    def test_compressed(self):
+        store = DocumentStore(compressed=True)
+        for document in self._documents:
+            store.add_document(document.get_doc_id(), self._path, document)
+        os.remove(self._path)
+        self.assertEqual(".I 3\n.T\nTitle 3\n.W\nsome words of 3\n", store.read(3))
+        self.assertEqual("Title 3", store.title(3))
+        self.assertGreater(store.stored_size(), 0)
+        copy = pickle.loads(pickle.dumps(store))
+        self.assertEqual("Title 3", copy.title(3))
+
+    def test_pack_document(self):
+        (_, title) = pack_document(self._documents[0])
+        self.assertEqual("Title 1", title)
+
+    def test_crlf(self):
+        path = os.path.join(self._directory, "crlf")
+        with open(path, "wb") as file_ptr:
+            file_ptr.write(b".I 1\r\n.T\r\nFirst\r\n.I 2\r\n.T\r\nSecond\r\n")
+        store = DocumentStore()
+        for (_, _, document) in CACMDocumentParser(path).get_documents():
+            store.add_document(document.get_doc_id(), path, document)
+        self.assertEqual(".I 2\n.T\nSecond\n", store.read(2))
+
+    def test_index(self):
+        for store_documents in [False, True]:
+            index = Index(self._path, store_documents=store_documents)
+            self.assertEqual("Title 12", index.document_by_id(12).get_title())
+            self.assertEqual("Title 12", index.document_title(12))
+            self.assertEqual(store_documents, index.document_store().title(12) is not None)
+
+    def test_index_without_files(self):
+        index = Index(self._path, store_documents=True)
+        os.remove(self._path)
+        self.assertEqual("Title 20", index.document_by_id(20).get_title())
+        self.assertEqual("Title 20", index.document_title(20))
+
+    def test_update_document(self):
+        index = Index(self._path, store_documents=True)
+        path = os.path.join(self._directory, "update")
+        with open(path, "w", encoding="utf8") as file_ptr:
+            file_ptr.write(".I 4\n.T\nNew title\n.W\nother words\n")
+        index.update_document(4, path)
+        self.assertEqual("New title", index.document_title(4))
+        index.delete_document(5)
+        index.purge()
+        self.assertNotIn(5, index.document_store())
+        self.assertRaises(ValueError, index.document_by_id, 5)
+
+    def test_legacy_pickle(self):
+        index = Index(self._path)
+        state = index.__getstate__()
+        del state['_document_store']
+        legacy = Index.__new__(Index)
+        legacy.__setstate__(state)
+        self.assertEqual("Title 9", legacy.document_by_id(9).get_title())
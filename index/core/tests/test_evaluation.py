@@ -0,0 +1,100 @@
+import random
+import unittest
+from math import ceil, log2
+from ..evaluation import relevance_vector, curve_cutoffs, evaluate_ranking, \
+    evaluate_run, evaluate_runs
+
+
+def legacy_curve(run, relevant):
+    '''
+    The curve computed by RecallPrecisionGenerator before the evaluation
+    module: recall and precision at every percentage of the results.
+    '''
+    recalls = [x/10 for x in range(0, 11)]
+    prec_average = [[] for x in range(0, 11)]
+    for (query_id, results) in run.items():
+        pertinent = relevant.get(query_id, [])
+        recall_prec_list = []
+        for percentage in [p * 0.001 for p in range(1, 100)] + list(range(1, 100)):
+            top = int(ceil(len(results)*percentage/100))
+            found = len([k for k in pertinent if k in [x for (x, y) in results[0:top]]])
+            recall_prec_list.append((found / len(pertinent) if pertinent else 1.0, found / top))
+        for idx in range(0, 11):
+            precisions_for_recall = [prec for (recall, prec) in recall_prec_list
+                                     if recalls[idx] <= recall]
+            if precisions_for_recall:
+                prec_average[idx].append(max(precisions_for_recall))
+    return [sum(l)/len(l) for l in prec_average]
+
+
+def random_run(randomizer, queries, documents):
+    '''Returns random results and relevance judgments of queries.'''
+    run = {}
+    relevant = {}
+    for query_id in range(queries):
+        doc_ids = randomizer.sample(range(documents), randomizer.randint(1, documents))
+        run[query_id] = [(doc_id, 1.0 / rank) for (rank, doc_id) in enumerate(doc_ids, 1)]
+        if query_id % 5:
+            relevant[query_id] = randomizer.sample(
+                range(documents), randomizer.randint(1, min(20, documents)))
+    return (run, relevant)
+
+
+class EvaluationTests(unittest.TestCase):
+
+    def test_relevance_vector(self):
+        self.assertEqual([0, 1, 1, 0],
+                         relevance_vector([(4, 1.0), (2, 0.8), (7, 0.5), (1, 0.1)], {2, 7}))
+        self.assertEqual([], relevance_vector([], {2}))
+
+    def test_curve_cutoffs(self):
+        self.assertEqual([], curve_cutoffs(0))
+        self.assertEqual([1], curve_cutoffs(1))
+        self.assertEqual(list(range(1, 11)), curve_cutoffs(10))
+        cutoffs = curve_cutoffs(3204)
+        self.assertEqual(1, cutoffs[0])
+        self.assertEqual(3172, cutoffs[-1])
+
+    def test_evaluate_ranking(self):
+        results = [(doc_id, 1.0) for doc_id in [3, 1, 5, 2, 4]]
+        evaluation = evaluate_ranking(results, [1, 2, 6], 4)
+        self.assertAlmostEqual((1 / 2 + 2 / 4) / 3, evaluation['average_precision'])
+        self.assertAlmostEqual(2 / 4, evaluation['precision'])
+        self.assertAlmostEqual((1 / log2(3) + 1 / log2(5)) / (1 + 1 / log2(3) + 1 / log2(4)),
+                               evaluation['ndcg'])
+        # Recall 2/3 is reached with a precision of 1/2, higher levels never.
+        self.assertEqual([0.5] * 7 + [None] * 4, evaluation['curve'])
+        evaluation = evaluate_ranking(results, [])
+        self.assertEqual(0.0, evaluation['average_precision'])
+        self.assertEqual(0.0, evaluation['ndcg'])
+        self.assertEqual([0.0] * 11, evaluation['curve'])
+        evaluation = evaluate_ranking([], [1])
+        self.assertEqual(0.0, evaluation['precision'])
+        self.assertEqual([None] * 11, evaluation['curve'])
+
+    def test_same_curve(self):
+        randomizer = random.Random(0)
+        for documents in [5, 120, 1500]:
+            (run, relevant) = random_run(randomizer, 20, documents)
+            self.assertEqual(legacy_curve(run, relevant),
+                             evaluate_run(run, relevant)['precisions'])
+
+    def test_evaluate_run(self):
+        run = {1: [(1, 0.9), (2, 0.5)], 2: [(3, 0.9), (4, 0.5)], 3: [(5, 0.2)]}
+        evaluation = evaluate_run(run, {1: [1], 2: [4, 6]}, 2)
+        self.assertEqual([x / 10 for x in range(0, 11)], evaluation['recalls'])
+        # Query 3 has no relevant documents and only counts in the curve.
+        self.assertAlmostEqual((1.0 + 1 / 4) / 2, evaluation['mean_average_precision'])
+        self.assertAlmostEqual((1 / 2 + 1 / 2) / 2, evaluation['precision'])
+        self.assertAlmostEqual((1.0 + (1 / log2(3)) / (1 + 1 / log2(3))) / 2,
+                               evaluation['ndcg'])
+        self.assertAlmostEqual((1.0 + 0.5 + 0.0) / 3, evaluation['precisions'][0])
+
+    def test_evaluate_runs(self):
+        randomizer = random.Random(1)
+        (_, relevant) = random_run(randomizer, 10, 200)
+        runs = dict((name, random_run(randomizer, 10, 200)[0])
+                    for name in ["first", "second", "third"])
+        expected = dict((name, evaluate_run(run, relevant)) for (name, run) in runs.items())
+        self.assertEqual(expected, evaluate_runs(runs, relevant))
+        self.assertEqual(expected, evaluate_runs(runs, relevant, processes=2))
@@ -0,0 +1,94 @@
+import random
+import shutil
+import tempfile
+import unittest
+from ..impact_index import ImpactIndex
+from ..index import Index
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25
+from .test_vectorial_query import write_random_corpus
+
+MODELS = [VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic,
+          VectorialQueryBM25]
+
+
+class ImpactIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        randomizer = random.Random(5)
+        words = ["word{0}".format(i) for i in range(0, 60)]
+        cls._directory = tempfile.mkdtemp()
+        cls._path = write_random_corpus(cls._directory, randomizer, words)
+        cls._index = Index(cls._path)
+        cls._queries = [
+            " ".join(randomizer.sample(words, randomizer.randint(1, 6)))
+            for _ in range(0, 30)] + ["unknown", "word0 word0 word1"]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._directory)
+
+    def assert_same_results(self, expected, actual):
+        self.assertEqual([doc_id for (doc_id, _) in expected],
+                         [doc_id for (doc_id, _) in actual])
+        for ((_, expected_score), (_, actual_score)) in zip(expected, actual):
+            self.assertAlmostEqual(expected_score, actual_score)
+
+    def test_segments(self):
+        impacts = ImpactIndex(self._index, VectorialQueryTfIdf, bits=4)
+        for (term, (step, segments)) in impacts.terms().items():
+            levels = [level for (level, _, _) in segments]
+            self.assertEqual(sorted(levels, reverse=True), levels)
+            self.assertTrue(levels[0] <= 15)
+            self.assertEqual(sorted(self._index.postings(term)),
+                             sorted(doc_id for (_, doc_ids, _) in segments
+                                    for doc_id in doc_ids))
+
+    def test_quantized_scores(self):
+        for model in MODELS:
+            impacts = ImpactIndex(self._index, model, bits=16)
+            for query in self._queries:
+                expected = dict(model(query).execute(self._index))
+                actual = dict(impacts.execute(query))
+                self.assertEqual(set(expected), set(actual))
+                for doc_id in expected:
+                    self.assertAlmostEqual(expected[doc_id], actual[doc_id], places=3)
+
+    def test_exact_mode(self):
+        for model in MODELS:
+            impacts = ImpactIndex(self._index, model)
+            for query in self._queries:
+                results = impacts.execute(query)
+                for k in [1, 10]:
+                    self.assert_same_results(results[0:k], impacts.execute(query, k))
+
+    def test_early_termination(self):
+        impacts = ImpactIndex(self._index, VectorialQueryTfIdf)
+        read_postings = 0
+        postings = 0
+        for query in self._queries:
+            impacts.execute(query, 1)
+            read_postings += impacts.read_postings
+            impacts.execute(query)
+            postings += impacts.read_postings
+        self.assertLess(read_postings, postings)
+
+    def test_budget(self):
+        impacts = ImpactIndex(self._index, VectorialQueryBM25)
+        query = "word1 word2 word3"
+        results = impacts.execute(query)
+        for budget in [0, 1, 10, 50]:
+            self.assertEqual(10 if budget >= 10 else budget,
+                             len(impacts.execute(query, 10, budget)))
+            self.assertEqual(budget, impacts.read_postings)
+        self.assertEqual(results[0:10], impacts.execute(query, 10, len(results) * 3))
+        top = impacts.execute(query, 1, 20)[0]
+        self.assertEqual(results[0][0], top[0])
+
+    def test_index_changes(self):
+        index = Index(self._path)
+        impacts = ImpactIndex(index, VectorialQueryTfIdf)
+        self.assertIn(1, dict(impacts.execute("word1 word2")))
+        index.delete_document(1)
+        self.assertNotIn(1, dict(impacts.execute("word1 word2")))
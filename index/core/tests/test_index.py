@@ -1,6 +1,14 @@
 import unittest
 import os
+import random
+import shutil
+import tempfile
+from math import log, sqrt
+from ..constants import FILE, WORDS, TFIDF, NORM_COUNT, BM25
 from ..index import Index
+from ..index_serializer import IndexSerializer
+from ..segment import TieredMergePolicy
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryProbabilistic
 
 
 class IndexTests(unittest.TestCase):
@@ -76,3 +84,250 @@ class IndexTests(unittest.TestCase):
         ]
         self.assertEqual({}, index.index_by_doc_id(404))
         self.assertEqual(expected, index.index_by_doc_id(1))
+
+    def test_lexicon(self):
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+        lexicon = index.lexicon()
+        self.assertEqual(len(index._inverted_index), len(lexicon))
+        for term in index._inverted_index:
+            self.assertIs(term, lexicon.term(lexicon.term_id(term)))
+        self.assertEqual(2, lexicon.document_frequencies[lexicon.term_id('languag')])
+        self.assertEqual(2, index.collection_frequency('preliminari'))
+        self.assertEqual(0, index.collection_frequency('missing'))
+
+    def test_document_norms(self):
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+        self.assertEqual(2, index.max_frequency(1))
+        self.assertAlmostEqual(sqrt(2), index.document_norm(NORM_COUNT, 1))
+        # Only 'languag' appears in both documents, its idf is null.
+        expected_tfidf = sqrt(3 * (log(2, 10) * log(2, 10)) ** 2
+                              + (log(3, 10) * log(2, 10)) ** 2)
+        self.assertAlmostEqual(expected_tfidf, index.document_norm(TFIDF, 1))
+
+    def test_query_only(self):
+        data_path = os.path.dirname(os.path.realpath(__file__)) + "/test_data"
+        full_index = Index(data_path)
+        index = Index(data_path, query_only=True)
+        self.assertEqual({}, index.index_by_doc_id(1)[WORDS])
+        self.assertEqual(full_index._inverted_index, index._inverted_index)
+        self.assertEqual(full_index.document_norm(TFIDF, 2),
+                         index.document_norm(TFIDF, 2))
+
+    def test_compressed(self):
+        data_path = os.path.dirname(os.path.realpath(__file__)) + "/test_data"
+        index = Index(data_path, compressed=True)
+        self.assertEqual([1, 2], list(index.search('Language')))
+        self.assertEqual([(1, 2)], list(index.postings_with_frequencies('preliminari')))
+        self.assertEqual(Index(data_path)._inverted_index, index._inverted_index)
+        self.assertEqual(Index(data_path).document_norm(TFIDF, 1),
+                         index.document_norm(TFIDF, 1))
+
+
+class IncrementalIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        randomizer = random.Random(3)
+        words = ["word{0}".format(i) for i in range(0, 30)]
+        self._directory = tempfile.mkdtemp()
+        self._contents = dict()
+        self._paths = []
+        for file_number in range(0, 4):
+            doc_ids = range(file_number * 20 + 1, file_number * 20 + 21)
+            for doc_id in doc_ids:
+                self._contents[doc_id] = " ".join(
+                    words[int(randomizer.paretovariate(1)) % len(words)]
+                    for _ in range(0, randomizer.randint(3, 20)))
+            self._paths.append(self._write_file(
+                "part{0}".format(file_number), doc_ids))
+
+    def _write_file(self, name, doc_ids):
+        path = os.path.join(self._directory, name)
+        with open(path, "w") as file_ptr:
+            for doc_id in doc_ids:
+                file_ptr.write(".I {0}\n.T\n{1}\n".format(
+                    doc_id, self._contents[doc_id]))
+        return path
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def assert_same_index(self, expected, actual):
+        self.assertEqual(expected.get_number_of_docs(), actual.get_number_of_docs())
+        # Terms of deleted documents are kept until they are purged.
+        self.assertEqual(set(expected.terms()), {
+            term for term in actual.terms() if actual.document_frequency(term)})
+        for term in expected.terms():
+            self.assertEqual(list(expected.postings(term)),
+                             list(actual.postings(term)))
+            self.assertEqual(list(expected.postings_with_frequencies(term)),
+                             list(actual.postings_with_frequencies(term)))
+            self.assertAlmostEqual(expected.max_document_weight(TFIDF, term),
+                                   actual.max_document_weight(TFIDF, term))
+            self.assertEqual(expected.collection_frequency(term),
+                             actual.collection_frequency(term))
+        for doc_id in expected.get_all_doc_ids():
+            self.assertEqual(expected.max_frequency(doc_id),
+                             actual.max_frequency(doc_id))
+            if not actual._query_only:
+                self.assertEqual(expected.index_by_doc_id(doc_id)[WORDS],
+                                 actual.index_by_doc_id(doc_id)[WORDS])
+            for weighting in [TFIDF, NORM_COUNT]:
+                self.assertAlmostEqual(expected.document_norm(weighting, doc_id),
+                                       actual.document_norm(weighting, doc_id))
+
+    def assert_same_results(self, expected, actual):
+        self.assertEqual([doc_id for (doc_id, _) in expected],
+                         [doc_id for (doc_id, _) in actual])
+        for ((_, expected_score), (_, actual_score)) in zip(expected, actual):
+            self.assertAlmostEqual(expected_score, actual_score)
+
+    def test_add_file(self):
+        index = Index(self._paths[0])
+        for path in self._paths[1:]:
+            index.add_file(path)
+        self.assertEqual(3, len(index.segments()))
+        self.assertEqual(index.document_by_id(65).get_title(),
+                         Index(self._paths[3]).document_by_id(65).get_title())
+        self.assert_same_index(Index(self._paths), index)
+
+    def test_add_file_compressed_query_only(self):
+        index = Index(self._paths[0], query_only=True, compressed=True)
+        index.add_file(self._paths[1])
+        self.assertEqual({}, index.index_by_doc_id(30)[WORDS])
+        self.assert_same_index(Index(self._paths[0:2]), index)
+
+    def test_add_existing_document(self):
+        index = Index(self._paths[0])
+        self.assertRaises(ValueError, index.add_file, self._paths[0])
+
+    def test_background_merges(self):
+        index = Index(self._paths[0])
+        index._merge_policy = TieredMergePolicy(merge_factor=2)
+        for path in self._paths[1:]:
+            index.add_file(path)
+            index.wait_for_merges()
+        # Two segments of 20 documents were merged into one of 40.
+        self.assertEqual([40, 20], [len(segment) for segment in index.segments()])
+        self.assert_same_index(Index(self._paths), index)
+
+    def test_update_document_then_merge(self):
+        index = Index(self._paths[0:2])
+        index._merge_policy = TieredMergePolicy(merge_factor=2)
+        self._contents[25] = "word1"
+        index.update_document(25, self._write_file("update", [25]))
+        # The merged segments hold the deleted and the live version of 25.
+        self._contents[25] = "word1 updated"
+        index.update_document(25, self._write_file("update_again", [25]))
+        index.wait_for_merges()
+        self.assertEqual([1], [len(segment) for segment in index.segments()])
+        self.assertEqual([25], list(index.search("updated")))
+        self.assertIn(25, index.get_all_doc_ids())
+        self.assert_same_index(Index(self._write_file("expected", range(1, 41))), index)
+        index.purge()
+        self.assert_same_index(Index(self._write_file("expected", range(1, 41))), index)
+
+    def test_delete_document(self):
+        index = Index(self._paths[0:2])
+        index.delete_document(3)
+        index.delete_document(25)
+        self.assertRaises(ValueError, index.delete_document, 3)
+        self.assertEqual(38, index.get_number_of_docs())
+        self.assertNotIn(3, index.get_all_doc_ids())
+        self.assertEqual(dict(), index.index_by_doc_id(3))
+        self.assertRaises(ValueError, index.document_by_id, 3)
+        expected = Index(self._write_file(
+            "expected", [doc_id for doc_id in range(1, 41) if doc_id not in [3, 25]]))
+        self.assert_same_index(expected, index)
+        query = VectorialQueryTfIdf("word1 word2 word7")
+        self.assert_same_results(query.execute(expected, 10),
+                                 query.execute_pruned(index, 10))
+        query = VectorialQueryProbabilistic("word1 word2 word7")
+        self.assert_same_results(query.execute(expected, 10),
+                                 query.execute(index, 10))
+
+    def test_delete_document_query_only(self):
+        index = Index(self._paths[0:2], query_only=True, compressed=True)
+        self.assertEqual(set(self._contents[4].split()) | set(self._contents[9].split()),
+                         index._base.terms_of_documents([9, 4]))
+        index.add_file(self._paths[2])
+        index.delete_document(3)
+        index.delete_document(45)
+        # The terms of the deleted documents are looked up by purge().
+        self.assertEqual({3, 45}, index._deleted_documents)
+        self.assertEqual(58, index.get_number_of_docs())
+        index.purge()
+        self.assertEqual(set(), index._deleted_documents)
+        expected = Index(self._write_file(
+            "expected", [doc_id for doc_id in range(1, 61) if doc_id not in [3, 45]]))
+        self.assert_same_index(expected, index)
+        self.assertAlmostEqual(expected.average_document_length(),
+                               index.average_document_length())
+        for term in expected.terms():
+            self.assertAlmostEqual(expected.idf(BM25, term), index.idf(BM25, term))
+
+    def test_idf_cached_until_change(self):
+        index = Index(self._paths[0])
+        term = index._analyzer.term(self._contents[7].split()[0])
+        idf = index.idf(BM25, term)
+        self.assertEqual({term: idf}, index._idfs[BM25])
+        index.delete_document(7)
+        expected = Index(self._write_file(
+            "expected", [doc_id for doc_id in range(1, 21) if doc_id != 7]))
+        self.assertAlmostEqual(expected.idf(BM25, term), index.idf(BM25, term))
+        self.assertNotAlmostEqual(idf, index.idf(BM25, term))
+
+    def test_delete_document_query_only_then_merge(self):
+        index = Index(self._paths[0], query_only=True)
+        index._merge_policy = TieredMergePolicy(merge_factor=2)
+        index.add_file(self._paths[1])
+        index.delete_document(25)
+        index.add_file(self._paths[2])
+        index.wait_for_merges()
+        # The merge looked up the terms of 25 before dropping its postings.
+        self.assertEqual([39], [len(segment) for segment in index.segments()])
+        self.assertEqual(set(), index._deleted_documents)
+        expected = Index(self._write_file(
+            "expected", [doc_id for doc_id in range(1, 61) if doc_id != 25]))
+        self.assert_same_index(expected, index)
+
+    def test_delete_document_in_segment(self):
+        index = Index(self._paths[0], compressed=True)
+        index.add_file(self._paths[1])
+        index.delete_document(30)
+        expected = Index(self._write_file(
+            "expected", [doc_id for doc_id in range(1, 41) if doc_id != 30]))
+        self.assert_same_index(expected, index)
+        index.purge()
+        self.assertNotIn(30, index._index)
+        self.assertFalse(index.segments()[0].deleted())
+        self.assert_same_index(expected, index)
+
+    def test_update_document(self):
+        index = Index(self._paths[0:2])
+        self._contents[5] = "word1 updated"
+        path = self._write_file("update", [5])
+        index.update_document(5, path)
+        self.assertEqual([5], list(index.search("updated")))
+        self.assertEqual(40, index.get_number_of_docs())
+        self.assertEqual(path, index.index_by_doc_id(5)[FILE])
+        expected = Index(self._write_file("expected", range(1, 41)))
+        self.assert_same_index(expected, index)
+        # Updating the new version deletes it from its segment.
+        self._contents[5] = "word2"
+        index.update_document(5, self._write_file("update_again", [5]))
+        self.assertEqual([], list(index.search("updated")))
+        index.purge()
+        self.assert_same_index(
+            Index(self._write_file("expected_again", range(1, 41))), index)
+
+    def test_purge_and_save(self):
+        index = Index(self._paths[0])
+        index.delete_document(1)
+        path = os.path.join(self._directory, "saved")
+        IndexSerializer.save_to_file(index, path)
+        loaded = IndexSerializer.load_from_file(path)
+        self.assertEqual(19, loaded.get_number_of_docs())
+        index.purge()
+        self.assertEqual(19, len(index._index))
+        self.assertNotIn(1, index.postings("word0"))
+        self.assert_same_index(loaded, index)
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..index import Index
+from ..index_serializer import IndexSerializer
+
+
+class IndexSerializerTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._index = Index(
+            os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_save_to_file(self):
+        path = os.path.join(self._directory, "index")
+        IndexSerializer.save_to_file(self._index, path)
+        # Saving must leave the index usable.
+        self.assertEqual([1, 2], self._index.search("language"))
+        loaded = IndexSerializer.load_from_file(path)
+        self.assertEqual(self._index._inverted_index, loaded._inverted_index)
+        self.assertEqual([1, 2], loaded.search("language"))
+
+    def test_save_to_directory(self):
+        path = os.path.join(self._directory, "index")
+        IndexSerializer.save_to_directory(self._index, path)
+        self.assertEqual([1, 2], self._index.search("language"))
+        loaded = IndexSerializer.load_from_file(path)
+        self.assertEqual([1, 2], list(loaded.search("language")))
+        self.assertEqual([2], list(loaded.search("roots")))
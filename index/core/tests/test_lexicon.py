@@ -0,0 +1,40 @@
+import pickle
+import unittest
+from array import array
+from ..lexicon import Lexicon, TermCounts, encode_term_counts
+
+
+class LexiconTests(unittest.TestCase):
+
+    def test_add(self):
+        lexicon = Lexicon()
+        self.assertEqual(0, lexicon.add('report'))
+        self.assertEqual(1, lexicon.add('languag'))
+        self.assertEqual(0, lexicon.add('report'))
+        self.assertEqual(2, len(lexicon))
+        self.assertEqual('languag', lexicon.term(1))
+        self.assertEqual(1, lexicon.term_id('languag'))
+        self.assertIsNone(lexicon.term_id('algebra'))
+        self.assertTrue('report' in lexicon)
+        self.assertEqual([0, 0], list(lexicon.document_frequencies))
+
+    def test_encode(self):
+        lexicon = Lexicon()
+        lexicon.add('report')
+        term_counts = lexicon.encode({'languag': 3, 'report': 1})
+        self.assertEqual(array('I', [0, 1, 1, 3]), term_counts)
+        self.assertEqual(array('I', [2, 5, 7, 1]), encode_term_counts([5, 2], [1, 7]))
+
+    def test_term_counts(self):
+        lexicon = Lexicon()
+        words = {'preliminari': 2, 'report': 1, 'algebra': 1}
+        term_counts = TermCounts(lexicon, lexicon.encode(words))
+        lexicon.add('other')
+        self.assertEqual(words, term_counts)
+        self.assertEqual(term_counts, words)
+        self.assertEqual(2, term_counts['preliminari'])
+        self.assertRaises(KeyError, lambda: term_counts['other'])
+        self.assertRaises(KeyError, lambda: term_counts['missing'])
+        self.assertEqual(3, len(term_counts))
+        self.assertEqual({}, TermCounts(lexicon, None))
+        self.assertEqual(words, pickle.loads(pickle.dumps(dict(term_counts))))
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..analyzer import Analyzer
+from ..configuration import Configuration
+from ..constants import TFIDF, NORM_COUNT
+from ..index import Index
+from ..parallel_indexing import invert_file, merge_partition, term_partition, \
+    split_files
+
+
+class ParallelIndexingTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._paths = [
+            self._write_file("first", [(3, "alpha beta beta"), (1, "beta gamma")]),
+            self._write_file("second", [(2, "alpha delta"), (5, "gamma gamma")]),
+            self._write_file("third", [(4, "beta epsilon alpha"), (6, "zeta")])]
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _write_file(self, name, documents):
+        path = os.path.join(self._directory, name)
+        with open(path, "w") as file_ptr:
+            for (doc_id, content) in documents:
+                file_ptr.write(".I {0}\n.T\n{1}\n".format(doc_id, content))
+        return path
+
+    def test_invert_file(self):
+        partial = invert_file(self._paths[0], Configuration.DocumentParser, Analyzer(),
+                              False, True, 1)
+        (doc_ids, frequencies) = partial.postings[0]['beta']
+        self.assertEqual([1, 3], list(doc_ids))
+        self.assertEqual([1, 2], list(frequencies))
+        self.assertEqual([3, 1], [document[0] for document in partial.documents])
+        (term_ids, counts) = partial.documents[0][6]
+        self.assertEqual({'alpha': 1, 'beta': 2},
+                         dict((partial.vocabulary[term_id], count)
+                              for (term_id, count) in zip(term_ids, counts)))
+        self.assertEqual(2, partial.documents[0][3])
+
+    def test_invert_file_partitions(self):
+        partial = invert_file(self._paths[0], Configuration.DocumentParser, Analyzer(),
+                              False, False, 3)
+        for (partition, postings) in enumerate(partial.postings):
+            for term in postings:
+                self.assertEqual(partition, term_partition(term, 3))
+        self.assertEqual({'alpha', 'beta', 'gamma'},
+                         set(term for postings in partial.postings for term in postings))
+        self.assertIsNone(partial.documents[0][6])
+
+    def test_merge_partition(self):
+        partials = [invert_file(path, Configuration.DocumentParser, Analyzer(), False, False, 1)
+                    for path in reversed(self._paths)]
+        (inverted_index, frequencies) = merge_partition(
+            [partial.postings[0] for partial in partials], False)
+        self.assertEqual([2, 3, 4], inverted_index['alpha'])
+        self.assertEqual([1, 3, 4], inverted_index['beta'])
+        self.assertEqual([1, 2, 1], frequencies['beta'])
+        (inverted_index, _) = merge_partition(
+            [partial.postings[0] for partial in partials], True)
+        self.assertEqual([(1, 1), (3, 2), (4, 1)],
+                         list(inverted_index['beta'].with_frequencies()))
+
+    def _index_with_processes(self, data_files, store_documents=False):
+        number_of_threads = Configuration.number_of_threads
+        Configuration.number_of_threads = 2
+        try:
+            return Index(data_files, positional=True, store_documents=store_documents)
+        finally:
+            Configuration.number_of_threads = number_of_threads
+
+    def assert_same_index(self, expected, index):
+        self.assertEqual(sorted(expected.terms()), sorted(index.terms()))
+        for term in expected.terms():
+            self.assertEqual(list(expected.postings_with_frequencies(term)),
+                             list(index.postings_with_frequencies(term)))
+            self.assertAlmostEqual(expected.max_document_weight(TFIDF, term),
+                                   index.max_document_weight(TFIDF, term))
+        self.assertEqual(list(expected.get_all_doc_ids()),
+                         list(index.get_all_doc_ids()))
+        for doc_id in expected.get_all_doc_ids():
+            self.assertEqual(expected.index_by_doc_id(doc_id),
+                             index.index_by_doc_id(doc_id))
+            self.assertEqual(expected.document_store().location(doc_id),
+                             index.document_store().location(doc_id))
+            for weighting in [TFIDF, NORM_COUNT]:
+                self.assertAlmostEqual(expected.document_norm(weighting, doc_id),
+                                       index.document_norm(weighting, doc_id))
+
+    def test_processes(self):
+        expected = Index(self._paths, positional=True)
+        self.assert_same_index(expected, self._index_with_processes(self._paths))
+
+    def test_split_files(self):
+        self.assertEqual([(path, None) for path in self._paths],
+                         split_files(self._paths, Configuration.DocumentParser, 1))
+        path = self._write_file("large", [(doc_id, "word{0} common".format(doc_id))
+                                          for doc_id in range(10, 50)])
+        ranges = split_files([self._paths[0], path], Configuration.DocumentParser, 4)
+        self.assertEqual((self._paths[0], None), ranges[0])
+        self.assertGreater(len(ranges), 3)
+        self.assertEqual([path], list(set(file_path for (file_path, _) in ranges[1:])))
+
+    def test_processes_on_one_file(self):
+        path = self._write_file("large", [(doc_id, "word{0} common".format(doc_id % 7))
+                                          for doc_id in range(10, 50)])
+        expected = Index(path, positional=True)
+        index = self._index_with_processes(path)
+        self.assert_same_index(expected, index)
+        self.assertEqual("word0 common", index.document_by_id(49).get_title())
+        index = self._index_with_processes(path, store_documents=True)
+        self.assertEqual("word0 common", index.document_store().title(49))
@@ -0,0 +1,101 @@
+import random
+import unittest
+from ..postings import PostingsCursor, CompressedPostings, MergedPostingsCursor, \
+    intersect, union, difference
+
+
+class PostingsTests(unittest.TestCase):
+
+    def setUp(self):
+        randomizer = random.Random(7)
+        self.doc_ids = sorted(randomizer.sample(range(1, 100000), 1000))
+        self.frequencies = [randomizer.randint(1, 300) for _ in self.doc_ids]
+
+    def _check_next_geq(self, cursor):
+        '''Moves a cursor to increasing targets and checks its positions.'''
+        for target in range(0, 100100, 997):
+            cursor.next_geq(target)
+            expected = [doc_id for doc_id in self.doc_ids if doc_id >= target]
+            if not expected:
+                self.assertTrue(cursor.at_end())
+                return
+            self.assertEqual(expected[0], cursor.doc_id())
+            self.assertEqual(
+                self.frequencies[self.doc_ids.index(expected[0])],
+                cursor.frequency())
+
+    def test_cursor_next_geq(self):
+        self._check_next_geq(PostingsCursor(self.doc_ids, self.frequencies))
+
+    def test_cursor_next(self):
+        cursor = PostingsCursor([1, 5], [2, 3])
+        self.assertEqual((1, 2), (cursor.doc_id(), cursor.frequency()))
+        cursor.next()
+        self.assertEqual((5, 3), (cursor.doc_id(), cursor.frequency()))
+        cursor.next()
+        self.assertTrue(cursor.at_end())
+
+    def test_compressed_postings(self):
+        postings = CompressedPostings(self.doc_ids, self.frequencies)
+        self.assertEqual(len(self.doc_ids), len(postings))
+        self.assertEqual(self.doc_ids, list(postings))
+        self.assertEqual(list(zip(self.doc_ids, self.frequencies)),
+                         list(postings.with_frequencies()))
+        self.assertTrue(postings.memory_size() < 8 * len(self.doc_ids))
+
+    def test_compressed_postings_empty(self):
+        postings = CompressedPostings([], [])
+        self.assertEqual(0, len(postings))
+        self.assertEqual([], list(postings))
+        self.assertTrue(postings.cursor().at_end())
+
+    def test_compressed_cursor_next_geq(self):
+        postings = CompressedPostings(self.doc_ids, self.frequencies)
+        self._check_next_geq(postings.cursor())
+
+    def test_merged_cursor_next_geq(self):
+        # The postings are dealt between three lists with disjoint doc ids.
+        cursors = [
+            PostingsCursor(self.doc_ids[start::3], self.frequencies[start::3])
+            for start in range(0, 3)]
+        cursor = MergedPostingsCursor(cursors)
+        self.assertEqual(len(self.doc_ids), len(cursor))
+        self._check_next_geq(cursor)
+
+    def test_merged_cursor_next(self):
+        cursor = MergedPostingsCursor([PostingsCursor([2, 7], [1, 1]),
+                                       PostingsCursor([], []),
+                                       PostingsCursor([1, 5], [3, 4])])
+        read = []
+        while not cursor.at_end():
+            read.append((cursor.doc_id(), cursor.frequency()))
+            cursor.next()
+        self.assertEqual([(1, 3), (2, 1), (5, 4), (7, 1)], read)
+
+
+class SortedOperationsTests(unittest.TestCase):
+
+    def setUp(self):
+        randomizer = random.Random(3)
+        self.common = sorted(randomizer.sample(range(0, 50000), 20000))
+        self.rare = sorted(randomizer.sample(range(0, 50000), 30)) + [60000]
+        self.frequencies = [1] * len(self.common)
+
+    def test_intersect(self):
+        expected = sorted(set(self.common) & set(self.rare))
+        self.assertEqual(expected, intersect([self.common, self.rare]))
+        compressed = CompressedPostings(self.common, self.frequencies)
+        self.assertEqual(expected, intersect([self.rare, compressed]))
+        self.assertEqual([], intersect([self.rare, []]))
+        self.assertEqual([], intersect([]))
+
+    def test_union(self):
+        expected = sorted(set(self.common) | set(self.rare))
+        self.assertEqual(expected, union([self.common, self.rare]))
+        self.assertEqual([1, 2, 3], union([[1, 3], [], [2, 3]]))
+
+    def test_difference(self):
+        expected = sorted(set(self.rare) - set(self.common))
+        self.assertEqual(expected, difference(self.rare, self.common))
+        compressed = CompressedPostings(self.common, self.frequencies)
+        self.assertEqual(expected, difference(self.rare, compressed))
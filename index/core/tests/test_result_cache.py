@@ -0,0 +1,110 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from ..boolean_query import BooleanQuery
+from ..index import Index
+from ..result_cache import ResultCache, result_size
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount
+
+
+class ResultCacheTests(unittest.TestCase):
+
+    def test_cached(self):
+        cache = ResultCache()
+        calls = []
+        compute = lambda: calls.append(1) or [(1, 0.5)]
+        self.assertEqual([(1, 0.5)], cache.cached("query", 0, compute))
+        results = cache.cached("query", 0, compute)
+        self.assertEqual([(1, 0.5)], results)
+        self.assertEqual(1, len(calls))
+        # The cache returns copies of the results.
+        results.append((2, 0.1))
+        self.assertEqual([(1, 0.5)], cache.cached("query", 0, compute))
+        statistics = cache.statistics()
+        self.assertEqual((2, 1), (statistics['hits'], statistics['misses']))
+
+    def test_lru_eviction(self):
+        size = result_size("a", [1, 2])
+        cache = ResultCache(2 * size)
+        cache.cached("a", 0, lambda: [1, 2])
+        cache.cached("b", 0, lambda: [1, 2])
+        cache.cached("a", 0, lambda: [1, 2])
+        cache.cached("c", 0, lambda: [1, 2])
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.statistics()['evictions'])
+        self.assertLessEqual(cache.statistics()['size'], 2 * size)
+        # b was the least recently used result.
+        self.assertEqual(["missing"], cache.cached("b", 0, lambda: ["missing"]))
+        self.assertEqual([1, 2], cache.cached("c", 0, lambda: ["missing"]))
+
+    def test_results_larger_than_cache(self):
+        cache = ResultCache(0)
+        self.assertEqual([1], cache.cached("a", 0, lambda: [1]))
+        self.assertEqual(0, len(cache))
+
+    def test_version(self):
+        cache = ResultCache()
+        cache.cached("a", 0, lambda: [1])
+        self.assertEqual([2], cache.cached("a", 1, lambda: [2]))
+        self.assertEqual(1, cache.statistics()['invalidations'])
+
+    def test_pickle(self):
+        cache = ResultCache(1000)
+        cache.cached("a", 0, lambda: [1])
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(0, len(copy))
+        self.assertEqual(1000, copy.statistics()['max_size'])
+
+
+class IndexResultCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = self._write_file("corpus", [
+            (1, "parallel languages"), (2, "algebraic language"), (3, "parallel sorting")])
+        self._index = Index(self._path, positional=True)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _write_file(self, name, documents):
+        path = os.path.join(self._directory, name)
+        with open(path, "w") as file_ptr:
+            for (doc_id, content) in documents:
+                file_ptr.write(".I {0}\n.T\n{1}\n".format(doc_id, content))
+        return path
+
+    def _hits(self):
+        return self._index.result_cache().statistics()['hits']
+
+    def test_vectorial_query(self):
+        expected = VectorialQueryTfIdf("language parallel").execute(self._index, 10)
+        # The key is built from the analyzed terms, not from the text.
+        self.assertEqual(expected, VectorialQueryTfIdf("Parallel, languages").execute(
+            self._index, 10))
+        self.assertEqual(1, self._hits())
+        VectorialQueryTfIdf("language parallel").execute(self._index, 1)
+        VectorialQueryNormCount("language parallel").execute(self._index, 10)
+        self.assertEqual(1, self._hits())
+
+    def test_boolean_query(self):
+        self.assertEqual({3}, BooleanQuery("parallel * sorting").execute(self._index))
+        self.assertEqual({3}, BooleanQuery("sorting * parallel").execute(self._index))
+        self.assertEqual(1, self._hits())
+        self.assertEqual({1}, BooleanQuery('"parallel languages"').execute(self._index))
+        self.assertEqual(set(), BooleanQuery('"languages parallel"').execute(self._index))
+        self.assertEqual({1, 2}, BooleanQuery("parallel ~1 languages + algebraic")
+                         .execute(self._index))
+        self.assertEqual(1, self._hits())
+
+    def test_invalidation(self):
+        query = VectorialQueryTfIdf("sorting")
+        self.assertEqual([3], [doc_id for (doc_id, _) in query.execute(self._index)])
+        self._index.add_file(self._write_file("added", [(4, "sorting sorting")]))
+        self.assertEqual([4, 3], [doc_id for (doc_id, _) in query.execute(self._index)])
+        self._index.delete_document(4)
+        self.assertEqual([3], [doc_id for (doc_id, _) in query.execute(self._index)])
+        self.assertEqual(0, self._hits())
+        self.assertEqual(2, self._index.result_cache().statistics()['invalidations'])
@@ -0,0 +1,42 @@
+import os
+import unittest
+from ..index import Index
+from ..scoring import TermAtATimeScorer, BatchScorer, top_k
+
+
+class ScoringTests(unittest.TestCase):
+
+    def setUp(self):
+        self._index = Index(
+            os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+
+    def test_top_k(self):
+        results = [(1, 0.5), (2, 2.0), (3, 1.0), (4, 1.0)]
+        self.assertEqual([(2, 2.0), (3, 1.0), (4, 1.0), (1, 0.5)],
+                         top_k(results))
+        self.assertEqual([(2, 2.0), (3, 1.0)], top_k(results, 2))
+        self.assertEqual([], top_k(results, 0))
+
+    def test_accumulate(self):
+        scorer = TermAtATimeScorer(self._index)
+        scorer.accumulate('languag', lambda doc_id, frequency: frequency)
+        scorer.accumulate('preliminari', lambda doc_id, frequency: frequency)
+        scorer.accumulate('unknown', lambda doc_id, frequency: frequency)
+        self.assertEqual([(1, 3.0), (2, 1.0)], scorer.top_k())
+
+    def test_normalize(self):
+        scorer = TermAtATimeScorer(self._index)
+        scorer.accumulate('languag', lambda doc_id, frequency: 1.0)
+        scorer.normalize(lambda doc_id: 2.0 if doc_id == 1 else 0.0)
+        self.assertEqual([(1, 0.5), (2, 0.0)], scorer.top_k())
+
+    def test_batch_scorer(self):
+        scorer = BatchScorer(self._index)
+        scorer.add_query({'languag': lambda doc_id, frequency: frequency,
+                          'preliminari': lambda doc_id, frequency: frequency})
+        scorer.add_query({'languag': lambda doc_id, frequency: 1.0},
+                         lambda doc_id: 2.0 if doc_id == 1 else 0.0)
+        scorer.add_query({'unknown': lambda doc_id, frequency: 1.0})
+        self.assertEqual([[(1, 3.0), (2, 1.0)], [(1, 0.5), (2, 0.0)], []],
+                         scorer.top_k())
+        self.assertEqual([[(1, 3.0)], [(1, 0.5)], []], scorer.top_k(1))
@@ -0,0 +1,83 @@
+import unittest
+from array import array
+from ..segment import Bitmap, Segment, TieredMergePolicy, merge_segments
+
+
+class SegmentTests(unittest.TestCase):
+
+    def setUp(self):
+        self._first = Segment({'a': [1, 4], 'b': [4]}, {'a': [2, 1], 'b': [3]},
+                              array('Q', [1, 4]))
+        self._second = Segment({'a': [2], 'c': [3]}, {'a': [5], 'c': [1]},
+                               array('Q', [2, 3]))
+
+    def test_segment(self):
+        self.assertEqual(2, len(self._first))
+        self.assertEqual({'a', 'b'}, set(self._first.terms()))
+        self.assertEqual([1, 4], self._first.postings('a'))
+        self.assertEqual([], self._first.postings('c'))
+        self.assertEqual([(1, 2), (4, 1)],
+                         list(self._first.postings_with_frequencies('a')))
+        self.assertEqual(0, self._first.document_frequency('c'))
+
+    def test_merge_segments(self):
+        for compressed in [False, True]:
+            merged = merge_segments([self._first, self._second], compressed)
+            self.assertEqual(4, len(merged))
+            self.assertEqual({'a', 'b', 'c'}, set(merged.terms()))
+            self.assertEqual([(1, 2), (2, 5), (4, 1)],
+                             list(merged.postings_with_frequencies('a')))
+            cursor = merged.postings_cursor('a')
+            cursor.next_geq(2)
+            self.assertEqual((2, 5), (cursor.doc_id(), cursor.frequency()))
+
+    def test_delete(self):
+        self.assertTrue(self._first.contains(4))
+        self._first.delete(4)
+        self.assertFalse(self._first.contains(4))
+        self.assertFalse(self._first.contains(2))
+        self.assertEqual([1], self._first.postings('a'))
+        self.assertEqual([], self._first.postings('b'))
+        self.assertEqual([(1, 2)], list(self._first.postings_with_frequencies('a')))
+        self.assertEqual(1, self._first.document_frequency('a'))
+        self.assertEqual(0, self._first.document_frequency('b'))
+        cursor = self._first.postings_cursor('a')
+        cursor.next()
+        self.assertTrue(cursor.at_end())
+
+    def test_merge_drops_deleted(self):
+        self._first.delete(4)
+        merged = merge_segments([self._first, self._second])
+        self.assertEqual([1, 2, 3], list(merged.doc_ids()))
+        self.assertEqual({'a', 'c'}, set(merged.terms()))
+        self.assertFalse(merged.deleted())
+
+
+class BitmapTests(unittest.TestCase):
+
+    def test_bitmap(self):
+        bitmap = Bitmap()
+        self.assertFalse(bitmap)
+        for number in [3, 1000, 8, 3]:
+            bitmap.add(number)
+        self.assertEqual(3, len(bitmap))
+        self.assertTrue(1000 in bitmap)
+        self.assertFalse(7 in bitmap)
+        self.assertFalse(5000 in bitmap)
+        self.assertEqual([3, 8, 1000], list(bitmap))
+
+
+class TieredMergePolicyTests(unittest.TestCase):
+
+    def _segments(self, *sizes):
+        return [Segment({}, {}, array('Q', range(0, size))) for size in sizes]
+
+    def test_find_merge(self):
+        policy = TieredMergePolicy(merge_factor=3)
+        self.assertEqual([], policy.find_merge(self._segments(1, 1)))
+        segments = self._segments(2, 1, 30, 1, 2)
+        self.assertEqual(sorted([segments[1], segments[3], segments[0]], key=len),
+                         policy.find_merge(segments))
+        # 3 and 5 documents are in the same tier, 30 documents in a bigger one.
+        self.assertEqual([], policy.find_merge(self._segments(3, 5, 30, 1)))
+        self.assertEqual(3, len(policy.find_merge(self._segments(3, 5, 30, 8))))
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..analyzer import Analyzer
+from ..index import Index
+from ..snippets import best_window, highlight_passage, make_snippet
+
+
+class SnippetsTests(unittest.TestCase):
+
+    def test_best_window(self):
+        matches = [(0, "common"), (10, "common"), (20, "rare"), (22, "common")]
+        self.assertEqual(19, best_window(matches, {"common": 0.1, "rare": 2.0}, 6))
+        self.assertEqual(0, best_window([], {}, 6))
+        # Ties on the score are broken by the number of matches.
+        matches = [(0, "a"), (10, "a"), (11, "a")]
+        self.assertEqual(9, best_window(matches, {"a": 1.0}, 5))
+
+    def test_highlight_passage(self):
+        content = "one  two\nthree, four five"
+        spans = Analyzer().spans(content)
+        self.assertEqual("one two three, [four] ...",
+                         highlight_passage(content, spans, {3}, 0, 4))
+        self.assertEqual("... <b>two</b> three, four ...",
+                         highlight_passage(content, spans, {1}, 1, 3, ("<b>", "</b>")))
+        # A window past the end of the text is moved back.
+        self.assertEqual("... three, four [five]",
+                         highlight_passage(content, spans, {4}, 4, 3))
+        self.assertEqual("", highlight_passage("", [], set(), 0, 4))
+
+    def test_make_snippet(self):
+        content = "Sorting on parallel processors, with a memory shared by the processors"
+        analyzer = Analyzer(["on", "with", "a", "by", "the"])
+        terms = {"processor", "memori"}
+        matches = [(position, term) for (position, term)
+                   in analyzer.analyze_positions(content) if term in terms]
+        self.assertEqual("... [processors], with a [memory] ...",
+                         make_snippet(content, analyzer.spans(content), matches,
+                                      {"processor": 1.0, "memori": 1.0}, 4))
+
+
+class IndexSnippetTests(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "corpus")
+        filler = " ".join("filler{0}".format(i) for i in range(0, 40))
+        with open(self._path, "w", encoding="utf8") as file_ptr:
+            file_ptr.write(".I 1\n.T\nParallel sorting\n.W\n{0} the memory of "
+                           "parallel processors {0}\n".format(filler))
+            file_ptr.write(".I 2\n.T\nMemory\n.W\nmemory memory\n")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_snippet(self):
+        for positional in [False, True]:
+            index = Index(self._path, stop_words=["the", "of"], positional=positional)
+            snippet = index.snippet(1, "parallel processors", 10)
+            self.assertEqual("... filler39 the memory of [parallel] [processors] "
+                             "filler0 filler1 filler2 filler3 ...", snippet)
+            self.assertEqual("[Memory] [memory] [memory]", index.snippet(2, "memories"))
+            self.assertEqual("Memory memory memory", index.snippet(2, "unknown"))
+            self.assertRaises(ValueError, index.snippet, 3, "memory")
@@ -0,0 +1,71 @@
+import random
+import shutil
+import tempfile
+import unittest
+from ..index import Index
+from ..sparse_backend import SparseBackend, is_available
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25
+from .test_vectorial_query import write_random_corpus
+
+
+@unittest.skipUnless(is_available(), "numpy and scipy are not installed")
+class SparseBackendTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        randomizer = random.Random(3)
+        words = ["word{0}".format(i) for i in range(0, 60)]
+        cls._directory = tempfile.mkdtemp()
+        cls._path = write_random_corpus(cls._directory, randomizer, words)
+        cls._index = Index(cls._path)
+        cls._queries = [
+            " ".join(randomizer.sample(words, randomizer.randint(1, 12)))
+            for _ in range(0, 20)] + ["unknown", "word0 word0 word1"]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._directory)
+
+    def assert_same_ranking(self, expected, actual):
+        '''Compares two rankings, allowing ties to be in any order.'''
+        self.assertEqual(len(expected), len(actual))
+        for ((_, expected_score), (_, actual_score)) in zip(expected, actual):
+            self.assertAlmostEqual(expected_score, actual_score)
+        if expected:
+            last_score = expected[-1][1] + 1e-9
+            self.assertEqual(
+                {doc_id for (doc_id, score) in expected if score > last_score},
+                {doc_id for (doc_id, score) in actual if score > last_score})
+
+    def test_execute(self):
+        for query_type in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                           VectorialQueryProbabilistic, VectorialQueryBM25]:
+            backend = SparseBackend(self._index, query_type)
+            for query in self._queries:
+                expected = query_type(query).execute(self._index)
+                self.assertEqual({doc_id for (doc_id, _) in expected},
+                                 {doc_id for (doc_id, _) in backend.execute(query)})
+                for k in [None, 1, 10]:
+                    self.assert_same_ranking(query_type(query).execute(self._index, k),
+                                             backend.execute(query, k))
+
+    def test_execute_batch(self):
+        for query_type in [VectorialQueryTfIdf, VectorialQueryProbabilistic]:
+            backend = SparseBackend(self._index, query_type)
+            for k in [None, 10]:
+                expected = [backend.execute(query, k) for query in self._queries]
+                actual = backend.execute_batch(self._queries, k)
+                self.assertEqual(len(expected), len(actual))
+                for (query_expected, query_actual) in zip(expected, actual):
+                    self.assert_same_ranking(query_expected, query_actual)
+        self.assertEqual([], backend.execute_batch([], 10))
+
+    def test_index_changes(self):
+        index = Index(self._path)
+        backend = SparseBackend(index, VectorialQueryTfIdf)
+        self.assertEqual(300, backend.matrix().shape()[0])
+        index.delete_document(1)
+        self.assertEqual(299, backend.matrix().shape()[0])
+        self.assert_same_ranking(VectorialQueryTfIdf("word1 word2").execute(index, 5),
+                                 backend.execute("word1 word2", 5))
@@ -0,0 +1,88 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from ..constants import TFIDF, NORM_COUNT
+from ..index import Index
+from ..spimi import SpimiIndexBuilder
+from ..vectorial_query import VectorialQueryTfIdf
+
+
+class SpimiIndexBuilderTests(unittest.TestCase):
+
+    def setUp(self):
+        randomizer = random.Random(11)
+        words = ["word{0}".format(i) for i in range(0, 50)]
+        self._directory = tempfile.mkdtemp()
+        self._paths = []
+        for file_number in range(0, 3):
+            path = os.path.join(self._directory, "part{0}".format(file_number))
+            # Doc ids are not sorted across files.
+            doc_ids = range(300 - file_number * 100, 200 - file_number * 100, -1)
+            with open(path, "w") as file_ptr:
+                for doc_id in doc_ids:
+                    content = " ".join(
+                        words[int(randomizer.paretovariate(1)) % len(words)]
+                        for _ in range(0, randomizer.randint(3, 30)))
+                    file_ptr.write(".I {0}\n.T\n{1}\n".format(doc_id, content))
+            self._paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def assert_same_index(self, expected, actual):
+        self.assertEqual(expected.get_number_of_docs(), actual.get_number_of_docs())
+        self.assertEqual(sorted(expected.terms()), list(actual.terms()))
+        for term in expected.terms():
+            self.assertEqual(list(expected.postings_with_frequencies(term)),
+                             list(actual.postings_with_frequencies(term)))
+            self.assertAlmostEqual(expected.max_document_weight(TFIDF, term),
+                                   actual.max_document_weight(TFIDF, term))
+        for doc_id in expected.get_all_doc_ids():
+            self.assertEqual(expected.index_by_doc_id(doc_id)[0:3],
+                             actual.index_by_doc_id(doc_id)[0:3])
+            self.assertEqual(expected.max_frequency(doc_id),
+                             actual.max_frequency(doc_id))
+            self.assertEqual(expected.document_length(doc_id),
+                             actual.document_length(doc_id))
+            for weighting in [TFIDF, NORM_COUNT]:
+                self.assertAlmostEqual(expected.document_norm(weighting, doc_id),
+                                       actual.document_norm(weighting, doc_id))
+
+    def test_build_with_runs(self):
+        builder = SpimiIndexBuilder(memory_budget=20000)
+        index = builder.build(self._paths, os.path.join(self._directory, "index"))
+        self.assertGreater(builder.runs, 3)
+        self.assertGreater(builder.bytes_spilled, 0)
+        expected = Index(self._paths)
+        self.assert_same_index(expected, index)
+        query = VectorialQueryTfIdf("word1 word5 word9")
+        results = query.execute_pruned(index, 5)
+        self.assertEqual([doc_id for (doc_id, _) in query.execute(expected, 5)],
+                         [doc_id for (doc_id, _) in results])
+
+    def test_build_in_one_run(self):
+        builder = SpimiIndexBuilder(stop_words=['word0'], positional=True)
+        index = builder.build(self._paths[0], os.path.join(self._directory, "index"))
+        self.assertEqual(1, builder.runs)
+        expected = Index(self._paths[0], stop_words=['word0'], positional=True)
+        self.assert_same_index(expected, index)
+        self.assertEqual(expected.positions('word1', 300),
+                         index.positions('word1', 300))
+
+    def test_build_with_processes(self):
+        builder = SpimiIndexBuilder(memory_budget=40000, processes=2)
+        index = builder.build(self._paths, os.path.join(self._directory, "index"))
+        self.assertGreater(builder.runs, 2)
+        self.assert_same_index(Index(self._paths), index)
+        # A single file is cut into byte ranges inverted by each process.
+        builder = SpimiIndexBuilder(processes=2)
+        index = builder.build(self._paths[1], os.path.join(self._directory, "single"))
+        self.assertEqual(2, builder.runs)
+        self.assert_same_index(Index(self._paths[1]), index)
+
+    def test_duplicate_doc_id(self):
+        builder = SpimiIndexBuilder(memory_budget=20000)
+        self.assertRaises(ValueError, builder.build, [self._paths[0]] * 2,
+                          os.path.join(self._directory, "index"))
@@ -43,6 +43,11 @@ class UtilityTests(unittest.TestCase):
         self.assertEqual(0, tf_idf(0, 5, 10))
         self.assertEqual(0, tf_idf(1, 1, 1))
 
+    def test_bm25_idf(self):
+        self.assertAlmostEqual(log(1 + 9.5 / 1.5), bm25_idf(1, 10))
+        self.assertGreater(bm25_idf(10, 10), 0)
+        self.assertGreater(bm25_idf(1, 10), bm25_idf(5, 10))
+
     def test_norm(self):
         vectorA = {'a': {'count': 0.5}, 'b': {'count': 0.5},
                    'c': {'count': 0.5}, 'd': {'count': 0.5}}
@@ -1,8 +1,14 @@
 import os
+import random
+import shutil
+import tempfile
 import unittest
-from math import sqrt
+from math import log, sqrt
+from ..constants import BM25
 from ..index import Index
-from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic
+from ..scoring import MaxScoreScorer
+from ..vectorial_query import VectorialQueryTfIdf, VectorialQueryNormCount, VectorialQueryProbabilistic, \
+    VectorialQueryBM25, BM25_K1, BM25_B
 
 
 class VectorialQueryTests(unittest.TestCase):
@@ -42,3 +48,157 @@ class VectorialQueryTests(unittest.TestCase):
             if doc_id == 1:
                 success = True
         self.assertTrue(success)
+
+    def test_vectorial_query_bm25(self):
+        '''Tests the BM25 score of a document from its length and the idf.'''
+        results = dict(VectorialQueryBM25("algebraic").execute(self._index))
+        self.assertIn(1, results)
+        number_of_docs = self._index.get_number_of_docs()
+        document_frequency = self._index.document_frequency("algebra")
+        idf = log(1 + (number_of_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        frequency = dict(self._index.postings_with_frequencies("algebra"))[1]
+        length = self._index.document_length(1)
+        self.assertEqual(sum(self._index.index_by_doc_id(1)[3].values()), length)
+        average_length = self._index.average_document_length()
+        expected = idf * frequency * (BM25_K1 + 1) / (
+            frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+        self.assertAlmostEqual(expected, results[1])
+
+    def test_vectorial_query_bm25_deleted_document(self):
+        '''Tests that the BM25 statistics follow the deleted documents.'''
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data")
+        index.delete_document(1)
+        self.assertNotIn(1, dict(VectorialQueryBM25("algebraic").execute(index)))
+        lengths = [self._index.document_length(doc_id)
+                   for doc_id in self._index.get_all_doc_ids() if doc_id != 1]
+        self.assertAlmostEqual(sum(lengths) / len(lengths), index.average_document_length())
+        self.assertEqual(0.0, index.idf(BM25, "algebra"))
+        self.assertAlmostEqual(log(1 + 0.5 / 1.5), index.idf(BM25, "languag"))
+
+    def test_vectorial_query_query_only_index(self):
+        '''Tests that dropping the forward index does not change scores.'''
+        index = Index(os.path.dirname(os.path.realpath(__file__)) + "/test_data",
+                      query_only=True)
+        query = VectorialQueryTfIdf("digital root extraction of languages")
+        self.assertEqual(query.execute(self._index), query.execute(index))
+
+    def test_vectorial_query_top_k(self):
+        '''Tests that the top k results are the head of the full ranking.'''
+        for query_type in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                           VectorialQueryProbabilistic, VectorialQueryBM25]:
+            query = query_type("preliminary report on algebraic languages")
+            results = query.execute(self._index)
+            self.assertEqual(results[0:1], query.execute(self._index, 1))
+
+
+def write_random_corpus(directory, randomizer, words):
+    '''Writes 300 documents of words following a power law, returns their path.'''
+    data_path = os.path.join(directory, "corpus")
+    with open(data_path, "w") as file_ptr:
+        for doc_id in range(1, 301):
+            length = randomizer.randint(3, 40)
+            content = " ".join(
+                words[int(randomizer.paretovariate(1)) % len(words)]
+                for _ in range(0, length))
+            file_ptr.write(".I {0}\n.T\n{1}\n".format(doc_id, content))
+    return data_path
+
+
+class PrunedQueryTests(unittest.TestCase):
+
+    '''Checks that pruned queries return the exhaustive top k.'''
+
+    @classmethod
+    def setUpClass(cls):
+        randomizer = random.Random(42)
+        words = ["word{0}".format(i) for i in range(0, 60)]
+        cls._directory = tempfile.mkdtemp()
+        cls._index = Index(write_random_corpus(cls._directory, randomizer, words))
+        cls._queries = [
+            " ".join(randomizer.sample(words, randomizer.randint(1, 12)))
+            for _ in range(0, 30)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._directory)
+
+    def assert_same_top_k(self, expected, actual):
+        '''Compares two top k lists, allowing ties at the last score.'''
+        self.assertEqual(len(expected), len(actual))
+        for ((_, expected_score), (_, actual_score)) in zip(expected, actual):
+            self.assertAlmostEqual(expected_score, actual_score)
+        if expected:
+            last_score = expected[-1][1] + 1e-9
+            self.assertEqual(
+                {doc_id for (doc_id, score) in expected if score > last_score},
+                {doc_id for (doc_id, score) in actual if score > last_score})
+
+    def test_pruned_tfidf(self):
+        for query_text in self._queries:
+            for k in [1, 10, 50]:
+                query = VectorialQueryTfIdf(query_text)
+                self.assert_same_top_k(query.execute(self._index, k),
+                                       query.execute_pruned(self._index, k))
+
+    def test_pruned_probabilistic(self):
+        for query_text in self._queries:
+            for k in [1, 10, 50]:
+                query = VectorialQueryProbabilistic(query_text)
+                self.assert_same_top_k(query.execute(self._index, k),
+                                       query.execute_pruned(self._index, k))
+
+    def test_pruned_bm25(self):
+        for query_text in self._queries:
+            for k in [1, 10, 50]:
+                query = VectorialQueryBM25(query_text)
+                self.assert_same_top_k(query.execute(self._index, k),
+                                       query.execute_pruned(self._index, k))
+
+    def test_pruned_skips_postings(self):
+        scorer = MaxScoreScorer(self._index)
+        query = VectorialQueryProbabilistic(" ".join(self._queries))
+        query.execute_pruned(self._index, 5, scorer)
+        self.assertTrue(scorer.skipped_postings() > 0)
+
+    def test_pruned_compressed(self):
+        index = Index(os.path.join(self._directory, "corpus"), compressed=True)
+        for query_text in self._queries:
+            query = VectorialQueryTfIdf(query_text)
+            self.assertEqual(query.execute(self._index, 10), query.execute(index, 10))
+            self.assert_same_top_k(query.execute(self._index, 10),
+                                   query.execute_pruned(index, 10))
+
+
+class BatchQueryTests(unittest.TestCase):
+
+    '''Checks that a batch of queries returns the results of each query.'''
+
+    @classmethod
+    def setUpClass(cls):
+        randomizer = random.Random(7)
+        words = ["word{0}".format(i) for i in range(0, 60)]
+        cls._directory = tempfile.mkdtemp()
+        cls._index = Index(write_random_corpus(cls._directory, randomizer, words),
+                           result_cache_size=0)
+        cls._queries = [
+            " ".join(randomizer.sample(words, randomizer.randint(1, 12)))
+            for _ in range(0, 20)] + ["", "unknown"]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._directory)
+
+    def test_execute_batch(self):
+        for query_type in [VectorialQueryTfIdf, VectorialQueryNormCount,
+                           VectorialQueryProbabilistic, VectorialQueryBM25]:
+            for k in [None, 5]:
+                self.assertEqual(
+                    [query_type(query).execute(self._index, k) for query in self._queries],
+                    self._index.execute_batch(self._queries, query_type, k))
+
+    def test_execute_batch_processes(self):
+        expected = [VectorialQueryTfIdf(query).execute(self._index, 10)
+                    for query in self._queries]
+        self.assertEqual(expected, self._index.execute_batch(
+            self._queries, VectorialQueryTfIdf, 10, processes=3))
+        self.assertEqual([], self._index.execute_batch([], VectorialQueryTfIdf, 10, 3))
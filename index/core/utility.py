@@ -2,7 +2,9 @@
 Provides general purpose functions.
 '''
 import re
+from collections import Counter
 from math import log, sqrt
+from .analyzer import Analyzer
 from .configuration import Configuration
 
 
@@ -30,13 +32,16 @@ def merge_dictionaries(dict_a, dict_b="", merging_func=lambda x, y: x + y):
 
 def get_word_list(content, stop_words):
     '''Gets the list of words in a string'''
-    if not stop_words:
-        stop_words = []
-    content = re.sub(r'[^\w\s]', ' ', content).lower()
-    word_list = split_content(content)
-    word_list = filter_words(word_list, stop_words)
-    word_list = [tokenize(x) for x in word_list]
-    return word_list
+    return Analyzer(stop_words).analyze(content)
+
+
+def get_positioned_word_list(content, stop_words):
+    '''
+    Gets the list of (position, word) in a string.
+    Stop words are removed but still count in positions,
+    so that removing them does not bring other words closer.
+    '''
+    return Analyzer(stop_words).analyze_positions(content)
 
 
 def tokenize(word):
@@ -50,14 +55,21 @@ def count_tokens(tokens):
     '''
     Given a list of elements, counts the number of occurences
     of each element as a dictionary.
+    The elements are counted in a single pass before the dictionary
+    of type Configuration.IndexDict is built from the counts.
     '''
-    result = Configuration.IndexDict()
-    for token in tokens:
-        if token in result:
-            result[token] = result[token] + 1
-        else:
-            result[token] = 1
-    return result
+    return Configuration.IndexDict(Counter(tokens))
+
+
+def norm_count_statistics(counts):
+    '''
+    Returns the highest term frequency of a document and the norm
+    of its vector of frequencies divided by this highest frequency,
+    from the list of its term frequencies.
+    '''
+    max_frequency = max(counts) if counts else 1
+    return (max_frequency,
+            sqrt(sum((count / max_frequency) ** 2 for count in counts)))
 
 
 def tf_idf(term_frequency, document_frequency, doc_nbr):
@@ -73,6 +85,16 @@ def tf_idf(term_frequency, document_frequency, doc_nbr):
         * log(doc_nbr / document_frequency) / log(10)
 
 
+def bm25_idf(document_frequency, doc_nbr):
+    '''
+    Computes the inverse document frequency of BM25, kept positive
+    for the terms found in more than half of the documents.
+    document_frequency: number of documents that contain the term
+    doc_nbr: number of documents in the index
+    '''
+    return log(1 + (doc_nbr - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
 def flatten(dic):
     '''
     Flatten a dictionary recursively.
@@ -1,104 +1,272 @@
 '''
 Provides classes to execute vectorial and probabilistic queries.
 '''
-from .constants import WORDS
+from math import log
+from .constants import TFIDF, NORM_COUNT, BM25
 from .document_index import DocumentIndex
-from .utility import norm, scalar_product, probabilistic_weight
+from .scoring import TermAtATimeScorer, MaxScoreScorer
+from .utility import norm, tf_idf, probabilistic_weight
 
-
-def _sort_results(result_dict):
-    '''Sort results by descending weight.'''
-    return sorted(result_dict.items(), key=lambda x: x[1], reverse=True)
+# Saturation of the term frequencies and strength of the document
+# length normalization of BM25.
+BM25_K1 = 1.2
+BM25_B = 0.75
 
 
 class VectorialQuery(object):
 
     '''Represents an abstract vectorial query.'''
 
+    # Weighting scheme whose document norms are precomputed by the index.
+    _weighting = None
+
     def __init__(self, query):
         self._query = query
-        self._init_index()
 
-    def _init_index(self):
-        '''Initializes the index-like structure for the query.'''
-        doc_idx = DocumentIndex(self._query)
-        self._word_vector = doc_idx.get_word_count()
+    def _word_vector(self, index):
+        '''
+        Returns the words of the query with their count, analyzed
+        like the documents of the index.
+        '''
+        return DocumentIndex(self._query, analyzer=index.analyzer()).get_word_count()
 
-    def execute(self, index):
+    def execute(self, index, k=None):
         '''
         Executes the query against the index
         and returns documents sorted by descending matching score.
+        Only the k best documents are returned when k is given.
+        The results are kept in the result cache of the index.
+        '''
+        return index.result_cache().cached(
+            self._cache_key(index, k), index.version(), lambda: self._score(index, k))
+
+    def _cache_key(self, index, k):
+        '''
+        Returns the key of the results of the query in the result cache:
+        the model, the analyzed terms of the query with their count, and k.
         '''
-        return self._execute(index, self._weighting_function)
+        return (type(self).__name__, tuple(sorted(self._word_vector(index).items())), k)
 
-    def _execute(self, index, weighting_function):
+    def _score(self, index, k):
         '''
-        Internal execution of the vectorial query that uses
-        a custom weighting function.
+        Scores the documents one term at a time and returns the k best ones.
+        Terms are accumulated in sorted order, like in a batch of queries
+        scored by a BatchScorer, so that both give the same scores.
         '''
-        result_dict = {}
+        (weight_functions, normalization_function) = self.weight_functions(index)
+        scorer = TermAtATimeScorer(index)
+        for word in sorted(weight_functions):
+            scorer.accumulate(word, weight_functions[word])
+        if normalization_function:
+            scorer.normalize(normalization_function)
+        return scorer.top_k(k)
+
+    def weight_functions(self, index):
+        '''
+        Returns the scoring functions of the query:
+        a dictionary mapping each query term to its
+        weight_function(doc_id, frequency), the contribution of the term
+        to the score of a document, and the normalization_function(doc_id)
+        dividing the scores, or None.
+        Only the postings of the query words are read: the document
+        norms are precomputed by the index.
+        '''
+        (query_vector, query_norm) = self._query_vector(index, self._weighting_function)
+        weight_functions = dict(
+            (word, self._document_weight_function(word, query_vector[word], index))
+            for word in query_vector)
+        return (weight_functions, lambda doc_id:
+                query_norm * index.document_norm(self._weighting, doc_id))
+
+    def query_weights(self, index):
+        '''
+        Returns the weight of each query term divided by the norm of the
+        query, the query side of the score of a document whose weights
+        are divided by its norm.
+        '''
+        (query_vector, query_norm) = self._query_vector(index, self._weighting_function)
+        return dict((word, query_vector[word] / query_norm if query_norm else 0.0)
+                    for word in query_vector)
+
+    def _query_vector(self, index, weighting_function):
+        '''Returns the weighted query vector and its norm.'''
+        word_vector = self._word_vector(index)
         query_vector = {
-            word:weighting_function(word, self._word_vector, index)
-            for word in self._word_vector
+            word:weighting_function(word, word_vector, index)
+            for word in word_vector
         }
-        query_norm = norm(query_vector)
-        for word in query_vector:
-            documents = index.search(word)
-            for doc_id in documents:
-                result_dict[doc_id] = 0
-        for doc_id in result_dict:
-            document = index.index_by_doc_id(doc_id)[WORDS]
-            doc_vector = {
-                word:weighting_function(word, document, index)
-                for word in document
-            }
-            doc_norm = norm(doc_vector)
-            result_dict[doc_id] = \
-                scalar_product(query_vector, doc_vector) / (query_norm*doc_norm)
-        return _sort_results(result_dict)
+        return (query_vector, norm(query_vector))
 
     def _weighting_function(self, word, word_vector, index):
         pass
 
+    def _document_weight_function(self, word, query_weight, index):
+        '''
+        Returns a function giving the contribution of a word
+        to the score of a document, from the document id and
+        the frequency of the word in the document.
+        '''
+        pass
+
 
 class VectorialQueryTfIdf(VectorialQuery):
 
     '''Represents a vectorial query using tf-idf.'''
 
+    _weighting = TFIDF
+
     def _weighting_function(self, word, word_vector, index):
         return index.compute_tfidf_for_word(word, word_vector)
 
+    def _document_weight_function(self, word, query_weight, index):
+        document_frequency = index.document_frequency(word)
+        number_of_docs = index.get_number_of_docs()
+        return lambda doc_id, frequency: query_weight * tf_idf(
+            frequency, document_frequency, number_of_docs)
+
+    def execute_pruned(self, index, k, scorer=None):
+        '''
+        Executes the query document at a time and returns the k best
+        documents, skipping the documents that cannot enter the top k.
+        Returns the same results as execute(index, k), up to ties.
+        A MaxScoreScorer can be given to read its pruning counters afterwards.
+        '''
+        (query_vector, query_norm) = self._query_vector(
+            index, self._weighting_function)
+        if not query_norm:
+            return self.execute(index, k)
+        scorer = scorer if scorer else MaxScoreScorer(index)
+        for word in query_vector:
+            upper_bound = query_vector[word] / query_norm \
+                * index.max_document_weight(self._weighting, word)
+            scorer.add_term(word, upper_bound, self._document_weight_function(
+                word, query_vector[word], index))
+        return scorer.top_k(
+            k, lambda doc_id: query_norm * index.document_norm(self._weighting, doc_id))
+
 
 class VectorialQueryNormCount(VectorialQuery):
 
     '''Represents a vectorial query using normalized count.'''
 
+    _weighting = NORM_COUNT
+
     def _weighting_function(self, word, word_vector, index):
         max_freq = max(word_vector.values())
         return word_vector[word] / max_freq
 
+    def _document_weight_function(self, word, query_weight, index):
+        return lambda doc_id, frequency: \
+            query_weight * (frequency / index.max_frequency(doc_id))
+
 
 class VectorialQueryProbabilistic(VectorialQuery):
 
     '''Represents a probabilistic query.'''
 
-    def execute(self, index):
+    def weight_functions(self, index):
         '''
-        Executes the query against the index
-        and returns documents sorted by descending matching score.
+        Returns the scoring functions of the query: the weight of each
+        term for every document containing it, without normalization.
+        '''
+        weight_functions = dict()
+        for word in self._word_vector(index):
+            term = self._term_weight(word, index)
+            weight_functions[word] = lambda doc_id, frequency, term=term: term
+        return (weight_functions, None)
+
+    def query_weights(self, index):
+        '''
+        Returns the weight of each query term, the score it adds
+        to every document containing it.
+        '''
+        return dict((word, self._term_weight(word, index))
+                    for word in self._word_vector(index))
+
+    def execute_pruned(self, index, k, scorer=None):
+        '''
+        Executes the query document at a time and returns the k best
+        documents, skipping the documents that cannot enter the top k.
+        Returns the same results as execute(index, k), up to ties.
+        A MaxScoreScorer can be given to read its pruning counters afterwards.
+        '''
+        scorer = scorer if scorer else MaxScoreScorer(index)
+        for word in self._word_vector(index):
+            term = self._term_weight(word, index)
+            scorer.add_term(word, term, lambda doc_id, frequency, term=term: term)
+        return scorer.top_k(k)
+
+    def _term_weight(self, word, index):
+        '''
+        Weight of a word for every document containing it.
+        It only depends on the document frequency of the word.
+        '''
+        number_of_docs = index.get_number_of_docs()
+        doc_frequency = index.document_frequency(word)
+        if not doc_frequency:
+            return 0.0
+        if doc_frequency == number_of_docs:
+            # Limit of the weight when both probabilities tend to 1.
+            return log(3/2)
+        irrelevant_prob = doc_frequency / number_of_docs
+        relevant_prob = 1/3 + 2/3*doc_frequency/number_of_docs
+        return probabilistic_weight(relevant_prob) \
+            - probabilistic_weight(irrelevant_prob)
+
+
+class VectorialQueryBM25(VectorialQuery):
+
+    '''
+    Represents a query scored with BM25. The lengths of the documents
+    are precomputed by the index and the idf of the terms cached by it,
+    so that a posting only costs a few multiplications and additions.
+    '''
+
+    _weighting = BM25
+
+    def weight_functions(self, index):
+        '''
+        Returns the scoring functions of the query: the BM25 contribution
+        of each term to the score of a document, without normalization.
+        '''
+        lengths = index.document_lengths()
+        (constant, slope) = self._length_normalization(index)
+        weight_functions = dict()
+        for (word, weight) in self.query_weights(index).items():
+            weight_functions[word] = lambda doc_id, frequency, weight=weight: \
+                weight * frequency / (frequency + constant + slope * lengths[doc_id])
+        return (weight_functions, None)
+
+    def query_weights(self, index):
+        '''
+        Returns the weight of each query term: its idf multiplied by
+        k1 + 1 and by its number of occurrences in the query.
+        '''
+        return dict((word, index.idf(BM25, word) * (BM25_K1 + 1) * count)
+                    for (word, count) in self._word_vector(index).items())
+
+    def execute_pruned(self, index, k, scorer=None):
+        '''
+        Executes the query document at a time and returns the k best
+        documents, skipping the documents that cannot enter the top k.
+        Returns the same results as execute(index, k), up to ties.
+        A MaxScoreScorer can be given to read its pruning counters afterwards.
+        '''
+        scorer = scorer if scorer else MaxScoreScorer(index)
+        (weight_functions, _) = self.weight_functions(index)
+        query_weights = self.query_weights(index)
+        for word in weight_functions:
+            # The frequency part of a weight is below 1.
+            scorer.add_term(word, query_weights[word], weight_functions[word])
+        return scorer.top_k(k)
+
+    @staticmethod
+    def _length_normalization(index):
+        '''
+        Returns the (constant, slope) of the term k1 * (1 - b + b * length
+        / average length) added to the frequency of a term in a document.
         '''
-        result_dict = {}
-        number_of_docs = len(index.get_all_doc_ids())
-        for word in self._word_vector:
-            documents = index.search(word)
-            doc_frequency = len(documents)
-            for doc_id in documents:
-                irrelevant_prob = doc_frequency / number_of_docs
-                relevant_prob = 1/3 + 2/3*doc_frequency/number_of_docs
-                term = probabilistic_weight(relevant_prob) \
-                    - probabilistic_weight(irrelevant_prob)
-                if doc_id in result_dict:
-                    result_dict[doc_id] += term
-                else:
-                    result_dict[doc_id] = term
-        return _sort_results(result_dict)
+        average_length = index.average_document_length()
+        if not average_length:
+            return (BM25_K1, 0.0)
+        return (BM25_K1 * (1 - BM25_B), BM25_K1 * BM25_B / average_length)
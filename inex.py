@@ -3,20 +3,24 @@
 import os
 import time
 from multiprocessing import freeze_support
-from pympler.asizeof import asizeof
-from index.core import Index, IndexSerializer, Configuration
+from index.core import Configuration
 from index.core.document_parser import INEXDocumentParser
-from index.core.dictionary_as_string import DictionaryAsString
+from index.core.spimi import SpimiIndexBuilder
 
 
 # Setting up the index package for the feast.
-Configuration.IndexDict = DictionaryAsString
 Configuration.DocumentParser = INEXDocumentParser
-Configuration.number_of_threads = 8
 
 # Path to folder containing the documents to eat.
 FOLDER_PATH = '../inex2007/train_parts/documents/'
 
+# Memory used to invert documents before they are spilled to disk,
+# shared between the processes.
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Number of processes inverting the documents.
+PROCESSES = 4
+
 
 if __name__ == '__main__':
     freeze_support()
@@ -24,9 +28,14 @@ if __name__ == '__main__':
     print("{0} files found".format(len(FILE_PATHS)))
 
     START_TIME = time.time()
-    INDEX = Index(FILE_PATHS, 'data/common_words')
+    with open('data/common_words') as STOP_WORDS_FILE:
+        STOP_WORDS = STOP_WORDS_FILE.read().splitlines()
+    # Each process inverts its share of the files and spills its postings
+    # to disk every MEMORY_BUDGET / PROCESSES bytes.
+    BUILDER = SpimiIndexBuilder(STOP_WORDS, memory_budget=MEMORY_BUDGET,
+                                processes=PROCESSES)
+    INDEX = BUILDER.build(FILE_PATHS, 'index_inex')
     print("indexing took {0} seconds".format(time.time() - START_TIME))
+    print(BUILDER.report())
     print("vocabulary size: {0} words".format(len(INDEX._inverted_index)))
-    print("size of index: {0} bytes".format(asizeof(INDEX)))
-    print("{0} files indexed".format(len(INDEX._index)))
-    IndexSerializer.save_to_file(INDEX, 'index_inex.idx')
+    print("{0} files indexed".format(INDEX.get_number_of_docs()))